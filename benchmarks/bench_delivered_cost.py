@@ -0,0 +1,321 @@
+"""
+End-to-end benchmark of the delivered cost pipeline on deterministic synthetic inputs.
+
+For each AOI size a fractal DEM, a road network with highway classes and maxspeed tags,
+stream and waterbody barriers and a set of facilities are generated (same seed, same
+data) and fed to delvCost.run through its local data paths, so osmnx and py3dep are not
+used. Every case runs in a fresh process and the per-stage wall time, CPU time and peak
+memory from the run's stage profile are reported, so scheduler settings, chunk sizes and
+algorithm changes can be compared on identical workloads.
+
+Run from the plugin folder:
+    python benchmarks/bench_delivered_cost.py --sizes small medium
+    python benchmarks/bench_delivered_cost.py --scheduler processes --workers 8
+    python benchmarks/bench_delivered_cost.py --chunk-mb 32 --tile-mb 256 --per-facility
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import rasterio
+import shapely
+from rasterio.transform import from_origin
+from shapely.geometry import box
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# AOI side length in km
+SIZES = {"small": 5, "medium": 15, "large": 40}
+CENTER = (-1_400_000.0, 2_700_000.0)  # EPSG:5070, northern Rockies
+RES = 30.0
+# spacing in m of the regional road grid per highway class
+ROAD_GRID = {"primary": 12_000, "secondary": 6_000, "tertiary": 3_000}
+MAXSPEEDS = [None, None, "25 mph", "35 mph", "45", "60 km/h"]
+
+
+def fractal_dem(rows, cols, rng, beta=3.2, base=800.0, relief=1500.0):
+    """
+    Generates fractal terrain by spectral synthesis, a 1/f^beta power spectrum.
+    Args:
+        rows, cols: grid shape
+        rng: numpy random generator
+        beta: spectral exponent, larger values give smoother terrain
+        base: lowest elevation in m
+        relief: elevation range in m
+    Returns:
+        float32 array of elevations
+    """
+    spec = np.fft.rfft2(rng.standard_normal((rows, cols)))
+    ky = np.fft.fftfreq(rows)[:, None]
+    kx = np.fft.rfftfreq(cols)[None, :]
+    k = np.hypot(kx, ky)
+    k[0, 0] = 1.0
+    spec *= k ** (-beta / 2)
+    spec[0, 0] = 0.0
+    z = np.fft.irfft2(spec, s=(rows, cols))
+    z = (z - z.min()) / (z.max() - z.min())
+    return (base + relief * z).astype("float32")
+
+
+def meander(start, end, rng, step=500.0, wiggle=40.0):
+    """
+    Builds a line from start to end that wanders sideways like a road or stream.
+    """
+    start, end = np.asarray(start), np.asarray(end)
+    n = max(2, int(np.linalg.norm(end - start) // step) + 1)
+    t = np.linspace(0, 1, n)[:, None]
+    pts = start + t * (end - start)
+    direction = (end - start) / np.linalg.norm(end - start)
+    normal = np.array([-direction[1], direction[0]])
+    offset = np.cumsum(rng.normal(0, wiggle, n))
+    offset -= np.linspace(offset[0], offset[-1], n)  # keep both ends in place
+    return shapely.linestrings(pts + offset[:, None] * normal)
+
+
+def random_walks(n, bounds, rng, steps=10, step=150.0):
+    """
+    Builds short random-walk lines, the local roads between the regional grid.
+    """
+    minx, miny, maxx, maxy = bounds
+    start = rng.uniform((minx, miny), (maxx, maxy), (n, 1, 2))
+    heading = rng.uniform(0, 2 * np.pi, (n, 1)) + np.cumsum(
+        rng.normal(0, 0.3, (n, steps)), axis=1
+    )
+    moves = step * np.stack([np.cos(heading), np.sin(heading)], axis=-1)
+    pts = np.concatenate([start, start + np.cumsum(moves, axis=1)], axis=1)
+    return shapely.linestrings(pts)
+
+
+def make_roads(bounds, rng):
+    """
+    Generates a road network: a meandering regional grid per highway class plus local roads.
+    """
+    minx, miny, maxx, maxy = bounds
+    lines, classes = [], []
+    for highway, spacing in ROAD_GRID.items():
+        for y in np.arange(miny + spacing / 2, maxy, spacing):
+            lines.append(meander((minx, y), (maxx, y), rng))
+            classes.append(highway)
+        for x in np.arange(minx + spacing / 2, maxx, spacing):
+            lines.append(meander((x, miny), (x, maxy), rng))
+            classes.append(highway)
+    area_km2 = (maxx - minx) * (maxy - miny) / 1e6
+    local = random_walks(int(area_km2 * 0.5), bounds, rng)
+    lines.extend(local)
+    classes.extend(rng.choice(["residential", "unclassified"], len(local)))
+    return gpd.GeoDataFrame(
+        {
+            "highway": classes,
+            "maxspeed": rng.choice(np.array(MAXSPEEDS, dtype=object), len(lines)),
+        },
+        geometry=lines,
+        crs=5070,
+    )
+
+
+def make_barriers(bounds, rng):
+    """
+    Generates barrier polygons: buffered streams and waterbodies, like the OSM barriers.
+    """
+    minx, miny, maxx, maxy = bounds
+    streams = [
+        meander((x, maxy), (x + rng.normal(0, 2000), miny), rng, wiggle=120.0)
+        for x in rng.uniform(minx, maxx, max(1, int((maxx - minx) // 4000)))
+    ]
+    area_km2 = (maxx - minx) * (maxy - miny) / 1e6
+    n_lakes = max(1, int(area_km2 / 50))
+    lakes = shapely.buffer(
+        shapely.points(rng.uniform((minx, miny), (maxx, maxy), (n_lakes, 2))),
+        rng.uniform(100, 600, n_lakes),
+    )
+    geoms = np.concatenate([shapely.buffer(streams, 30), shapely.buffer(lakes, 30)])
+    return gpd.GeoDataFrame(geometry=geoms, crs=5070)
+
+
+def make_case(name, size_km, n_facilities, case_dir, seed=0):
+    """
+    Generates and writes the inputs of one case, reusing them if already written.
+    Args:
+        name: case name
+        size_km: AOI side length in km
+        n_facilities: number of facilities
+        case_dir: directory for the inputs
+        seed: random seed
+    Returns:
+        dict of delvCost.run inputs
+    """
+    inputs_path = os.path.join(case_dir, "inputs.json")
+    if os.path.exists(inputs_path):
+        with open(inputs_path) as f:
+            return json.load(f)
+    os.makedirs(case_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    cx, cy = CENTER
+    half = size_km * 500.0
+    aoi = gpd.GeoSeries([box(cx - half, cy - half, cx + half, cy + half)], crs=5070)
+    reach = half + 5000.0
+    fac = gpd.GeoSeries(
+        shapely.points(
+            rng.uniform(
+                (cx - reach, cy - reach), (cx + reach, cy + reach), (n_facilities, 2)
+            )
+        ),
+        crs=5070,
+    )
+
+    # the same download extent delvCost uses: facilities and AOI buffered by 0.15 degrees
+    ext = pd.concat([aoi, fac]).to_crs(4326).union_all().buffer(0.15)
+    minx, miny, maxx, maxy = (
+        gpd.GeoSeries([box(*ext.bounds)], crs=4326).to_crs(5070).total_bounds
+    )
+    minx, miny = np.floor([minx - 1000, miny - 1000])
+    maxx, maxy = np.ceil([maxx + 1000, maxy + 1000])
+    bounds = (minx, miny, maxx, maxy)
+
+    rows, cols = int((maxy - miny) // RES), int((maxx - minx) // RES)
+    dem_path = os.path.join(case_dir, "dem.tif")
+    with rasterio.open(
+        dem_path,
+        "w",
+        driver="GTiff",
+        width=cols,
+        height=rows,
+        count=1,
+        dtype="float32",
+        crs="EPSG:5070",
+        transform=from_origin(minx, maxy, RES, RES),
+        tiled=True,
+        blockxsize=256,
+        blockysize=256,
+        compress="deflate",
+    ) as dst:
+        dst.write(fractal_dem(rows, cols, rng), 1)
+
+    roads_path = os.path.join(case_dir, "roads.gpkg")
+    barriers_path = os.path.join(case_dir, "barriers.gpkg")
+    make_roads(bounds, rng).to_file(roads_path)
+    make_barriers(bounds, rng).to_file(barriers_path)
+
+    inputs = {
+        "study_area_coords": list(aoi.to_crs(4326)[0].exterior.coords),
+        "saw_coords": [(pt.x, pt.y) for pt in fac.to_crs(4326)],
+        "lyr_roads_path": roads_path,
+        "lyr_barriers_path": barriers_path,
+        "dem_path": dem_path,
+        "grid": [rows, cols],
+    }
+    with open(inputs_path, "w") as f:
+        json.dump(inputs, f)
+    return inputs
+
+
+def run_case(inputs, out_dir, run_args, scheduler, workers, chunk_mb):
+    """
+    Runs delvCost on one case. Runs in a fresh process so peak memory is per case.
+    Returns:
+        dict with the total time and the stage profile of the run
+    """
+    sys.path.insert(0, PLUGIN_DIR)
+    import dask
+
+    from delivered_cost import delvCost
+    from delivered_cost.profiler import report_name
+    from delivered_cost.rasterize import get_rasterize_cache
+
+    # identical work for every configuration, nothing is reused from earlier runs
+    get_rasterize_cache(delvCost.rasterize_cache_dir).clear()
+    os.makedirs(out_dir, exist_ok=True)
+    config = {"scheduler": scheduler, "num_workers": workers}
+    if chunk_mb:
+        config["array.chunk-size"] = f"{chunk_mb}MiB"
+    args = {k: v for k, v in inputs.items() if k != "grid"}
+    profile_name = report_name()
+    start = time.perf_counter()
+    with dask.config.set(config):
+        delvCost.run(
+            out_dir=out_dir,
+            profile_name=profile_name,
+            log=lambda msg: print(msg, file=sys.stderr),
+            **args,
+            **run_args,
+        )
+    total = time.perf_counter() - start
+    with open(os.path.join(out_dir, f"{profile_name}.json")) as f:
+        stages = json.load(f)
+    return {"total_s": round(total, 3), "stages": stages}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--sizes", nargs="+", choices=SIZES, default=["small", "medium"]
+    )
+    parser.add_argument("--facilities", type=int, default=3)
+    parser.add_argument("--scheduler", default="threads", help="dask scheduler")
+    parser.add_argument("--workers", type=int, help="dask workers")
+    parser.add_argument("--chunk-mb", type=float, help="dask array.chunk-size target")
+    parser.add_argument(
+        "--tile-mb",
+        type=float,
+        help="delvCost window size of the disk-backed local stages, not a memory bound",
+    )
+    parser.add_argument("--per-facility", action="store_true")
+    parser.add_argument("--cb-o", action="store_true", help="save optional surfaces")
+    parser.add_argument(
+        "--out-dir",
+        default=os.path.join(tempfile.gettempdir(), "bench_delivered_cost"),
+        help="directory for inputs, outputs and the report",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    opts = parser.parse_args(argv)
+
+    run_args = {
+        "tile_mb": opts.tile_mb,
+        "per_facility": opts.per_facility,
+        "workers": opts.workers,
+        "cb_o": opts.cb_o,
+    }
+    report = {"config": vars(opts), "cases": {}}
+    for name in opts.sizes:
+        case_dir = os.path.join(opts.out_dir, f"{name}_f{opts.facilities}_s{opts.seed}")
+        inputs = make_case(name, SIZES[name], opts.facilities, case_dir, opts.seed)
+        print(f"{name}: {inputs['grid'][0]}x{inputs['grid'][1]} cells", file=sys.stderr)
+        with ProcessPoolExecutor(1, mp_context=get_context("spawn")) as pool:
+            result = pool.submit(
+                run_case,
+                inputs,
+                os.path.join(case_dir, "run"),
+                run_args,
+                opts.scheduler,
+                opts.workers,
+                opts.chunk_mb,
+            ).result()
+        result["grid"] = inputs["grid"]
+        report["cases"][name] = result
+
+        print(f"\n{name} ({result['total_s']:.2f} s total)")
+        print(f"{'wall s':>9} {'cpu s':>9} {'peak MB':>9}  stage")
+        for stage in result["stages"]:
+            rss = stage["peak_rss_mb"]
+            print(
+                f"{stage['wall_s']:9.2f} {stage['cpu_s']:9.2f} "
+                f"{'?' if rss is None else f'{rss:.0f}':>9}  {stage['stage']}"
+            )
+
+    report_path = os.path.join(opts.out_dir, f"report_{int(time.time())}.json")
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport written to {report_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Import-time guard for the plugin: imports the module QGIS loads at startup under
+`python -X importtime` and fails if it is too slow or pulls in heavy dependencies,
+which should only be imported when a dock is first opened.
+
+Only the plugin's own import time counts: the time spent importing QGIS and PyQt, which
+QGIS has loaded before any plugin, is subtracted. Run from the plugin folder with QGIS's
+Python, or with --stub-qgis to stand in for QGIS (see qgis_stub.py):
+    python benchmarks/bench_importtime.py [--budget-ms 25] [--top 15] [--stub-qgis]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.join(PLUGIN_DIR, "benchmarks")
+
+# modules QGIS has imported before loading plugins, not charged to the plugin
+HOST_MODULES = ["qgis", "PyQt5", "PyQt6", "sip"]
+
+# modules that must not be imported when QGIS loads the plugin
+HEAVY_MODULES = [
+    "raster_tools",
+    "dask",
+    "xarray",
+    "rioxarray",
+    "geopandas",
+    "shapely",
+    "osmnx",
+    "py3dep",
+    "numba",
+]
+
+
+def import_times(module, cwd, stub_qgis=False):
+    """
+    Imports a module in a fresh interpreter with -X importtime.
+    Args:
+        module: dotted module name to import
+        cwd: working directory of the interpreter
+        stub_qgis: install the QGIS stand-ins of qgis_stub.py first
+    Returns:
+        tuple of a dict mapping every imported module to its (self, cumulative) time in
+        ms, and the module's cumulative time in ms without the HOST_MODULES imported
+        under it
+    """
+    code = f"import {module}"
+    if stub_qgis:
+        code = (
+            f"import sys; sys.path.insert(0, {BENCH_DIR!r}); "
+            f"import qgis_stub; qgis_stub.install(); {code}"
+        )
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=cwd,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        sys.exit(f"Importing {module} failed:\n{proc.stderr[-2000:]}")
+    times = {}
+    rows = []  # (depth, name, cumulative ms) in the order -X importtime prints them
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cum_us, name = line[len("import time:") :].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        times[name.strip()] = (int(self_us) / 1000, int(cum_us) / 1000)
+        rows.append((depth, name.strip(), int(cum_us) / 1000))
+
+    # children are printed before their parent, walk backwards to see parents first
+    own = None
+    stack = []  # (depth, name) of the ancestors of the current row
+    for depth, name, cum_ms in reversed(rows):
+        while stack and stack[-1][0] >= depth:
+            stack.pop()
+        ancestors = [parent for _, parent in stack]
+        if name == module and not ancestors:
+            own = cum_ms
+        elif (
+            own is not None
+            and module in ancestors
+            and name.split(".")[0] in HOST_MODULES
+            and not any(parent.split(".")[0] in HOST_MODULES for parent in ancestors)
+        ):
+            own -= cum_ms
+        stack.append((depth, name))
+    return times, own
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=25,  # measured 6-7 ms, leaves headroom for slower machines
+        help="maximum plugin import time, without QGIS and PyQt",
+    )
+    parser.add_argument(
+        "--stub-qgis", action="store_true", help="run without QGIS, see qgis_stub.py"
+    )
+    parser.add_argument("--top", type=int, default=15, help="slowest modules shown")
+    opts = parser.parse_args(argv)
+
+    package = os.path.basename(PLUGIN_DIR)
+    module = f"{package}.r_tools"
+    times, total = import_times(module, os.path.dirname(PLUGIN_DIR), opts.stub_qgis)
+
+    plugin = {name: t for name, t in times.items() if name.startswith(package)}
+    print(
+        f"{module}: {total:.1f} ms without QGIS and PyQt "
+        f"({times[module][1]:.1f} ms cumulative, budget {opts.budget_ms:.0f} ms)"
+    )
+    print(f"\n{'self ms':>9} {'cum ms':>9}  module")
+    for name, (self_ms, cum_ms) in sorted(
+        plugin.items(), key=lambda item: -item[1][1]
+    )[: opts.top]:
+        print(f"{self_ms:9.1f} {cum_ms:9.1f}  {name}")
+
+    heavy = sorted(name for name in times if name.split(".")[0] in HEAVY_MODULES)
+    failed = False
+    if heavy:
+        roots = sorted({name.split(".")[0] for name in heavy})
+        print(f"\nFAIL: heavy modules imported at startup: {', '.join(roots)}")
+        failed = True
+    if total > opts.budget_ms:
+        print(f"\nFAIL: import took {total:.1f} ms, budget is {opts.budget_ms:.0f} ms")
+        failed = True
+    if not failed:
+        print("\nOK")
+    return int(failed)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
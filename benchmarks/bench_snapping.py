@@ -0,0 +1,88 @@
+"""
+Benchmark of facility-to-road snapping: the former row-wise GeoDataFrame.apply
+against the vectorized delvCost.snap_to_roads.
+
+Run from the plugin folder:
+    python benchmarks/bench_snapping.py
+"""
+
+import os
+import sys
+import time
+
+import geopandas as gpd
+import numpy as np
+import shapely
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from delivered_cost.delvCost import snap_to_roads  # noqa: E402
+
+SIZES = [1_000, 10_000, 50_000]
+N_ROADS = 20_000
+EXTENT = 100_000.0
+
+
+def make_data(n_pts, n_roads=N_ROADS, seed=0):
+    """
+    Generates random road segments and points in a square extent (EPSG:5070).
+    Args:
+        n_pts: number of points
+        n_roads: number of road segments
+        seed: random seed
+    Returns:
+        tuple of (points, roads) geopandas dataframes
+    """
+    rng = np.random.default_rng(seed)
+    start = rng.uniform(0, EXTENT, (n_roads, 2))
+    end = start + rng.normal(0, 500, (n_roads, 2))
+    rds = gpd.GeoDataFrame(
+        geometry=shapely.linestrings(np.stack([start, end], axis=1)), crs=5070
+    )
+    pnts = gpd.GeoDataFrame(
+        geometry=shapely.points(rng.uniform(0, EXTENT, (n_pts, 2))), crs=5070
+    )
+    return pnts, rds
+
+
+def snap_apply(pnts, rds):
+    """
+    The former snapping code, a Python-level loop per point.
+    """
+    saw = pnts.copy()
+    saw["cline"] = rds.iloc[rds.sindex.nearest(saw.geometry, return_all=False)[1]][
+        "geometry"
+    ].values
+    saw["npt"] = saw.apply(
+        lambda row: row["cline"].interpolate(row["cline"].project(row["geometry"])),
+        axis=1,
+    )
+    return saw.set_geometry("npt")
+
+
+def timed(fn, *args, **kwargs):
+    """
+    Returns the wall time in seconds and the result of calling fn.
+    """
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def main():
+    print(f"{'points':>8} {'apply (s)':>10} {'vectorized (s)':>15} {'speedup':>8}")
+    for n in SIZES:
+        pnts, rds = make_data(n)
+        rds.sindex  # build the tree outside the timings
+        t_apply, old = timed(snap_apply, pnts, rds)
+        t_vec, new = timed(snap_to_roads, pnts, rds)
+        assert np.allclose(
+            shapely.get_coordinates(old.geometry.values),
+            shapely.get_coordinates(new.geometry.values),
+        )
+        print(f"{n:>8} {t_apply:>10.3f} {t_vec:>15.3f} {t_apply / t_vec:>7.1f}x")
+    t_k, snapped = timed(snap_to_roads, pnts, rds, k=3, max_distance=1000)
+    print(f"k=3 within 1000 m for {n} points: {t_k:.3f} s, {len(snapped)} snaps")
+
+
+if __name__ == "__main__":
+    main()
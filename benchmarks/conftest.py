@@ -0,0 +1,104 @@
+"""
+Fixtures for the lazy calculator backend benchmarks.
+
+QGIS is stubbed in sys.modules before the backend is imported, see qgis_stub.py, so
+the benchmarks run with plain Python and time the raster code rather than QGIS.
+"""
+
+import importlib
+import os
+import sys
+
+import numpy as np
+import pytest
+import rasterio
+from rasterio.transform import from_origin
+
+import qgis_stub
+from qgis_stub import QgsProject, QgsRasterLayer
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# projected grid origin and cell size, and the same area in geographic coordinates
+CRS_GRIDS = {
+    "EPSG:5070": (-1_500_000.0, 2_500_000.0, 30.0),
+    "EPSG:4326": (-110.0, 45.0, 0.0003),
+}
+
+
+def write_tif(path, size, bands=1, crs="EPSG:5070", shift=0.0, scale=1.0, seed=0):
+    """
+    Writes a random float32 GeoTIFF.
+    Args:
+        path: output path
+        size: number of rows and columns
+        bands: number of bands
+        crs: CRS of the grid, a key of CRS_GRIDS
+        shift: grid offset in cells, a fraction gives a misaligned grid
+        scale: cell size multiplier, != 1 gives a different resolution
+        seed: random seed
+    Returns:
+        the path
+    """
+    x0, y0, res = CRS_GRIDS[crs]
+    res *= scale
+    transform = from_origin(x0 + shift * res, y0 - shift * res, res, res)
+    data = np.random.default_rng(seed).random((bands, size, size), dtype="float32")
+    with rasterio.open(
+        path,
+        "w",
+        driver="GTiff",
+        width=size,
+        height=size,
+        count=bands,
+        dtype="float32",
+        crs=crs,
+        transform=transform,
+        tiled=True,
+        blockxsize=256,
+        blockysize=256,
+    ) as dst:
+        dst.write(data)
+    return path
+
+
+@pytest.fixture(scope="session")
+def backend():
+    """
+    The lazy_calculator.backend package, imported as part of the plugin package so its
+    relative imports resolve.
+    """
+    qgis_stub.install()
+    sys.path.insert(0, os.path.dirname(PLUGIN_DIR))
+    package = os.path.basename(PLUGIN_DIR)
+    return importlib.import_module(f"{package}.lazy_calculator.backend")
+
+
+@pytest.fixture(scope="session")
+def work_dir(tmp_path_factory):
+    return str(tmp_path_factory.mktemp("lazy_backend"))
+
+
+@pytest.fixture(scope="session")
+def add_layer(backend, work_dir):
+    """
+    Writes a synthetic GeoTIFF and adds it to the stub project, once per name.
+    """
+
+    def add(name, *args, **kwargs):
+        project = QgsProject.instance()
+        if not project.mapLayersByName(name):
+            path = write_tif(os.path.join(work_dir, f"{name}.tif"), *args, **kwargs)
+            project.addMapLayer(QgsRasterLayer(path, name))
+        return name
+
+    return add
+
+
+@pytest.fixture(scope="session")
+def managers(backend):
+    """
+    A RasterManager and an ExpressionEvaluator sharing one LayerManager.
+    """
+    raster_manager = backend.RasterManager(backend.LayerManager())
+    return raster_manager, backend.ExpressionEvaluator(raster_manager)
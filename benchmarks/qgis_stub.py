@@ -0,0 +1,185 @@
+"""
+Stand-ins for the QGIS and PyQt modules the plugin imports, so the import-time guard
+and the benchmarks run with plain Python. The names the lazy calculator backend uses,
+a project holding raster layers by name, the message log and the Qt object model, work
+like their QGIS counterparts. Every other name a module is asked for is an empty class,
+which is enough for module-level imports, class definitions and decorators.
+"""
+
+import os
+import sys
+import tempfile
+import types
+import uuid
+
+MODULES = [
+    "qgis",
+    "qgis.core",
+    "qgis.gui",
+    "qgis.utils",
+    "qgis.PyQt",
+    "qgis.PyQt.QtCore",
+    "qgis.PyQt.QtGui",
+    "qgis.PyQt.QtWidgets",
+    "PyQt5",
+    "PyQt5.QtCore",
+    "PyQt5.QtGui",
+    "PyQt5.QtWidgets",
+]
+
+
+class QgsRasterLayer:
+    def __init__(self, source, name="", provider="gdal"):
+        self._source = source
+        self._name = name
+        self._id = f"{name}_{uuid.uuid4().hex[:8]}"
+
+    def source(self):
+        return self._source
+
+    def name(self):
+        return self._name
+
+    def id(self):
+        return self._id
+
+    def isValid(self):
+        return os.path.exists(self._source)
+
+
+class QgsProject:
+    _instance = None
+
+    def __init__(self):
+        self._layers = {}
+
+    @classmethod
+    def instance(cls):
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def addMapLayer(self, layer):
+        self._layers[layer.id()] = layer
+        return layer
+
+    def removeMapLayer(self, layer_id):
+        self._layers.pop(layer_id, None)
+
+    def mapLayers(self):
+        return dict(self._layers)
+
+    def mapLayersByName(self, name):
+        return [layer for layer in self._layers.values() if layer.name() == name]
+
+
+class QgsMessageLog:
+    @staticmethod
+    def logMessage(message, tag="", level=0):
+        pass
+
+
+class Qgis:
+    Info, Warning, Critical = 0, 1, 2
+
+
+class QgsProcessingUtils:
+    @staticmethod
+    def tempFolder():
+        return tempfile.gettempdir()
+
+
+class _Signal:
+    def __init__(self):
+        self._slots = []
+
+    def connect(self, slot):
+        self._slots.append(slot)
+
+    def emit(self, *args):
+        for slot in list(self._slots):
+            slot(*args)
+
+
+class pyqtSignal:
+    """Class attribute giving each instance its own signal, like PyQt's."""
+
+    def __init__(self, *types):
+        self.name = None
+
+    def __set_name__(self, owner, name):
+        self.name = f"_signal_{name}"
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        if self.name not in obj.__dict__:
+            obj.__dict__[self.name] = _Signal()
+        return obj.__dict__[self.name]
+
+
+def pyqtSlot(*types):
+    return lambda fn: fn
+
+
+class QObject:
+    def __init__(self, parent=None):
+        self._parent = parent
+
+
+class QRunnable:
+    def __init__(self):
+        pass
+
+
+class QThreadPool:
+    """Runs workers synchronously, so a benchmark times the whole save."""
+
+    @classmethod
+    def globalInstance(cls):
+        return cls()
+
+    def start(self, runnable):
+        runnable.run()
+
+
+class QSettings:
+    def value(self, key, default=None):
+        return default
+
+    def setValue(self, key, value):
+        pass
+
+
+class StubModule(types.ModuleType):
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        value = type(name, (), {"__init__": lambda self, *args, **kwargs: None})
+        setattr(self, name, value)
+        return value
+
+
+# working stand-ins, set on the stub modules in place of empty classes
+CORE_CLASSES = (QgsRasterLayer, QgsProject, QgsMessageLog, Qgis, QgsProcessingUtils)
+QTCORE_OBJECTS = (QObject, QRunnable, QThreadPool, QSettings, pyqtSignal, pyqtSlot)
+
+
+def install():
+    """
+    Registers the stub modules in sys.modules, linking each to its parent package.
+    """
+    for name in MODULES:
+        module = StubModule(name)
+        module.__path__ = []  # a package, so submodules can be imported
+        sys.modules[name] = module
+        parent, _, child = name.rpartition(".")
+        if parent:
+            setattr(sys.modules[parent], child, module)
+    for cls in CORE_CLASSES:
+        setattr(sys.modules["qgis.core"], cls.__name__, cls)
+    for qtcore in ("qgis.PyQt.QtCore", "PyQt5.QtCore"):
+        for obj in QTCORE_OBJECTS:
+            setattr(sys.modules[qtcore], obj.__name__, obj)
+        sys.modules[qtcore].qVersion = lambda: "5.15.15"  # read by resources.py
+        sys.modules[qtcore].qRegisterResourceData = lambda *args: True
@@ -0,0 +1,111 @@
+"""
+pytest-benchmark suite for the lazy raster calculator backend on synthetic GeoTIFFs.
+
+Times ExpressionEvaluator.evaluate, RasterManager.align_to_overlap, SafeEvaluator on
+deeply nested expressions and RasterSaver.save across raster sizes, band counts, CRSs
+and misaligned grids. QGIS is stubbed (see conftest.py), run from the plugin folder:
+    python -m pytest benchmarks/test_lazy_backend.py --benchmark-storage=benchmarks/baselines \\
+        --benchmark-compare=0001 --benchmark-compare-fail=median:20%
+and record a new baseline with --benchmark-save=baseline instead of the compare options.
+The committed baseline was recorded on Linux with CPython 3.11 and raster_tools 0.13.2,
+compare against a baseline recorded on the same machine.
+"""
+
+import os
+
+import pytest
+
+from conftest import CRS_GRIDS
+
+SIZES = [512, 2048]
+BANDS = [1, 3]
+
+
+def deep_expression(depth):
+    """
+    Builds an expression of two rasters nested `depth` parentheses deep.
+    """
+    expr = "r_0"
+    for _ in range(depth):
+        expr = f"({expr} + r_1) * 0.5"
+    return expr
+
+
+def aligned_pair(add_layer, size, bands, crs):
+    """
+    Adds two rasters on the same grid and returns the expression combining them.
+    """
+    tag = f"{size}px_{bands}b_{crs.replace(':', '')}"
+    a = add_layer(f"a_{tag}", size, bands, crs)
+    b = add_layer(f"b_{tag}", size, bands, crs, seed=1)
+    return f'"{a}" + "{b}" * 2'
+
+
+def misaligned_pair(add_layer, size):
+    """
+    Adds two rasters half a cell apart with different resolutions.
+    """
+    a = add_layer(f"ma_{size}px", size)
+    b = add_layer(f"mb_{size}px", size, shift=0.5, scale=1.5, seed=1)
+    return a, b
+
+
+@pytest.mark.parametrize("crs", list(CRS_GRIDS))
+@pytest.mark.parametrize("bands", BANDS)
+@pytest.mark.parametrize("size", SIZES)
+def test_evaluate_aligned(benchmark, managers, add_layer, size, bands, crs):
+    _, evaluator = managers
+    expr = aligned_pair(add_layer, size, bands, crs)
+    benchmark(evaluator.evaluate, expr)
+
+
+@pytest.mark.parametrize("crs", list(CRS_GRIDS))
+@pytest.mark.parametrize("bands", BANDS)
+@pytest.mark.parametrize("size", SIZES)
+def test_evaluate_compute_aligned(benchmark, managers, add_layer, size, bands, crs):
+    _, evaluator = managers
+    expr = aligned_pair(add_layer, size, bands, crs)
+    benchmark(lambda: evaluator.evaluate(expr).eval())
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_align_to_overlap_misaligned(benchmark, managers, add_layer, size):
+    raster_manager, _ = managers
+    rasters = raster_manager.get_rasters(list(misaligned_pair(add_layer, size)))
+    benchmark(raster_manager.align_to_overlap, rasters)
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_evaluate_misaligned(benchmark, managers, add_layer, size):
+    _, evaluator = managers
+    a, b = misaligned_pair(add_layer, size)
+    benchmark(evaluator.evaluate, f'"{a}" - "{b}"')
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_evaluate_reproject(benchmark, managers, add_layer, size):
+    _, evaluator = managers
+    a, b = misaligned_pair(add_layer, size)
+    benchmark(evaluator.evaluate, f'"{a}" - "{b}"', target_crs_authid="EPSG:4326")
+
+
+@pytest.mark.parametrize("depth", [25, 50, 100])
+def test_safe_evaluator_deep(benchmark, backend, managers, add_layer, depth):
+    raster_manager, _ = managers
+    rasters = {
+        "r_0": raster_manager.get_raster(add_layer("a_512px_1b_EPSG5070", 512)),
+        "r_1": raster_manager.get_raster(add_layer("b_512px_1b_EPSG5070", 512, seed=1)),
+    }
+    expr = deep_expression(depth)
+    benchmark(lambda: backend.SafeEvaluator(rasters).evaluate(expr))
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_raster_saver_save(benchmark, backend, managers, add_layer, work_dir, size):
+    _, evaluator = managers
+    a, _ = misaligned_pair(add_layer, size)
+    result = evaluator.evaluate(f'"{a}" * 2')
+    saver = backend.RasterSaver()
+    out = os.path.join(work_dir, f"saved_{size}px.tif")
+    layer = benchmark(saver.save, result, out)
+    assert layer is not None
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ RasterTools
+                                 A QGIS plugin
+ This plugin provides a raster calculator and delivered cost calculator.
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2025-07-31
+        git sha              : $Format:%H$
+        copyright            : (C) 2025 by Tim Van Driel
+        email                : timothy.vandriel@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import math
+import os
+
+import dask
+import numpy as np
+from dask.utils import parse_bytes
+
+DEFAULT_BLOCK = 256  # chunk sides are multiples of this without a native block layout
+MIN_CELLS = 256 * 256  # smallest chunk worth a dask task
+
+
+def native_block_shape(path):
+    """
+    Returns the (rows, cols) block shape of the first band of a raster file, or None if
+    the file cannot be opened with rasterio.
+
+    Args:
+        path (str): Path to the raster file.
+
+    Returns:
+        tuple[int, int] | None: The native block shape.
+    """
+    try:
+        import rasterio
+
+        with rasterio.open(path) as src:
+            return src.block_shapes[0]
+    except Exception:
+        return None
+
+
+def plan_chunks(shape, dtype, block=None, workers=None, target_mb=None) -> tuple:
+    """
+    Chooses a chunk shape for a raster from its size, dtype and native block layout.
+
+    Chunks hold at most `target_mb` of data, are small enough to give every worker at
+    least two chunks per band, are never smaller than one native block and are aligned
+    to the native blocks so each chunk reads whole blocks from disk.
+
+    Args:
+        shape (tuple): Raster shape as (bands, rows, cols) or (rows, cols).
+        dtype: Raster data type.
+        block (tuple[int, int], optional): Native (rows, cols) block shape of the source.
+        workers (int, optional): Number of dask workers, defaults to dask's num_workers
+            setting or the CPU count.
+        target_mb (float, optional): Memory target per chunk in MB, defaults to dask's
+            array.chunk-size setting.
+
+    Returns:
+        tuple: Chunk shape as (1, rows, cols).
+    """
+    rows, cols = shape[-2:]
+    by, bx = block or (DEFAULT_BLOCK, DEFAULT_BLOCK)
+    by, bx = max(1, min(by, rows)), max(1, min(bx, cols))
+    if target_mb is None:
+        target = parse_bytes(dask.config.get("array.chunk-size"))
+    else:
+        target = target_mb * 1024**2
+    workers = workers or dask.config.get("num_workers", None) or os.cpu_count() or 1
+
+    cells = target / np.dtype(dtype).itemsize
+    cells = min(cells, rows * cols / (2 * workers))
+    cells = max(cells, by * bx, MIN_CELLS)
+    if bx >= cols:
+        # strip layout, keep full rows so chunks read whole strips
+        cy, cx = cells / cols, cols
+    else:
+        cy = cx = math.sqrt(cells)
+    cy = min(rows, max(by, int(cy) // by * by))
+    cx = min(cols, max(bx, int(cx) // bx * bx))
+    return (1, cy, cx)
+
+
+def chunk_raster(raster, block=None, workers=None, target_mb=None):
+    """
+    Rechunks a raster_tools Raster with the chunk shape chosen by plan_chunks.
+
+    Args:
+        raster (raster_tools.Raster): The raster to rechunk.
+        block (tuple[int, int], optional): Native (rows, cols) block shape of the source.
+        workers (int, optional): Number of dask workers.
+        target_mb (float, optional): Memory target per chunk in MB.
+
+    Returns:
+        raster_tools.Raster: The rechunked raster.
+    """
+    return raster.chunk(plan_chunks(raster.shape, raster.dtype, block, workers, target_mb))
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ RasterTools
+                                 A QGIS plugin
+ This plugin provides a raster calculator and delivered cost calculator.
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2025-07-31
+        git sha              : $Format:%H$
+        copyright            : (C) 2025 by Tim Van Driel
+        email                : timothy.vandriel@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+SETTINGS_PREFIX = "rasterTools/compute"
+
+
+class ComputeSettings:
+    """
+    Chooses how dask executes the computes of both tools: a thread pool, or an
+    in-process dask.distributed LocalCluster with a memory limit. Both run on threads,
+    as worker processes would start the QGIS binary instead of a Python interpreter.
+
+    The scheduler is passed to each compute instead of being set in the global dask
+    config, which would also apply to computes running at the same time on other
+    threads.
+    """
+
+    SCHEDULERS = ["threads", "distributed"]
+
+    def __init__(self):
+        self.scheduler = "threads"
+        self.workers = 0  # 0 lets dask choose (number of cores)
+        self.memory_limit = ""  # e.g. "4GB", distributed only
+        self.spill_dir = ""  # spill directory of the distributed cluster
+        self._pool = None
+        self._cluster = None
+        self._client = None
+
+    def load(self):
+        """
+        Loads the settings from the QGIS user settings.
+        """
+        from qgis.PyQt.QtCore import QSettings
+
+        s = QSettings()
+        self.scheduler = s.value(f"{SETTINGS_PREFIX}/scheduler", self.scheduler)
+        if self.scheduler not in self.SCHEDULERS:
+            self.scheduler = "threads"  # e.g. "processes", saved by earlier versions
+        self.workers = int(s.value(f"{SETTINGS_PREFIX}/workers", self.workers))
+        self.memory_limit = s.value(f"{SETTINGS_PREFIX}/memory_limit", "")
+        self.spill_dir = s.value(f"{SETTINGS_PREFIX}/spill_dir", "")
+        return self
+
+    def save(self):
+        """
+        Saves the settings to the QGIS user settings and stops a running pool or cluster
+        so the next compute starts one with the new settings.
+        """
+        from qgis.PyQt.QtCore import QSettings
+
+        s = QSettings()
+        s.setValue(f"{SETTINGS_PREFIX}/scheduler", self.scheduler)
+        s.setValue(f"{SETTINGS_PREFIX}/workers", self.workers)
+        s.setValue(f"{SETTINGS_PREFIX}/memory_limit", self.memory_limit)
+        s.setValue(f"{SETTINGS_PREFIX}/spill_dir", self.spill_dir)
+        self.shutdown()
+
+    def client(self):
+        """
+        Returns the dask.distributed client, starting a LocalCluster on first use.
+
+        Raises:
+            ImportError: If dask.distributed is not installed.
+        """
+        if self._client is None:
+            from dask.distributed import Client, LocalCluster
+
+            self._cluster = LocalCluster(
+                n_workers=1,
+                processes=False,
+                threads_per_worker=self.workers or None,
+                memory_limit=self.memory_limit or "auto",
+                local_directory=self.spill_dir or None,
+            )
+            self._client = Client(self._cluster, set_as_default=False)
+        return self._client
+
+    def dask_scheduler(self):
+        """
+        Returns the scheduler to pass to dask computes, e.g. dask.compute(..., scheduler=).
+
+        Returns:
+            concurrent.futures.ThreadPoolExecutor | distributed.Client: A thread pool
+                shared by all computes, or the client of the LocalCluster.
+
+        Raises:
+            ImportError: If the distributed scheduler is chosen but not installed.
+        """
+        if self.scheduler == "distributed":
+            return self.client()
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.workers or os.cpu_count(), thread_name_prefix="dask"
+            )
+        return self._pool
+
+    def shutdown(self):
+        """
+        Closes the thread pool and the dask.distributed client and cluster, if running.
+        """
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+        if self._client is not None:
+            self._client.close()
+            self._cluster.close()
+            self._client = self._cluster = None
+
+
+# singleton instance for the compute settings
+compute_settings = None
+
+
+def get_compute_settings() -> ComputeSettings:
+    """
+    Returns the singleton ComputeSettings, loaded from the QGIS user settings on first use.
+
+    Returns:
+        ComputeSettings: The shared compute settings.
+    """
+    global compute_settings
+    if compute_settings is None:
+        compute_settings = ComputeSettings().load()
+    return compute_settings
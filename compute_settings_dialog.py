@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ RasterTools
+                                 A QGIS plugin
+ This plugin provides a raster calculator and delivered cost calculator.
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2025-07-31
+        git sha              : $Format:%H$
+        copyright            : (C) 2025 by Tim Van Driel
+        email                : timothy.vandriel@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+from qgis.PyQt.QtWidgets import (
+    QComboBox,
+    QDialog,
+    QDialogButtonBox,
+    QFileDialog,
+    QFormLayout,
+    QHBoxLayout,
+    QLineEdit,
+    QMessageBox,
+    QPushButton,
+    QSpinBox,
+)
+
+from .compute_settings import get_compute_settings
+from .temp_store import get_temp_store
+
+
+class ComputeSettingsDialog(QDialog):
+    """
+    Settings panel for the dask scheduler used by the delivered cost and
+    lazy raster calculator computes.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Raster Tools Compute Settings")
+        self.settings = get_compute_settings()
+        self.temp_store = get_temp_store()
+
+        self.schedulerComboBox = QComboBox()
+        self.schedulerComboBox.addItems(self.settings.SCHEDULERS)
+        self.schedulerComboBox.setCurrentText(self.settings.scheduler)
+        self.schedulerComboBox.currentTextChanged.connect(self.update_enabled)
+
+        self.workersSpinBox = QSpinBox()
+        self.workersSpinBox.setRange(0, 256)
+        self.workersSpinBox.setSpecialValueText("Auto")
+        self.workersSpinBox.setValue(self.settings.workers)
+
+        self.memoryLineEdit = QLineEdit(self.settings.memory_limit)
+        self.memoryLineEdit.setPlaceholderText("auto, e.g. 4GB")
+
+        self.spillLineEdit = QLineEdit(self.settings.spill_dir)
+        self.spillLineEdit.setPlaceholderText("system temp folder")
+        self.spillBrowseButton = QPushButton("...")
+        self.spillBrowseButton.clicked.connect(self.browse_spill_dir)
+        spill = QHBoxLayout()
+        spill.addWidget(self.spillLineEdit)
+        spill.addWidget(self.spillBrowseButton)
+
+        self.quotaSpinBox = QSpinBox()
+        self.quotaSpinBox.setRange(0, 10240)
+        self.quotaSpinBox.setSuffix(" GB")
+        self.quotaSpinBox.setSpecialValueText("Unlimited")
+        self.quotaSpinBox.setValue(round(self.temp_store.quota_mb / 1024))
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+
+        layout = QFormLayout(self)
+        layout.addRow("Scheduler", self.schedulerComboBox)
+        layout.addRow("Workers", self.workersSpinBox)
+        layout.addRow("Memory limit", self.memoryLineEdit)
+        layout.addRow("Spill directory", spill)
+        layout.addRow("Temporary outputs quota", self.quotaSpinBox)
+        layout.addRow(buttons)
+        self.update_enabled()
+
+    def update_enabled(self):
+        """
+        The memory limit and spill directory only apply to a distributed cluster.
+        """
+        distributed = self.schedulerComboBox.currentText() == "distributed"
+        self.memoryLineEdit.setEnabled(distributed)
+        self.spillLineEdit.setEnabled(distributed)
+        self.spillBrowseButton.setEnabled(distributed)
+
+    def browse_spill_dir(self):
+        """
+        Lets the user pick the spill directory.
+        """
+        path = QFileDialog.getExistingDirectory(
+            self, "Select Spill Directory", self.spillLineEdit.text()
+        )
+        if path:
+            self.spillLineEdit.setText(path)
+
+    def accept(self):
+        """
+        Saves the settings, checking dask.distributed is installed if it was chosen.
+        """
+        scheduler = self.schedulerComboBox.currentText()
+        if scheduler == "distributed":
+            try:
+                import distributed  # noqa: F401
+            except ImportError:
+                QMessageBox.warning(
+                    self,
+                    "Missing Dependency",
+                    "The distributed scheduler requires dask.distributed. "
+                    "Please install it or choose another scheduler.",
+                )
+                return
+        self.settings.scheduler = scheduler
+        self.settings.workers = self.workersSpinBox.value()
+        self.settings.memory_limit = self.memoryLineEdit.text().strip()
+        self.settings.spill_dir = self.spillLineEdit.text().strip()
+        self.settings.save()
+        self.temp_store.quota_mb = self.quotaSpinBox.value() * 1024
+        self.temp_store.save()
+        super().accept()
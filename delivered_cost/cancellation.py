@@ -0,0 +1,109 @@
+"""
+/***************************************************************************
+ RasterTools
+                                 A QGIS plugin
+ This plugin provides a raster calculator and delivered cost calculator.
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2025-07-31
+        git sha              : $Format:%H$
+        copyright            : (C) 2025 by Tim Van Driel
+        email                : timothy.vandriel@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import os
+import shutil
+import threading
+
+from dask.callbacks import Callback
+
+
+class RunCancelledError(Exception):
+    """Raised when a delivered cost run is cancelled."""
+
+
+class CancellationToken:
+    """
+    Thread-safe flag a caller sets to ask a running analysis to stop.
+    """
+
+    def __init__(self, event=None):
+        """
+        Args:
+            event: optional event to wrap, e.g. a multiprocessing Manager event shared
+                with worker processes. A new threading.Event is used by default.
+        """
+        self._event = event if event is not None else threading.Event()
+
+    def cancel(self):
+        """
+        Requests cancellation.
+        """
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def check(self):
+        """
+        Raises RunCancelledError if cancellation was requested.
+        """
+        if self._event.is_set():
+            raise RunCancelledError("Run cancelled")
+
+
+class CancelCallback(Callback):
+    """
+    Dask callback that aborts a running task graph once its token is cancelled.
+
+    The token is checked before every task starts, so no new tasks are scheduled after a
+    cancel and the compute raises RunCancelledError as soon as the running tasks return.
+    """
+
+    def __init__(self, token: CancellationToken):
+        super().__init__()
+        self.token = token
+
+    def _start(self, dsk):
+        self.token.check()
+
+    def _pretask(self, key, dsk, state):
+        self.token.check()
+
+
+def remove_partial_outputs(paths):
+    """
+    Removes the files, Zarr stores and folders a cancelled run created. Only the given
+    paths are touched, so other runs writing to the same folder keep their outputs.
+
+    Args:
+        paths (iterable[str]): Paths the run created or started writing.
+
+    Returns:
+        list[str]: Paths of the removed files.
+    """
+    removed = []
+    for path in paths:
+        for candidate in (path, f"{path}.aux.xml"):
+            try:
+                if os.path.isdir(candidate):
+                    shutil.rmtree(candidate)  # Zarr store or scratch folder
+                elif os.path.exists(candidate):
+                    os.remove(candidate)
+                else:
+                    continue
+                removed.append(candidate)
+            except OSError:
+                pass  # still open elsewhere, e.g. on Windows
+    return removed
@@ -0,0 +1,246 @@
+"""
+/***************************************************************************
+ RasterTools
+                                 A QGIS plugin
+ This plugin provides a raster calculator and delivered cost calculator.
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2025-07-31
+        git sha              : $Format:%H$
+        copyright            : (C) 2025 by Tim Van Driel
+        email                : timothy.vandriel@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+
+Headless entry point for the delivered cost analysis.
+
+Example:
+    python -m delivered_cost.cli --aoi stands.shp --facilities mills.shp \\
+        --params params.yaml --out-dir ./out --scheduler threads
+"""
+
+import argparse
+import contextlib
+import inspect
+import json
+import os
+import sys
+import time
+import traceback
+
+import geopandas as gpd
+from shapely.geometry import MultiPolygon
+
+SCHEDULERS = ["threads", "processes", "synchronous"]
+
+# run() arguments that are set by the CLI itself rather than the parameter file
+RESERVED_ARGS = {
+    "study_area_coords",
+    "saw_coords",
+    "out_dir",
+    "scheduler",
+    "cancel_token",
+    "on_output",
+    "profile_name",
+    "pbar",
+    "log",
+}
+
+
+def log_stderr(msg):
+    """
+    Logs a message to stderr so stdout only carries the run report.
+    Args:
+        msg: message to log
+    """
+    print(msg, file=sys.stderr, flush=True)
+
+
+def read_aois(path):
+    """
+    Reads AOI polygons from a vector file.
+    Args:
+        path: path to a polygon vector file
+    Returns:
+        list of AOI coordinate lists in EPSG:4326
+    """
+    gdf = gpd.read_file(path).to_crs(4326)
+    aois = []
+    for geom in gdf.geometry:
+        polys = geom.geoms if isinstance(geom, MultiPolygon) else [geom]
+        aois.extend(list(poly.exterior.coords) for poly in polys)
+    if not aois:
+        raise ValueError(f"No AOI polygons found in {path}")
+    return aois
+
+
+def read_facilities(path):
+    """
+    Reads facility points from a vector file.
+    Args:
+        path: path to a point vector file
+    Returns:
+        list of (x, y) facility coordinates in EPSG:4326
+    """
+    gdf = gpd.read_file(path).to_crs(4326)
+    coords = [(pt.x, pt.y) for pt in gdf.geometry]
+    if not coords:
+        raise ValueError(f"No facility points found in {path}")
+    return coords
+
+
+def read_params(path):
+    """
+    Reads run parameters from a YAML file and checks them against delvCost.run.
+    Args:
+        path: path to a YAML file of run() keyword arguments, or None
+    Returns:
+        dict of run() keyword arguments
+    """
+    if path is None:
+        return {}
+    import yaml
+
+    from .delvCost import run
+
+    with open(path) as f:
+        params = yaml.safe_load(f) or {}
+    allowed = set(inspect.signature(run).parameters) - RESERVED_ARGS
+    unknown = set(params) - allowed
+    if unknown:
+        raise ValueError(f"Unknown parameters: {', '.join(sorted(unknown))}")
+    return params
+
+
+def run_headless(
+    aoi_path,
+    facilities_path,
+    params_path=None,
+    out_dir=".",
+    scheduler="threads",
+    workers=None,
+):
+    """
+    Runs the delivered cost analysis without QGIS and returns a run report.
+    Args:
+        aoi_path: path to a polygon vector file, each polygon is run as a job
+        facilities_path: path to a point vector file of facilities
+        params_path: optional path to a YAML file of run() keyword arguments
+        out_dir: directory for output rasters and the run report
+        scheduler: dask scheduler used for computes, one of SCHEDULERS
+        workers: optional number of dask workers, or worker processes for several AOIs
+    Returns:
+        dict run report with status, timing, outputs and any error
+    """
+    import dask
+
+    report = {
+        "status": "failed",
+        "aoi": os.path.abspath(aoi_path),
+        "facilities": os.path.abspath(facilities_path),
+        "out_dir": os.path.abspath(out_dir),
+        "scheduler": scheduler,
+        "workers": workers,
+        "params": {},
+        "outputs": {},
+        "jobs": [],
+        "error": None,
+    }
+    start = time.time()
+    try:
+        os.makedirs(out_dir, exist_ok=True)
+        params = read_params(params_path)
+        report["params"] = params
+        aois = read_aois(aoi_path)
+        args = dict(params, saw_coords=read_facilities(facilities_path))
+
+        with dask.config.set(scheduler=scheduler, num_workers=workers):
+            if len(aois) == 1:
+                from .delvCost import run
+                from .profiler import report_name
+
+                profile_name = report_name()
+                report["outputs"] = run(
+                    study_area_coords=aois[0],
+                    out_dir=out_dir,
+                    profile_name=profile_name,
+                    log=log_stderr,
+                    **args,
+                )
+                report["stage_report"] = os.path.join(out_dir, f"{profile_name}.json")
+            else:
+                from .job_queue import DeliveredCostJobQueue, build_jobs
+
+                jobs = build_jobs(aois, dict(args, log=log_stderr))
+                queue = DeliveredCostJobQueue(jobs, out_dir, workers)
+                report["outputs"] = queue.run(
+                    on_status=lambda job: log_stderr(f"Job {job.job_id}: {job.status}")
+                )
+                report["jobs"] = [
+                    {
+                        "job_id": job.job_id,
+                        "aois": len(job.aois),
+                        "status": job.status,
+                        "error": job.error,
+                    }
+                    for job in jobs
+                ]
+        failed = [job for job in report["jobs"] if job["status"] == "failed"]
+        report["status"] = "partial" if failed else "ok"
+    except Exception as e:
+        report["error"] = f"{e}\n{traceback.format_exc()}"
+    report["elapsed_s"] = round(time.time() - start, 3)
+    return report
+
+
+def main(argv=None):
+    """
+    Command line entry point. Prints the run report as JSON to stdout, writes it to
+    the output directory and exits non-zero if the run did not succeed.
+    Args:
+        argv: optional list of command line arguments
+    Returns:
+        int exit code
+    """
+    parser = argparse.ArgumentParser(
+        description="Run the delivered cost analysis without QGIS."
+    )
+    parser.add_argument("--aoi", required=True, help="polygon vector file")
+    parser.add_argument("--facilities", required=True, help="point vector file")
+    parser.add_argument("--params", help="YAML file of delvCost.run parameters")
+    parser.add_argument("--out-dir", default=".", help="output directory")
+    parser.add_argument("--scheduler", choices=SCHEDULERS, default="threads")
+    parser.add_argument("--workers", type=int, help="number of dask/process workers")
+    parser.add_argument(
+        "--report", help="report path, defaults to <out-dir>/run_report.json"
+    )
+    opts = parser.parse_args(argv)
+
+    # keep stdout for the report, dask progress bars and prints go to stderr
+    with contextlib.redirect_stdout(sys.stderr):
+        report = run_headless(
+            opts.aoi,
+            opts.facilities,
+            params_path=opts.params,
+            out_dir=opts.out_dir,
+            scheduler=opts.scheduler,
+            workers=opts.workers,
+        )
+
+    report_path = opts.report or os.path.join(opts.out_dir, "run_report.json")
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report))
+    return 0 if report["status"] == "ok" else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -50,6 +50,8 @@ from PyQt5.QtWidgets import QMessageBox
 from PyQt5.QtCore import QTimer, QThreadPool
 from .draw_polygon_tool import DrawPolygonTool
 from .pick_point_tool import PickPointTool
+from ..zarr_output import layer_uri
+from ..temp_store import get_temp_store
 from PyQt5.QtGui import QColor
 
 
@@ -72,6 +74,9 @@ class DeliveredCostDockWidget(QtWidgets.QDockWidget, FORM_CLASS):
         # #widgets-and-dialogs-with-auto-connect
         self.setupUi(self)
         self.threadpool = QThreadPool.globalInstance()
+        self.worker = None  # running analysis worker, if any
+        self.run_dir = None  # temp store folder of the running analysis
+        self.result_paths = set()  # output rasters of the current run already on the map
         # Make log textbox read-only
         self.plainTextEdit.setReadOnly(True)
         # Manage the OSM layer
@@ -220,6 +225,7 @@ class DeliveredCostDockWidget(QtWidgets.QDockWidget, FORM_CLASS):
         self.drawTool.polygonCompleted.connect(self.handle_polygon_completed)
         self.drawPolygonButton.clicked.connect(self.activate_draw_tool)
         self.aoi_geometry = None  # Store drawn polygon geometry
+        self.aoi_geometries = []  # Store all AOI polygons for the job queue
         self.aoi_layer_id = None  # Store AOI layer ID
 
         # Initialize pick point tool
@@ -232,6 +238,7 @@ class DeliveredCostDockWidget(QtWidgets.QDockWidget, FORM_CLASS):
 
         # Connect run button
         self.runButton.clicked.connect(self.run_delivered_cost)
+        self.cancelButton.clicked.connect(self.cancel_delivered_cost)
 
     def update_spinbox_from_slider(self, slider, spinbox):
         """Update spinbox value based on slider value."""
@@ -370,9 +377,13 @@ class DeliveredCostDockWidget(QtWidgets.QDockWidget, FORM_CLASS):
         if aoi_layer is None or not aoi_layer.isValid():  # Check if layer is valid
             return None
 
-        # Get the first feature's geometry
-        feature = next(aoi_layer.getFeatures())
-        self.aoi_geometry = feature.geometry()
+        # Keep every polygon for the job queue, the first one for single runs
+        self.aoi_geometries = [
+            feature.geometry() for feature in aoi_layer.getFeatures()
+        ]
+        self.aoi_geometry = (
+            QgsGeometry(self.aoi_geometries[0]) if self.aoi_geometries else None
+        )
         return aoi_layer.crs()  # Return the CRS of the AOI layer
 
     def get_selected_facility_layer(self):
@@ -551,49 +562,62 @@ class DeliveredCostDockWidget(QtWidgets.QDockWidget, FORM_CLASS):
 
     def handle_results(self, result_dict):
         """Handle the results from the delivered cost analysis worker.
+        Outputs that were already streamed to the map are not loaded again.
         Args:
             result_dict (dict): Dictionary containing layer names and their file paths.
-        Raises:
-            RuntimeError: If any raster layer fails to load or is invalid.
         """
         self.log_to_textbox("Delivered Cost Analysis completed successfully.")
-        self.runButton.setEnabled(True)
-        i = 2
+        for name, dest_path in result_dict.items():
+            self.add_result_layer(name, dest_path)
+        self.set_running(False)  # after the layers reference the outputs
+
+    def add_result_layer(self, name, dest_path):
+        """Add a saved output raster to the project with the delivered cost symbology.
+        Connected to the worker's output signal so each raster appears as soon as it is written.
+        Args:
+            name (str): The layer name.
+            dest_path (str): The file path of the raster.
+        Raises:
+            RuntimeError: If the raster layer fails to load or is invalid.
+        """
+        if dest_path in self.result_paths:
+            return
         try:
-            for name, dest_path in result_dict.items():
-                layer = QgsRasterLayer(dest_path, name)
-                layer.setCustomProperty("delivered_cost_plugin/temp", True)
-
-                # Ensure the raster layer is valid
-                if not layer.isValid():
-                    raise RuntimeError("Raster layer failed to load.")
-
-                # Trigger stats computation so QGIS knows actual min/max values
-                provider = layer.dataProvider()
-                stats = provider.bandStatistics(1, QgsRasterBandStats.All)
-                min_val = stats.minimumValue
-                max_val = stats.maximumValue
-
-                # Now apply symbology AFTER stats are known
-                if (
-                    "delivered" in name.lower()
-                    or "skidder" in name.lower()
-                    or "cable" in name.lower()
-                ):
-                    if max_val > 1000:
-                        self.log_to_textbox(
-                            f"Applying capped symbology to {name} with max value 1000"
-                        )
-                        apply_capped_symbology(layer, cap_value=1000)
-                    else:
-                        self.log_to_textbox(
-                            f"Applying uncapped symbology to {name} with max value {max_val}"
-                        )
-                        apply_capped_symbology(layer, cap_value=max_val)
+            layer = QgsRasterLayer(layer_uri(dest_path), name)
+            layer.setCustomProperty("delivered_cost_plugin/temp", True)
+
+            # Ensure the raster layer is valid
+            if not layer.isValid():
+                raise RuntimeError("Raster layer failed to load.")
+
+            # Trigger stats computation so QGIS knows actual min/max values
+            provider = layer.dataProvider()
+            stats = provider.bandStatistics(1, QgsRasterBandStats.All)
+            min_val = stats.minimumValue
+            max_val = stats.maximumValue
+
+            # Now apply symbology AFTER stats are known
+            if (
+                "delivered" in name.lower()
+                or "skidder" in name.lower()
+                or "cable" in name.lower()
+            ):
+                if max_val > 1000:
+                    self.log_to_textbox(
+                        f"Applying capped symbology to {name} with max value 1000"
+                    )
+                    apply_capped_symbology(layer, cap_value=1000)
+                else:
+                    self.log_to_textbox(
+                        f"Applying uncapped symbology to {name} with max value {max_val}"
+                    )
+                    apply_capped_symbology(layer, cap_value=max_val)
 
-                QgsProject.instance().addMapLayer(layer, addToLegend=False)
-                QgsProject.instance().layerTreeRoot().insertLayer(i, layer)
-                i += 1
+            QgsProject.instance().addMapLayer(layer, addToLegend=False)
+            QgsProject.instance().layerTreeRoot().insertLayer(
+                2 + len(self.result_paths), layer
+            )
+            self.result_paths.add(dest_path)
 
         except Exception as e:
             self.log_to_textbox(f"Error adding layers to project: {str(e)}")
@@ -605,7 +629,34 @@ class DeliveredCostDockWidget(QtWidgets.QDockWidget, FORM_CLASS):
         """
         self.log_to_textbox(f"Error: {error_message}")
         QMessageBox.critical(self, "Error", error_message)
-        self.runButton.setEnabled(True)
+        self.set_running(False)
+
+    def set_running(self, running):
+        """Toggle the run and cancel buttons while a worker is running.
+        Args:
+            running (bool): Whether an analysis is running.
+        """
+        self.runButton.setEnabled(not running)
+        self.cancelButton.setEnabled(running)
+        if not running:
+            self.worker = None
+            if self.run_dir is not None:
+                # the outputs can be evicted once no layer uses them
+                get_temp_store().release(self.run_dir)
+                self.run_dir = None
+
+    def cancel_delivered_cost(self):
+        """Ask the running analysis to stop."""
+        if self.worker is not None:
+            self.log_to_textbox("Cancelling...")
+            self.cancelButton.setEnabled(False)
+            self.worker.cancel()
+
+    def handle_cancelled(self):
+        """Handle a cancelled delivered cost analysis."""
+        self.log_to_textbox("Delivered Cost Analysis cancelled.")
+        self.progressBar.setValue(0)
+        self.set_running(False)
 
     def run_delivered_cost(self):
         """Run the delivered cost analysis with the selected AOI and Facility layers."""
@@ -688,6 +739,7 @@ class DeliveredCostDockWidget(QtWidgets.QDockWidget, FORM_CLASS):
         lt_p = self.logTruckPayloadSpinBox.value()
 
         cb_o = self.optionalSurfacesCheckBox.isChecked()
+        per_facility = self.perFacilityCheckBox.isChecked()
         args = {
             "study_area_coords": study_area_coords,
             "saw_coords": saw_coords,
@@ -707,17 +759,29 @@ class DeliveredCostDockWidget(QtWidgets.QDockWidget, FORM_CLASS):
             "cb_p": cb_p,
             "lt_p": lt_p,
             "cb_o": cb_o,
+            "per_facility": per_facility,
         }
-        self.runButton.setEnabled(False)  # Disable button to prevent multiple clicks
         self.log_to_textbox("Starting Delivered Cost Analysis...")
         try:
-            from .workers import DeliveredCostWorker
+            # unique output folder per run so runs never overwrite each other
+            self.run_dir = get_temp_store().run_dir("delivered_cost")
+            args["out_dir"] = self.run_dir
+            if len(self.aoi_geometries) > 1:
+                worker = self.create_queue_worker(args, aoi_crs)
+            else:
+                from .workers import DeliveredCostWorker
 
-            worker = DeliveredCostWorker(args)
+                self.progressBar.setMaximum(12)
+                worker = DeliveredCostWorker(args)
             worker.signals.log.connect(self.log_to_textbox)
             worker.signals.progress.connect(self.progressBar.setValue)
             worker.signals.finished.connect(self.handle_results)
             worker.signals.error.connect(self.show_error)
+            worker.signals.cancelled.connect(self.handle_cancelled)
+            worker.signals.output.connect(self.add_result_layer)
+            self.result_paths = set()
+            self.worker = worker
+            self.set_running(True)  # Disable run button to prevent multiple clicks
             self.threadpool.start(worker)
             # Reset state after starting the worker
             self.facility_layer_id = None
@@ -725,15 +789,46 @@ class DeliveredCostDockWidget(QtWidgets.QDockWidget, FORM_CLASS):
             self.facility_layer = None
             self.aoi_layer_id = None
             self.aoi_geometry = None
+            self.aoi_geometries = []
         except Exception as e:
             self.log_to_textbox(f"Error initializing worker: {str(e)}")
-            self.runButton.setEnabled(True)
+            self.set_running(False)
+
+    def create_queue_worker(self, args, aoi_crs):
+        """Create a worker that runs every AOI polygon as a queue of jobs.
+        Nearby polygons are grouped into one job so they share downloaded data.
+        Args:
+            args (dict): Arguments shared by all runs, the study area is set per job.
+            aoi_crs (QgsCoordinateReferenceSystem): The CRS of the AOI layer, or None for the project CRS.
+        Returns:
+            DeliveredCostQueueWorker: The worker running the job queue.
+        """
+        from .job_queue import build_jobs
+        from .workers import DeliveredCostQueueWorker
+
+        aois = [
+            qgs_to_coords_list_epsg4326(QgsGeometry(geom), source_crs=aoi_crs)
+            for geom in self.aoi_geometries
+        ]
+        shared = {
+            k: v for k, v in args.items() if k not in ("study_area_coords", "out_dir")
+        }
+        jobs = build_jobs(aois, shared)
+        self.log_to_textbox(
+            f"Queued {len(aois)} AOIs as {len(jobs)} jobs on {self.workersSpinBox.value()} workers"
+        )
+        self.progressBar.setMaximum(len(jobs))
+        self.progressBar.setValue(0)
+        return DeliveredCostQueueWorker(
+            jobs, args["out_dir"], self.workersSpinBox.value()
+        )
 
     def closeEvent(self, event):
         """Handle the close event of the dock widget.
         Args:
             event (QCloseEvent): The close event.
         """
+        self.cancel_delivered_cost()  # Stop a running analysis
         self.facility_coords = []  # Reset facility coordinates
         self.aoi_geometry = None  # Reset AOI geometry
         if (
@@ -22,15 +22,44 @@
 """
 
 # import raster_tools and modules
-from raster_tools import Raster, surface, distance, open_vectors, creation, Vector
-import os, time
+from raster_tools import Raster, surface, distance, open_vectors, creation
+from raster_tools.clipping import clip_box
+from raster_tools.masking import get_default_null_value
+from .rasterize import get_rasterize_cache
+from .profiler import StageProfiler
+from .cancellation import (
+    CancelCallback,
+    CancellationToken,
+    RunCancelledError,
+    remove_partial_outputs,
+)
+
+try:
+    from ..chunk_planner import chunk_raster, native_block_shape
+    from ..dtype_optimizer import narrow_after
+    from ..zarr_output import is_zarr_path, to_zarr
+    from ..temp_store import get_temp_store
+except ImportError:  # headless, delivered_cost is the top-level package
+    from chunk_planner import chunk_raster, native_block_shape
+    from dtype_optimizer import narrow_after
+    from zarr_output import is_zarr_path, to_zarr
+    from temp_store import get_temp_store
+import os, shutil, tempfile, time, threading, uuid
+from concurrent.futures import ThreadPoolExecutor
+import dask
+import dask.multiprocessing
+import dask.array as da
+import xarray as xr
+import shapely
 import geopandas as gpd
+from pyproj import CRS
 import numpy as np
+from dask.callbacks import Callback, normalize_callback
+from dask.core import flatten
 from dask.diagnostics import ProgressBar
 from shapely.geometry import box, Point, Polygon
 import osmnx as ox
 import pandas
-import numpy as np
 
 import py3dep
 
@@ -38,8 +67,11 @@ import py3dep
 # import rioxarray
 # import elevation
 
-
-from qgis.core import QgsProcessingUtils
+# QGIS is optional so the pipeline can also run headless (see cli.py)
+try:
+    from qgis.core import QgsProcessingUtils
+except ImportError:
+    QgsProcessingUtils = None
 
 
 import warnings
@@ -65,7 +97,23 @@ h_speed = {
     "motorway": 65,
 }
 # mtfcc_dic={'S1400':40,'S1200':56,'S1100':88}
-temp_dir = QgsProcessingUtils.tempFolder()
+
+# maxspeed unit conversions to mph. OSM reads unitless values as km/h, mph is opt-in
+# through maxspeed_unit for extracts where unitless values are mph
+speed_units = {
+    "mph": 1.0,
+    "km/h": 0.621371,
+    "kmh": 0.621371,
+    "kph": 0.621371,
+    "knots": 1.150779,
+}
+maxspeed_pattern = r"(\d+(?:\.\d+)?)\s*(mph|km/h|kmh|kph|knots)?"
+if QgsProcessingUtils is not None:
+    temp_dir = QgsProcessingUtils.tempFolder()
+else:
+    temp_dir = tempfile.gettempdir()
+# rasterized roads, barriers and facilities are reused across runs
+rasterize_cache_dir = os.path.join(temp_dir, "rasterize_cache")
 
 
 def get_osm_data(
@@ -128,7 +176,7 @@ def get_3dep_data(sgeo, res=30, out_crs=None):
         out_rs = py3dep.get_dem(sgeo_3857, res, 3857).expand_dims({"band": 1})
         if out_crs is not None:
             out_rs = out_rs.rio.reproject(out_crs)
-        return Raster(out_rs.chunk())
+        return chunk_raster(Raster(out_rs.chunk()))
     except Exception as e:
         print(f"WARNING: py3dep failed ({e}), falling back to elevation...")
 
@@ -145,7 +193,389 @@ def get_3dep_data(sgeo, res=30, out_crs=None):
         da = rioxarray.open_rasterio(dem_path, masked=True).squeeze("band", drop=True)
         if out_crs is not None:
             da = da.rio.reproject(out_crs)
-        return Raster(da.chunk())
+        return chunk_raster(Raster(da.chunk()), block=native_block_shape(dem_path))
+
+
+def get_local_dem(dem_path, sgeo, out_crs):
+    """
+    Reads a DEM from a local raster file instead of downloading one.
+    Args:
+        dem_path (str): path to a DEM raster covering the study area
+        sgeo (Polygon): Shapely Polygon in EPSG:4326 of the area to read
+        out_crs: target CRS
+    Returns:
+        Raster: the DEM clipped to the area as a raster-tools Raster object.
+    """
+    elv = Raster(dem_path)
+    if CRS.from_user_input(elv.crs) != CRS.from_user_input(out_crs):
+        elv = elv.reproject(out_crs)
+    bounds = gpd.GeoSeries([sgeo], crs=4326).to_crs(out_crs).total_bounds
+    return chunk_raster(clip_box(elv, bounds), block=native_block_shape(dem_path))
+
+
+def parse_maxspeed(maxspeed, default_unit="km/h"):
+    """
+    Parses OSM style maxspeed values ("50", "30 mph", "100 km/h", ...) into mph in one vectorized pass.
+    Values without a speed ("none", "signals", ...) give NaN, and of several values (a list or
+    "50;30") the first one is used.
+    Args:
+        maxspeed: pandas series of maxspeed values
+        default_unit (str): unit of values without one, a key of speed_units. OSM defines
+            unitless values as km/h, use "mph" only for extracts that tag mph without the unit
+    Returns:
+        numpy array of speeds in mph, NaN where no speed could be parsed
+    """
+    parts = maxspeed.astype(str).str.lower().str.extract(maxspeed_pattern)
+    units = parts[1].fillna(default_unit).map(speed_units)
+    return (parts[0].astype(float) * units).to_numpy(dtype=float)
+
+
+def road_speeds(rds, speed_table=None, default_speed=25, default_unit="km/h"):
+    """
+    Attributes roads with a travel speed from maxspeed, falling back to a speed per highway class.
+    Args:
+        rds: geopandas dataframe of roads with a highway and optional maxspeed column
+        speed_table (dict): optional mph per highway class, overrides entries of h_speed
+        default_speed (float): mph for roads with neither a maxspeed nor a known class
+        default_unit (str): unit of maxspeed values without one, see parse_maxspeed
+    Returns:
+        numpy array of speeds in mph
+    """
+    table = dict(h_speed, **(speed_table or {}))
+    speed = rds["highway"].map(table).fillna(default_speed).to_numpy(dtype=float)
+    if "maxspeed" in rds.columns:
+        tms = parse_maxspeed(rds["maxspeed"], default_unit)
+        speed = np.where(np.isnan(tms) | (tms <= 0), speed, tms)
+    return speed
+
+
+def snap_to_roads(pnts, rds, k=1, max_distance=None):
+    """
+    Snaps points onto their nearest road segments using vectorized shapely operations.
+    Args:
+        pnts: geopandas dataframe of points
+        rds: geopandas dataframe of road lines in the same crs
+        k (int): number of nearest roads to snap each point to
+        max_distance: optional cutoff in crs units, points farther from every road are dropped
+    Returns:
+        geopandas dataframe of snapped points with "facility" (row position of the source
+        point) and "snap_dist" columns, up to k rows per point
+    """
+    if k > 1 and max_distance is None:
+        raise ValueError("max_distance is required when snapping to k > 1 roads")
+    pts = pnts.geometry.values
+    if k == 1:
+        pi, ri = rds.sindex.nearest(pts, return_all=False, max_distance=max_distance)
+    else:
+        pi, ri = rds.sindex.query(pts, predicate="dwithin", distance=max_distance)
+    lns = rds.geometry.values[ri]
+    dist = shapely.distance(pts[pi], lns)
+    if k > 1:
+        # keep the k closest roads of each point
+        order = np.lexsort((dist, pi))
+        pi, lns, dist = pi[order], lns[order], dist[order]
+        first = np.searchsorted(pi, pi)
+        keep = (np.arange(len(pi)) - first) < k
+        pi, lns, dist = pi[keep], lns[keep], dist[keep]
+    npt = shapely.line_interpolate_point(lns, shapely.line_locate_point(lns, pts[pi]))
+    return gpd.GeoDataFrame(
+        {"facility": pi, "snap_dist": dist}, geometry=npt, crs=pnts.crs
+    )
+
+
+def plan_tiles(raster, tile_mb, n_surfaces=8, block=256):
+    """
+    Chooses a window shape so that the surfaces the local stages hold at once for one
+    window fit tile_mb. Only the local stages are windowed, the cost distance solves still
+    read the whole grid, so this does not bound the memory of a run.
+    Args:
+        raster: raster-tools Raster defining the processing grid
+        tile_mb (float): size in MB of the surfaces of one window
+        n_surfaces (int): number of float64 surfaces alive per tile during processing
+        block (int): tile sides are rounded down to a multiple of this block size
+    Returns:
+        tuple (rows, cols) of the tile shape
+    """
+    rows, cols = raster.shape[1:]
+    cells = (tile_mb * 1024**2) / (8 * n_surfaces)
+    side = max(block, int(np.sqrt(cells)) // block * block)
+    return min(side, rows), min(side, cols)
+
+
+def materialize(
+    raster, name, tile_mb=None, out_dir=None, scheduler=None, callbacks=None
+):
+    """
+    Evaluates a raster in memory or, with a window size, streams it to disk window by window.
+    Args:
+        raster: raster-tools Raster to evaluate
+        name (str): name used for the intermediate file
+        tile_mb: optional window size in MB, disk-backed when set
+        out_dir: optional directory for the intermediate file, defaults to the QGIS temp folder
+        scheduler: optional dask scheduler, defaults to the configured scheduler
+        callbacks: optional dask callbacks of the compute, e.g. the run's CancelCallback
+    Returns:
+        raster-tools Raster backed by memory or by the intermediate file
+    """
+    if tile_mb is None:
+        return compute_rasters([raster], scheduler, callbacks)[0]
+    chunks = raster.data.chunksize
+    # unique name, runs sharing a folder must not overwrite each other's intermediates
+    path = os.path.join(out_dir or temp_dir, f"tile_{name}_{uuid.uuid4().hex[:8]}.tif")
+    save_rasters(
+        {name: (raster, path)},
+        optimize_dtype=False,
+        scheduler=scheduler,
+        callbacks=callbacks,
+    )
+    return Raster(path).chunk(chunks)
+
+
+def facility_costs(
+    saw,
+    rds_rs,
+    b_dst_cs2,
+    elv,
+    oc,
+    opr,
+    s_c,
+    c_c,
+    tile_mb=None,
+    name="saw",
+    out_dir=None,
+    scheduler=None,
+    callbacks=None,
+):
+    """
+    Builds the delivered cost surfaces for a set of road-snapped facility points.
+    Args:
+        saw: geopandas dataframe of facility points snapped to the road network
+        rds_rs: raster of on-road travel costs
+        b_dst_cs2: off-road cost raster with barriers set to null
+        elv: elevation raster defining the grid
+        oc: raster of felling and processing costs
+        opr: raster of potential harvesting systems (1 skidder, 2 cable)
+        s_c, c_c: skidder and cable cost per meter
+        tile_mb: optional window size in MB of the disk-backed local stages
+        name (str): name used for the intermediate facility rasters
+        out_dir: optional directory for intermediate files
+        scheduler: optional dask scheduler, defaults to the configured scheduler
+        callbacks: optional dask callbacks of the computes
+    Returns:
+        tuple of (delivered cost, skidder cost, cable cost) rasters
+    """
+    rcache = get_rasterize_cache(rasterize_cache_dir)
+    burned = rcache.burn(
+        saw, elv, all_touched=True, scheduler=scheduler, callbacks=callbacks
+    )
+    saw_rs = materialize(burned["index"], name, tile_mb, out_dir, scheduler, callbacks)
+    on_d_saw = distance.cda_cost_distance(rds_rs, saw_rs, elv)
+    # the cost distance analysis reads its sources as int64, so they are not narrowed
+    src_saw = materialize(
+        (on_d_saw * 100).astype(int),
+        f"{name}_src",
+        tile_mb,
+        out_dir,
+        scheduler,
+        callbacks,
+    )
+
+    saw_d, saw_t, saw_a = distance.cost_distance_analysis(b_dst_cs2, src_saw, elv)
+
+    sk_saw_cost = (saw_d * s_c) + (saw_a / 100) + oc
+    cb_saw_cost = (saw_d * c_c) + (saw_a / 100) + oc
+
+    sc1 = sk_saw_cost * (opr == 1)
+    sc2 = cb_saw_cost * (opr == 2)
+    saw_cost = sc1 + sc2
+    saw_cost = saw_cost.where(saw_cost >= 0, np.nan)
+    return saw_cost, sk_saw_cost, cb_saw_cost
+
+
+def distributed_client(scheduler=None):
+    """
+    Returns the dask.distributed client computes run on, or None if they run on a local scheduler.
+    Args:
+        scheduler: optional dask scheduler passed to the computes, the default client is
+            used if None
+    """
+    try:
+        from distributed import Client, default_client
+    except ImportError:
+        return None
+    if scheduler is not None:
+        return scheduler if isinstance(scheduler, Client) else None
+    try:
+        return default_client()
+    except ValueError:
+        return None
+
+
+def concurrent_callbacks(callbacks):
+    """
+    Drops the ProgressBar from dask callback tuples passed to computes that run at the
+    same time, a ProgressBar only tracks one compute at a time.
+    Args:
+        callbacks: optional dask callback tuples, see dask.callbacks.normalize_callback
+    Returns:
+        list of the other callback tuples
+    """
+    return [
+        cb
+        for cb in callbacks or ()
+        if not isinstance(getattr(cb[0], "__self__", None), ProgressBar)
+    ]
+
+
+def compute_rasters(rasters, scheduler=None, callbacks=None):
+    """
+    Computes several rasters together and returns them as in-memory rasters.
+    Args:
+        rasters: list of raster-tools Raster objects
+        scheduler: optional dask scheduler, defaults to the configured scheduler
+        callbacks: optional dask callbacks of this compute only
+    Returns:
+        list of computed raster-tools Raster objects
+    """
+    xrs = dask.compute(
+        *[raster.xdata for raster in rasters], scheduler=scheduler, callbacks=callbacks
+    )
+    return [
+        Raster(xr_da).set_null_value(raster.null_value)
+        for xr_da, raster in zip(xrs, rasters)
+    ]
+
+
+def cheapest_facility(costs):
+    """
+    Finds the minimum delivered cost and the facility providing it for every cell.
+    Args:
+        costs: list of per-facility delivered cost rasters on the same grid
+    Returns:
+        tuple of (minimum cost raster, 1-based facility index raster with 0 as null)
+    """
+    template = costs[0].xdata
+    stack = da.stack([cost.data for cost in costs])
+    stack = da.where(da.isnan(stack), np.inf, stack)
+    low = stack.min(axis=0)
+    valid = da.isfinite(low)
+    idx = da.where(valid, stack.argmin(axis=0) + 1, 0).astype("uint16")
+    low = da.where(valid, low, np.nan)
+
+    def to_raster(data, null_value):
+        xr_da = xr.DataArray(data, coords=template.coords, dims=template.dims)
+        return Raster(xr_da).set_crs(costs[0].crs).set_null_value(null_value)
+
+    return to_raster(low, np.nan), to_raster(idx, 0)
+
+
+def client_lock(path):
+    """
+    Returns a dask.distributed lock guarding writes to one file across cluster workers.
+    """
+    from distributed import Lock
+
+    return Lock(f"rio-{path}")
+
+
+class SavedCallback(Callback):
+    """
+    Dask callback reporting each output of a shared compute as soon as all of its tasks ran.
+    """
+
+    def __init__(self, writes, on_saved):
+        """
+        Args:
+            writes (dict): mapping of (name, path) tuples to dask collections
+            on_saved: callable called with the name and path of every finished output
+        """
+        super().__init__()
+        self._pending = {
+            out: set(flatten(write.__dask_keys__())) for out, write in writes.items()
+        }
+        self._on_saved = on_saved
+
+    def _posttask(self, key, result, dsk, state, worker_id):
+        for out, keys in list(self._pending.items()):
+            if key in keys:
+                keys.discard(key)
+                if not keys:
+                    del self._pending[out]
+                    self._on_saved(*out)
+
+
+def save_rasters(
+    outputs,
+    on_saved=None,
+    optimize_dtype=True,
+    scheduler=None,
+    callbacks=None,
+    **gdal_kwargs,
+):
+    """
+    Saves several rasters with a single dask compute so shared upstream work is only done once.
+    Args:
+        outputs (dict): mapping of output names to (raster, path) tuples
+        on_saved: optional callable called with the name and path of each raster once it is written
+        optimize_dtype: rewrite each output with the narrowest dtype holding its values,
+            rounding floating point values to float32
+        scheduler: optional dask scheduler, defaults to the configured scheduler
+        callbacks: optional dask callbacks of this compute only, a dask.distributed
+            client runs the tasks on its workers and ignores them
+        gdal_kwargs: additional creation options passed to the GeoTIFF writer
+    Returns:
+        dict mapping output names to saved file paths
+
+    Paths ending in .zarr are written as Zarr stores, where each chunk is written by its
+    own task without the GeoTIFF lock. The value range used to narrow an output is
+    computed in the same pass as its write, so no output is computed twice.
+    """
+    client = distributed_client(scheduler)
+    geotiffs = any(not is_zarr_path(path) for _, path in outputs.values())
+    if (
+        client is None
+        and geotiffs
+        and dask.base.get_scheduler(scheduler=scheduler) is dask.multiprocessing.get
+    ):
+        # the GeoTIFF writers share a lock, which separate processes cannot do
+        scheduler = "threads"
+    writes = {}
+    for name, (raster, path) in outputs.items():
+        if raster.dtype == bool:
+            # burn the mask as 255 like Raster.save, a bool null value would mark every
+            # True cell as nodata
+            raster = raster.astype("uint8").set_null_value(get_default_null_value("uint8"))
+        xrs = raster.xdata
+        if raster.null_value is not None:
+            xrs = xrs.rio.write_nodata(raster.null_value)
+        if is_zarr_path(path):
+            write = to_zarr(xrs, path, compute=False)
+        else:
+            write = xrs.rio.to_raster(
+                path,
+                tiled=True,
+                lock=threading.Lock() if client is None else client_lock(path),
+                compute=False,
+                **gdal_kwargs,
+            )
+        if optimize_dtype:
+            # costs are estimates, float32 keeps 7 significant digits of them
+            write = narrow_after(write, path, xrs.data, raster.null_value, exact=False)
+        writes[(name, path)] = write
+    if on_saved is None:
+        dask.compute(*writes.values(), scheduler=scheduler, callbacks=callbacks)
+    elif client is not None:
+        from distributed import as_completed
+
+        futures = dict(zip(client.compute(list(writes.values())), writes))
+        for future in as_completed(futures):
+            future.result()
+            on_saved(*futures[future])
+    else:
+        saved = normalize_callback(SavedCallback(writes, on_saved))
+        callbacks = [*(callbacks or ()), saved]
+        dask.compute(*writes.values(), scheduler=scheduler, callbacks=callbacks)
+    return {name: path for name, (_, path) in outputs.items()}
 
 
 def _run(
@@ -153,6 +583,7 @@ def _run(
     saw_coords,
     lyr_roads_path=None,
     lyr_barriers_path=None,
+    dem_path=None,
     sk_r=2.44,
     cb_r=3.35,
     sk_d=165,
@@ -167,6 +598,20 @@ def _run(
     cb_p=1.04,
     lt_p=12.25,
     cb_o=False,
+    tile_mb=None,
+    per_facility=False,
+    workers=None,
+    out_dir=None,
+    scratch_dir=None,
+    created=None,
+    snap_k=1,
+    snap_max_dist=None,
+    speed_table=None,
+    maxspeed_unit="km/h",
+    out_format="tif",
+    scheduler=None,
+    callbacks=None,
+    on_output=None,
     pbar=None,
     log=None,
 ):
@@ -177,8 +622,27 @@ def _run(
         saw_coords: coordinates of the sawmill point(s)
         lyr_roads_path: optional path to roads vector data
         lyr_barriers_path: optional path to barriers vector data
+        dem_path: optional path to a local DEM raster, used instead of downloading 3DEP data
         sk_r, cb_r, sk_d, cb_d, fb_d, hf_d, pr_d, lt_d, ht_d, pf_d, sk_p, cb_p, lt_p: various rates and constants
         cb_o: bool, whether to save optional outputs
+        tile_mb: optional window size in MB for the local stages (slope, roads and facility
+            rasters), whose results are written to disk window by window instead of held in memory.
+            This is not a memory bound: the DEM and the cost distance solves still load the whole
+            AOI into memory, so AOIs larger than memory still fail
+        per_facility: bool, whether to save a cost surface per facility and a cheapest facility raster
+        workers: optional number of threads solving the per-facility surfaces in parallel, defaults to the CPU count
+        out_dir: optional directory for output rasters, defaults to the QGIS temp folder
+        scratch_dir: optional directory for the intermediate rasters of tile_mb, defaults to out_dir
+        created: optional list the output paths are appended to before they are written
+        snap_k: number of nearest roads each facility is snapped to
+        snap_max_dist: optional maximum snapping distance in meters, required when snap_k > 1
+        speed_table: optional dict of mph per highway class, overrides the default h_speed entries
+        maxspeed_unit: unit of OSM maxspeed values without one, "km/h" as OSM defines or "mph" for US-only extracts
+        out_format: output raster format, "tif" for GeoTIFF or "zarr" for Zarr stores written in parallel
+        scheduler: optional dask scheduler passed to the computes of this run, e.g. a thread pool or a
+            dask.distributed Client, defaults to the configured scheduler
+        callbacks: optional dask callback tuples, see dask.callbacks.normalize_callback, passed to the computes of this run only
+        on_output: optional callable called with the name and path of each output raster as soon as it is saved
         pbar: optional progress bar object to update
         log: optional logger function
 
@@ -186,6 +650,13 @@ def _run(
         dict mapping raster description keys to saved file paths
     """
     warnings.simplefilter("ignore")
+    if out_format not in ("tif", "zarr"):
+        raise ValueError(f"Unknown output format '{out_format}', use 'tif' or 'zarr'.")
+    out_ext = f".{out_format}"
+    if out_dir is None:
+        out_dir = temp_dir
+    os.makedirs(out_dir, exist_ok=True)
+    scratch_dir = scratch_dir or out_dir
     maybe_log(log, "Reading the data...")
     if pbar is not None:
         pbar.setValue(pbar.value() + 1)
@@ -230,9 +701,7 @@ def _run(
         wtrbd = get_osm_data(ply, osm_waterbody, out_crs=s_area.crs).reset_index()
     else:
         # if barriers vector file is provided, load barriers but set streams and waterbodies as empty GeoDataFrames to avoid errors
-        barv = open_vectors(lyr_barriers_path).compute()
-        if barv.crs != s_area.crs:
-            barv = barv.to_crs(s_area.crs)
+        barv = open_vectors(lyr_barriers_path).data.compute()
         strms = gpd.GeoDataFrame(geometry=[], crs=s_area.crs)
         wtrbd = gpd.GeoDataFrame(geometry=[], crs=s_area.crs)
 
@@ -242,71 +711,84 @@ def _run(
     wtrbd = wtrbd.to_crs(5070)
     saw = saw.to_crs(5070)
     s_area = s_area.to_crs(5070)
+    if lyr_barriers_path is not None:
+        barv = barv.to_crs(5070)
 
     maybe_log(log, "Getting elevation data...")
     if pbar is not None:
         pbar.setValue(pbar.value() + 1)
 
-    elv = get_3dep_data(ply, 30, out_crs=s_area.crs)
+    if dem_path is None:
+        elv = get_3dep_data(ply, 30, out_crs=s_area.crs)
+    else:
+        elv = get_local_dem(dem_path, ply, s_area.crs)
+    if tile_mb is not None:
+        tile = plan_tiles(elv, tile_mb)
+        maybe_log(
+            log,
+            f"Disk-backed mode: local stages in {tile[0]}x{tile[1]} cell windows, "
+            "cost distance still runs over the full grid in memory",
+        )
+        # slope windows overlap through the halo dask adds for neighborhood operations
+        elv = elv.chunk((1,) + tile)
 
     maybe_log(log, "Subsetting and attributing data...")
     if pbar is not None:
         pbar.setValue(pbar.value() + 1)
 
     # handle roads
-    if "maxspeed" in rds.columns:
-        rds["maxspeed"] = rds["maxspeed"].astype(str)
-    else:
-        rds["maxspeed"] = ""
-
-    rds["speed"] = rds["highway"].map(h_speed)
-    tms = rds.maxspeed.str.slice(0, 2)
-    tms = tms.where(tms.str.isnumeric(), 25).astype(float)
-    rds["speed"] = rds["speed"].where(rds["maxspeed"].isna(), tms)
+    rds["speed"] = road_speeds(rds, speed_table, default_unit=maxspeed_unit)
     rds["conv"] = 2 * (((1 / (rds["speed"] * 1609.344)) * lt_d) / lt_p)
 
     maybe_log(log, "Snapping sawmills to roads...")
     if pbar is not None:
         pbar.setValue(pbar.value() + 1)
-    tmp_rds_seg = rds.sindex.nearest(saw.geometry, return_all=False)[1]
-    lns = rds.iloc[tmp_rds_seg].geometry.values
-    saw["cline"] = lns
-    saw["npt"] = saw.apply(
-        lambda row: row["cline"].interpolate(row["cline"].project(row["geometry"])),
-        axis=1,
-    )
-    saw = saw.set_geometry("npt").set_crs(saw.crs)
+    n_saw = len(saw)
+    saw = snap_to_roads(saw, rds, k=snap_k, max_distance=snap_max_dist)
+    if saw["facility"].nunique() < n_saw:
+        maybe_log(
+            log,
+            f"{n_saw - saw['facility'].nunique()} facilities are farther than {snap_max_dist} m from a road and were skipped",
+        )
+    if saw.empty:
+        raise ValueError("No facilities could be snapped to the road network.")
 
     if lyr_barriers_path is None:
         strm_b = strms[strms["intermittent"].isna()].buffer(30)
         wb_b = wtrbd.buffer(30)
         barv = gpd.GeoDataFrame(geometry=pandas.concat([strm_b, wb_b]), crs=rds.crs)
 
-    bar2 = Vector(barv).to_raster(elv, all_touched=True).set_null_value(None) < 1
+    rcache = get_rasterize_cache(rasterize_cache_dir)
+    bar_rs = rcache.burn(
+        barv, elv, all_touched=True, scheduler=scheduler, callbacks=callbacks
+    )["index"]
+    bar2 = bar_rs.set_null_value(None) < 1
 
     maybe_log(log, "Creating base layers for threshholding...")
     if pbar is not None:
         pbar.setValue(pbar.value() + 1)
-    slp = surface.slope(elv, degrees=False).eval()
+    slp = materialize(
+        surface.slope(elv, degrees=False),
+        "slope",
+        tile_mb,
+        scratch_dir,
+        scheduler,
+        callbacks,
+    )
     c_rs = creation.constant_raster(elv).set_null_value(0)
-    rds_rs = Vector(rds).to_raster(elv, "conv").set_null_value(0).eval()
-
-    maybe_log(log, "Calculating on road hauling costs...")
-    if pbar is not None:
-        pbar.setValue(pbar.value() + 1)
-    saw_rs = Vector(saw).to_raster(elv).set_null_value(0).eval()
-    on_d_saw = distance.cda_cost_distance(rds_rs, saw_rs, elv)
-
-    src_saw = (on_d_saw * 100).astype(int)
-
-    maybe_log(log, "Calculating extraction costs...")
-    if pbar is not None:
-        pbar.setValue(pbar.value() + 1)
-
+    burned = rcache.burn(
+        rds,
+        elv,
+        attrs=["conv"],
+        all_touched=True,
+        scheduler=scheduler,
+        callbacks=callbacks,
+    )
+    rds_rs = materialize(
+        burned["conv"], "roads", tile_mb, scratch_dir, scheduler, callbacks
+    )
     b_dst_cs2 = bar2.set_null_value(0)
 
-    saw_d, saw_t, saw_a = distance.cost_distance_analysis(b_dst_cs2, src_saw, elv)
-
     maybe_log(log, "Calculating additional felling, processing, and treatment costs")
     if pbar is not None:
         pbar.setValue(pbar.value() + 1)
@@ -318,38 +800,103 @@ def _run(
     ht_cost = creation.constant_raster(elv, (ht_d * 0.222395)).astype(float)
     pf_cost = creation.constant_raster(elv, (pf_d * 0.222395)).astype(float)
 
-    maybe_log(log, "Combining costs...")
+    maybe_log(log, "Calculating potential harvesting systems...")
     if pbar is not None:
         pbar.setValue(pbar.value() + 1)
     s_c = 2 * (((1 / (sk_r * 1000)) * sk_d) / sk_p)
     c_c = 2 * (((1 / (cb_r * 1000)) * cb_d) / cb_p)
 
-    sk_saw_cost = (saw_d * s_c) + (saw_a / 100) + oc
-    cb_saw_cost = (saw_d * c_c) + (saw_a / 100) + oc
-
-    rd_dist = distance.cda_cost_distance(c_rs, (rds_rs > 0).astype(int), elv)
+    # road cells are the sources; a bool raster's null value is True, which would
+    # make every road cell null once cast to int
+    rd_src = (rds_rs.set_null_value(None) > 0).astype(int).set_null_value(0)
+    rd_dist = distance.cda_cost_distance(c_rs, rd_src, elv)
 
     sk = f1 & (rd_dist < 460)
     cb = (~f1 & (rd_dist < 305)) * 2
     opr = sk + cb
 
-    outdic = {}
+    maybe_log(log, "Calculating on road hauling and extraction costs...")
+    if pbar is not None:
+        pbar.setValue(pbar.value() + 1)
+    outputs = {}
+    facilities = saw["facility"].unique()
+    if per_facility and len(facilities) > 1:
+        # the DEM, roads and barrier rasters are shared, only the sources change. The
+        # cost distance solves run eagerly in numba, which releases the GIL, so the
+        # facilities are solved on a thread pool; a process pool started from the QGIS
+        # worker thread would relaunch QGIS and pickle the DEM and roads to every process
+        # read once, not per solve
+        b_dst_cs2, elv_solve = compute_rasters([b_dst_cs2, elv], scheduler, callbacks)
+        n_threads = min(workers or os.cpu_count() or 1, len(facilities))
+        maybe_log(
+            log,
+            f"Solving {len(facilities)} facility cost surfaces on {n_threads} threads...",
+        )
+
+        solve_callbacks = concurrent_callbacks(callbacks)
+
+        def solve(fac):
+            return facility_costs(
+                saw[saw["facility"] == fac],
+                rds_rs,
+                b_dst_cs2,
+                elv_solve,
+                oc,
+                opr,
+                s_c,
+                c_c,
+                tile_mb,
+                name=f"saw_{fac + 1}",
+                out_dir=scratch_dir,
+                scheduler=scheduler,
+                callbacks=solve_callbacks,
+            )[0]
+
+        with ThreadPoolExecutor(max_workers=n_threads) as pool:
+            fac_costs = list(pool.map(solve, facilities))
+        saw_cost, cheapest = cheapest_facility(fac_costs)
+        for fac, fac_cost in zip(facilities, fac_costs):
+            outputs[f"Delivered Cost (Facility {fac + 1})"] = (
+                fac_cost,
+                os.path.join(out_dir, f"d_cost_{fac + 1}{out_ext}"),
+            )
+        outputs["Cheapest Facility"] = (
+            cheapest,
+            os.path.join(out_dir, f"cheapest_facility{out_ext}"),
+        )
+        # per-facility skidder and cable splits are not combined across facilities
+        sk_saw_cost = cb_saw_cost = None
+        if cb_o:
+            maybe_log(
+                log,
+                "Skidder Cost and Cable Cost are not saved with per-facility surfaces, "
+                "run without per-facility surfaces to get them",
+            )
+    else:
+        saw_cost, sk_saw_cost, cb_saw_cost = facility_costs(
+            saw,
+            rds_rs,
+            b_dst_cs2,
+            elv,
+            oc,
+            opr,
+            s_c,
+            c_c,
+            tile_mb,
+            out_dir=scratch_dir,
+            scheduler=scheduler,
+            callbacks=callbacks,
+        )
+
     maybe_log(log, "Saving default rasters...")
     if pbar is not None:
         pbar.setValue(pbar.value() + 1)
-    o1 = opr == 1
-    o2 = opr == 2
-    sc1 = sk_saw_cost * o1
-    sc2 = cb_saw_cost * o2
-    saw_cost = sc1 + sc2
-    saw_cost = saw_cost.where(saw_cost >= 0, np.nan)
-    d_cost = os.path.join(temp_dir, f"d_cost.tif")
-    saw_cost.save(d_cost)
-    outdic[f"Delivered Cost"] = d_cost
+    outputs["Delivered Cost"] = (saw_cost, os.path.join(out_dir, f"d_cost{out_ext}"))
     add_tr_fr_cost = ht_cost + pf_cost
-    a_cost = os.path.join(temp_dir, f"a_cost.tif")
-    add_tr_fr_cost.save(a_cost)
-    outdic[f"Additional Treatment Cost"] = a_cost
+    outputs["Additional Treatment Cost"] = (
+        add_tr_fr_cost,
+        os.path.join(out_dir, f"a_cost{out_ext}"),
+    )
 
     if cb_o:
         maybe_log(
@@ -359,25 +906,36 @@ def _run(
         if pbar is not None:
             pbar.setValue(pbar.value() + 1)
 
-        skidder_cost = os.path.join(temp_dir, f"skidder_cost.tif")
-        sk_saw_cost.save(skidder_cost)
-        outdic[f"Skidder Cost"] = skidder_cost
-
-        cable_cost = os.path.join(temp_dir, f"cable_cost.tif")
-        cb_saw_cost.save(cable_cost)
-        outdic[f"Cable Cost"] = cable_cost
-
-        hand_treatment_costs = os.path.join(temp_dir, f"hand_treatment_costs.tif")
-        ht_cost.save(hand_treatment_costs)
-        outdic[f"Hand Treatment Cost"] = hand_treatment_costs
-
-        prescribed_fire_costs = os.path.join(temp_dir, f"prescribed_fire_costs.tif")
-        pf_cost.save(prescribed_fire_costs)
-        outdic[f"Prescribed Fire Cost"] = prescribed_fire_costs
+        if sk_saw_cost is not None:
+            outputs["Skidder Cost"] = (
+                sk_saw_cost,
+                os.path.join(out_dir, f"skidder_cost{out_ext}"),
+            )
+            outputs["Cable Cost"] = (
+                cb_saw_cost,
+                os.path.join(out_dir, f"cable_cost{out_ext}"),
+            )
+        outputs["Hand Treatment Cost"] = (
+            ht_cost,
+            os.path.join(out_dir, f"hand_treatment_costs{out_ext}"),
+        )
+        outputs["Prescribed Fire Cost"] = (
+            pf_cost,
+            os.path.join(out_dir, f"prescribed_fire_costs{out_ext}"),
+        )
+        outputs["Potential Harvesting System"] = (
+            opr,
+            os.path.join(out_dir, f"potential_harv_system{out_ext}"),
+        )
 
-        potential_harv_system = os.path.join(temp_dir, f"potential_harv_system.tif")
-        opr.save(potential_harv_system)
-        outdic[f"Potential Harvesting System"] = potential_harv_system
+    # write every requested surface from one graph so the cost distance, oc and
+    # rd_dist are computed once instead of once per output
+    maybe_log(log, f"Writing {len(outputs)} rasters...")
+    if created is not None:
+        created.extend(path for _, path in outputs.values())
+    outdic = save_rasters(
+        outputs, on_saved=on_output, scheduler=scheduler, callbacks=callbacks
+    )
 
     if pbar is not None:
         pbar.setValue(pbar.maximum())
@@ -392,6 +950,7 @@ def run(
     saw_coords,
     lyr_roads_path=None,
     lyr_barriers_path=None,
+    dem_path=None,
     sk_r=2.44,
     cb_r=3.35,
     sk_d=165,
@@ -406,6 +965,19 @@ def run(
     cb_p=1.04,
     lt_p=12.25,
     cb_o=False,
+    tile_mb=None,
+    per_facility=False,
+    workers=None,
+    out_dir=None,
+    snap_k=1,
+    snap_max_dist=None,
+    speed_table=None,
+    maxspeed_unit="km/h",
+    out_format="tif",
+    scheduler=None,
+    cancel_token=None,
+    on_output=None,
+    profile_name=None,
     pbar=None,
     log=None,
 ):
@@ -417,21 +989,77 @@ def run(
         saw_coords: coordinates of the sawmill point(s)
         lyr_roads_path: optional path to roads vector data
         lyr_barriers_path: optional path to barriers vector data
+        dem_path: optional path to a local DEM raster, used instead of downloading 3DEP data
         sk_r, cb_r, sk_d, cb_d, fb_d, hf_d, pr_d, lt_d, ht_d, pf_d, sk_p, cb_p, lt_p: various rates and constants
         cb_o: bool, whether to save optional outputs
+        tile_mb: optional window size in MB for the local stages (slope, roads and facility
+            rasters), whose results are written to disk window by window instead of held in memory.
+            This is not a memory bound: the DEM and the cost distance solves still load the whole
+            AOI into memory, so AOIs larger than memory still fail
+        per_facility: bool, whether to save a cost surface per facility and a cheapest facility raster
+        workers: optional number of threads solving the per-facility surfaces in parallel, defaults to the CPU count
+        out_dir: optional directory for output rasters, defaults to the QGIS temp folder
+        snap_k: number of nearest roads each facility is snapped to
+        snap_max_dist: optional maximum snapping distance in meters, required when snap_k > 1
+        speed_table: optional dict of mph per highway class, overrides the default h_speed entries
+        maxspeed_unit: unit of OSM maxspeed values without one, "km/h" as OSM defines or "mph" for US-only extracts
+        out_format: output raster format, "tif" for GeoTIFF or "zarr" for Zarr stores written in parallel
+        scheduler: optional dask scheduler passed to the computes of this run, e.g. a thread pool or a
+            dask.distributed Client, defaults to the configured scheduler
+        cancel_token: optional CancellationToken, checked between stages and before every dask task
+        on_output: optional callable called with the name and path of each output raster as soon as it is saved
+        profile_name: optional base name of the stage report written to out_dir, unique per run if None
         pbar: optional progress bar object to update
         log: optional logger function
 
     Returns:
         dict mapping raster description keys to saved file paths
+
+    Raises:
+        RunCancelledError: if the run was cancelled, outputs not yet reported through on_output are removed first
     """
     start = time.time()
-    with ProgressBar():
+    # without an output folder, write to a unique temp store folder for this run
+    store_dir = get_temp_store().run_dir("delivered_cost") if out_dir is None else None
+    out_dir = out_dir or store_dir
+    os.makedirs(out_dir, exist_ok=True)
+    # intermediates of this run only, removed once the outputs are written
+    scratch_dir = (
+        tempfile.mkdtemp(prefix="scratch_", dir=out_dir) if tile_mb is not None else None
+    )
+    created = [scratch_dir] if scratch_dir is not None else []  # removed on cancel
+    saved = set()  # outputs reported through on_output, kept on cancel
+    cancel_token = cancel_token or CancellationToken()
+    profiler = StageProfiler(log)
+    # passed to this run's computes only, so cancelling and profiling it leave computes
+    # of other runs and of the lazy calculator alone
+    callbacks = [
+        normalize_callback(cb)
+        for cb in (ProgressBar(), profiler, CancelCallback(cancel_token))
+    ]
+
+    def output_saved(name, path):
+        """
+        Records an output as finished before reporting it.
+        """
+        saved.add(path)
+        if on_output is not None:
+            on_output(name, path)
+
+    def stage_log(msg):
+        """
+        Starts a new profiled stage, stopping first if the run was cancelled.
+        """
+        cancel_token.check()
+        profiler.log(msg)
+
+    try:
         outdic = _run(
             study_area_coords=study_area_coords,
             saw_coords=saw_coords,
             lyr_roads_path=lyr_roads_path,
             lyr_barriers_path=lyr_barriers_path,
+            dem_path=dem_path,
             sk_r=sk_r,
             cb_r=cb_r,
             sk_d=sk_d,
@@ -446,11 +1074,42 @@ def run(
             cb_p=cb_p,
             lt_p=lt_p,
             cb_o=cb_o,
+            tile_mb=tile_mb,
+            per_facility=per_facility,
+            workers=workers,
+            out_dir=out_dir,
+            scratch_dir=scratch_dir,
+            created=created,
+            snap_k=snap_k,
+            snap_max_dist=snap_max_dist,
+            speed_table=speed_table,
+            maxspeed_unit=maxspeed_unit,
+            out_format=out_format,
+            scheduler=scheduler,
+            callbacks=callbacks,
+            on_output=output_saved,
             pbar=pbar,
-            log=log,
+            log=stage_log,
+        )
+    except RunCancelledError:
+        removed = remove_partial_outputs(path for path in created if path not in saved)
+        maybe_log(
+            log,
+            f"Run cancelled, removed {len(removed)} partial outputs, "
+            f"kept {len(saved)} finished outputs.",
         )
+        raise
+    finally:
+        # the stage report is written even for failed runs to see where they stopped
+        os.makedirs(out_dir, exist_ok=True)
+        json_path, _ = profiler.write(out_dir, profile_name)
+        if scratch_dir is not None:
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+        if store_dir is not None:
+            get_temp_store().release(store_dir)
     end = time.time()
     maybe_log(log, f"Total processing time: {end - start:.2f} seconds")
+    maybe_log(log, f"Stage report written to {json_path}")
     return outdic
 
 
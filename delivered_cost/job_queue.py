@@ -0,0 +1,278 @@
+"""
+/***************************************************************************
+ RasterTools
+                                 A QGIS plugin
+ This plugin provides a raster calculator and delivered cost calculator.
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2025-07-31
+        git sha              : $Format:%H$
+        copyright            : (C) 2025 by Tim Van Driel
+        email                : timothy.vandriel@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import contextlib
+import os
+import threading
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from multiprocessing import Manager
+
+from shapely import STRtree
+from shapely.geometry import Polygon, box
+from shapely.ops import unary_union
+
+from .cancellation import CancellationToken, RunCancelledError
+
+
+class DeliveredCostJob:
+    """
+    A delivered cost run covering one or more nearby AOI polygons.
+    """
+
+    def __init__(self, job_id: int, aois: list, args: dict):
+        self.job_id = job_id
+        self.aois = aois  # list of AOI coordinate lists (EPSG:4326)
+        self.args = args  # keyword arguments passed to delvCost.run
+        self.status = "queued"
+        self.result = None
+        self.error = None
+
+    def __repr__(self):
+        return f"<DeliveredCostJob id={self.job_id} aois={len(self.aois)} status='{self.status}'>"
+
+    @property
+    def study_area_coords(self):
+        """
+        Bounding box of all AOIs in the job, used as the study area of the run.
+        """
+        ext = unary_union([Polygon(coords) for coords in self.aois])
+        return list(box(*ext.bounds).exterior.coords)
+
+
+def group_aois(
+    aois: list, max_gap: float = 0.15, max_area: float = 0.5, max_aois: int = 25
+) -> list[list[int]]:
+    """
+    Groups AOIs whose download extents overlap so they can share downloaded data.
+
+    AOIs join the neighboring group whose bounding box grows least, as long as the group
+    stays within max_area and max_aois, so a layer of adjacent stands is split into
+    several jobs instead of one job covering the whole forest.
+
+    Args:
+        aois (list): AOI coordinate lists in EPSG:4326.
+        max_gap (float): Distance in degrees within which AOIs are grouped. Matches
+            the buffer delvCost applies around the study area for downloads.
+        max_area (float): Largest bounding box area of a group in square degrees.
+        max_aois (int): Largest number of AOIs in a group.
+
+    Returns:
+        list[list[int]]: Groups of AOI indices.
+    """
+    polys = [Polygon(coords) for coords in aois]
+    exts = [poly.buffer(max_gap / 2) for poly in polys]
+    neighbors = [[] for _ in exts]
+    for i, j in zip(*STRtree(exts).query(exts, predicate="intersects")):
+        neighbors[i].append(j)
+
+    def area(bounds):
+        return (bounds[2] - bounds[0]) * (bounds[3] - bounds[1])
+
+    def merged(a, b):
+        return (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+
+    groups = []  # [indices, bounds]
+    member = {}  # AOI index -> group index
+    # west to east, so groups grow over contiguous areas
+    for i in sorted(range(len(polys)), key=lambda k: polys[k].bounds[0]):
+        bounds = polys[i].bounds
+        best = None
+        for g in {member[j] for j in neighbors[i] if j in member}:
+            indices, group_bounds = groups[g]
+            grown = merged(group_bounds, bounds)
+            if len(indices) >= max_aois or area(grown) > max_area:
+                continue
+            growth = area(grown) - area(group_bounds)
+            if best is None or growth < best[0]:
+                best = (growth, g, grown)
+        if best is None:
+            member[i] = len(groups)
+            groups.append([[i], bounds])
+        else:
+            _, g, grown = best
+            groups[g][0].append(i)
+            groups[g][1] = grown
+            member[i] = g
+    return [sorted(indices) for indices, _ in groups]
+
+
+def build_jobs(
+    aois: list,
+    args: dict,
+    max_gap: float = 0.15,
+    max_area: float = 0.5,
+    max_aois: int = 25,
+) -> list:
+    """
+    Builds one job per group of nearby AOIs.
+
+    Args:
+        aois (list): AOI coordinate lists in EPSG:4326.
+        args (dict): Keyword arguments shared by all runs (facilities, rates, ...).
+        max_gap (float): Distance in degrees within which AOIs are grouped.
+        max_area (float): Largest bounding box area of a job in square degrees.
+        max_aois (int): Largest number of AOIs in a job.
+
+    Returns:
+        list[DeliveredCostJob]: The queued jobs.
+    """
+    return [
+        DeliveredCostJob(i, [aois[j] for j in group], dict(args))
+        for i, group in enumerate(group_aois(aois, max_gap, max_area, max_aois), 1)
+    ]
+
+
+def run_job(study_area_coords, args, out_dir, cancel_event=None):
+    """
+    Runs delvCost for a single job. Module level so it can be sent to worker processes.
+
+    Args:
+        study_area_coords (list): Study area coordinates of the job.
+        args (dict): Keyword arguments passed to delvCost.run.
+        out_dir (str): Directory for the job's output rasters.
+        cancel_event (optional): Event shared with the queue, set to cancel the job.
+
+    Returns:
+        dict: Mapping of raster description keys to saved file paths.
+    """
+    from .delvCost import run
+
+    return run(
+        study_area_coords=study_area_coords,
+        out_dir=out_dir,
+        cancel_token=CancellationToken(cancel_event),
+        **args,
+    )
+
+
+class DeliveredCostJobQueue:
+    """
+    Runs delivered cost jobs across a pool of workers and reports per-job status.
+
+    Headless runs use worker processes. Inside QGIS the queue must run on threads: spawned
+    processes would start the QGIS binary as their interpreter and could not import the
+    plugin package that run_job is pickled from.
+    """
+
+    EXECUTORS = ("processes", "threads")
+
+    def __init__(
+        self,
+        jobs: list,
+        out_dir: str,
+        max_workers: int = None,
+        executor: str = "processes",
+    ):
+        """
+        Args:
+            jobs (list[DeliveredCostJob]): Jobs to run.
+            out_dir (str): Base directory, each job writes to its own subfolder.
+            max_workers (int, optional): Number of workers, defaults to the CPU count.
+            executor (str): "processes" for a process pool, "threads" for a thread pool.
+
+        Raises:
+            ValueError: If the executor is unknown.
+        """
+        if executor not in self.EXECUTORS:
+            raise ValueError(
+                f"Unknown executor '{executor}', use one of {', '.join(self.EXECUTORS)}."
+            )
+        self.jobs = jobs
+        self.out_dir = out_dir
+        self.max_workers = max_workers or os.cpu_count()
+        self.executor = executor
+
+    def run(self, on_status=None, cancel_token=None) -> dict:
+        """
+        Runs all queued jobs and collects their outputs.
+
+        Args:
+            on_status (callable, optional): Called with a job whenever its status changes.
+            cancel_token (CancellationToken, optional): Cancels queued jobs and stops
+                running ones at their next stage or dask task.
+
+        Returns:
+            dict: Mapping of "Job <id>: <raster description>" to saved file paths.
+
+        Raises:
+            RunCancelledError: If the queue was cancelled, after running jobs stopped.
+        """
+
+        def set_status(job, status):
+            job.status = status
+            if on_status:
+                on_status(job)
+
+        cancel_token = cancel_token or CancellationToken()
+        outdic = {}
+        with contextlib.ExitStack() as stack:
+            if self.executor == "processes":
+                cancel_event = stack.enter_context(Manager()).Event()
+                pool = stack.enter_context(
+                    ProcessPoolExecutor(max_workers=self.max_workers)
+                )
+            else:
+                cancel_event = threading.Event()
+                pool = stack.enter_context(
+                    ThreadPoolExecutor(max_workers=self.max_workers)
+                )
+            futures = {}
+            for job in self.jobs:
+                job_dir = os.path.join(self.out_dir, f"job_{job.job_id}")
+                futures[
+                    pool.submit(
+                        run_job, job.study_area_coords, job.args, job_dir, cancel_event
+                    )
+                ] = job
+                set_status(job, "submitted")
+
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+                if cancel_token.cancelled and not cancel_event.is_set():
+                    cancel_event.set()
+                    for future in list(pending):
+                        if future.cancel():
+                            pending.discard(future)
+                            set_status(futures[future], "cancelled")
+                for future in done:
+                    job = futures[future]
+                    try:
+                        job.result = future.result()
+                    except RunCancelledError:
+                        set_status(job, "cancelled")
+                        continue
+                    except Exception as e:
+                        job.error = str(e)
+                        set_status(job, "failed")
+                        continue
+                    for name, path in job.result.items():
+                        outdic[f"Job {job.job_id}: {name}"] = path
+                    set_status(job, "finished")
+        cancel_token.check()
+        return outdic
@@ -0,0 +1,209 @@
+"""
+/***************************************************************************
+ RasterTools
+                                 A QGIS plugin
+ This plugin provides a raster calculator and delivered cost calculator.
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2025-07-31
+        git sha              : $Format:%H$
+        copyright            : (C) 2025 by Tim Van Driel
+        email                : timothy.vandriel@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import csv
+import json
+import os
+import threading
+import time
+import uuid
+
+from dask.callbacks import Callback
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+def current_rss_mb():
+    """
+    Returns the current resident memory of this process in MB, or None if unknown.
+    """
+    if psutil is not None:
+        return psutil.Process().memory_info().rss / 1024**2
+    try:  # Linux without psutil
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1024**2
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def report_name(prefix="stage_profile"):
+    """
+    Returns a base name for the stage report of one run, unique so runs writing to the
+    same folder do not overwrite each other's reports.
+    Args:
+        prefix: start of the name
+    Returns:
+        the name, e.g. stage_profile_20250731_142501_1a2b3c
+    """
+    return f"{prefix}_{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+
+
+class RssSampler:
+    """
+    Samples the resident memory of this process on a background thread and keeps the
+    maximum, so a stage's peak is measured within the stage rather than over the whole
+    lifetime of the process like ru_maxrss.
+    """
+
+    def __init__(self, interval=0.05):
+        """
+        Args:
+            interval: seconds between two samples
+        """
+        self.interval = interval
+        self.peak = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        rss = current_rss_mb()
+        if rss is not None and (self.peak is None or rss > self.peak):
+            self.peak = rss
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        """
+        Starts sampling from the current resident memory.
+        """
+        self.peak = None
+        self._sample()
+        if self.peak is None:
+            return  # resident memory cannot be read on this platform
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops sampling.
+        Returns:
+            the peak resident memory since start in MB, or None if unknown
+        """
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+            self._sample()
+        return self.peak
+
+
+class StageProfiler(Callback):
+    """
+    Records wall time, CPU time, peak RSS and dask task counts per pipeline stage.
+
+    Each logged message starts a new stage, so wrapping the log function of a run
+    profiles every step between two log messages. Passed as a callback to the run's dask
+    computes, it counts the tasks each stage executes.
+    """
+
+    def __init__(self, log=None):
+        """
+        Args:
+            log: optional logger function, stage timings are reported through it
+        """
+        super().__init__()
+        self._log = log
+        self.stages = []
+        self._current = None
+        self._tasks = 0
+        self._rss = RssSampler()
+
+    def _posttask(self, key, result, dsk, state, worker_id):
+        self._tasks += 1
+
+    def log(self, msg):
+        """
+        Logs a message and starts a new stage named after it.
+        Args:
+            msg: message to log
+        """
+        self.end_stage()
+        self._emit(msg)
+        self._current = {
+            "stage": msg,
+            "wall": time.perf_counter(),
+            "cpu": time.process_time(),
+            "tasks": self._tasks,
+        }
+        self._rss.start()
+
+    def _emit(self, msg):
+        """
+        Sends a message to the logger, or prints it if no logger is provided.
+        """
+        if self._log:
+            self._log(msg)
+        else:
+            print(msg)
+
+    def end_stage(self):
+        """
+        Closes the current stage, if any, and reports its statistics.
+        """
+        if self._current is None:
+            return
+        start, self._current = self._current, None
+        rss = self._rss.stop()
+        stage = {
+            "stage": start["stage"],
+            "wall_s": round(time.perf_counter() - start["wall"], 3),
+            "cpu_s": round(time.process_time() - start["cpu"], 3),
+            "peak_rss_mb": None if rss is None else round(rss, 1),
+            "dask_tasks": self._tasks - start["tasks"],
+        }
+        self.stages.append(stage)
+        self._emit(
+            f"  {stage['wall_s']:.2f} s wall, {stage['cpu_s']:.2f} s CPU, "
+            f"{'?' if rss is None else f'{rss:.0f}'} MB peak RSS, "
+            f"{stage['dask_tasks']} dask tasks",
+        )
+
+    def write(self, out_dir, name=None):
+        """
+        Writes the recorded stages as JSON and CSV files.
+        Args:
+            out_dir: directory for the report files
+            name: base name of the report files, a new report_name() if None
+        Returns:
+            tuple of the JSON and CSV paths
+        """
+        self.end_stage()
+        name = name or report_name()
+        json_path = os.path.join(out_dir, f"{name}.json")
+        csv_path = os.path.join(out_dir, f"{name}.csv")
+        with open(json_path, "w") as f:
+            json.dump(self.stages, f, indent=2)
+        with open(csv_path, "w", newline="") as f:
+            writer = csv.DictWriter(
+                f, fieldnames=["stage", "wall_s", "cpu_s", "peak_rss_mb", "dask_tasks"]
+            )
+            writer.writeheader()
+            writer.writerows(self.stages)
+        return json_path, csv_path
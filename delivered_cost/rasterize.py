@@ -0,0 +1,278 @@
+"""
+/***************************************************************************
+ RasterTools
+                                 A QGIS plugin
+ This plugin provides a raster calculator and delivered cost calculator.
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2025-07-31
+        git sha              : $Format:%H$
+        copyright            : (C) 2025 by Tim Van Driel
+        email                : timothy.vandriel@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import hashlib
+import os
+import threading
+import uuid
+from collections import OrderedDict
+
+import dask.array as da
+import numpy as np
+import shapely
+import xarray as xr
+from affine import Affine
+from rasterio import features
+from raster_tools import Raster
+
+
+def _burn_block(geoms, bounds, transform, all_touched, block_info=None):
+    """
+    Burns the 1-based index of every feature that touches one chunk of the grid.
+    The grid transform is passed as its 6 coefficients so dask does not unpack it.
+    Later features overwrite earlier ones, matching raster_tools' Vector.to_raster.
+    """
+    _, (r0, r1), (c0, c1) = block_info[None]["array-location"]
+    shape = (r1 - r0, c1 - c0)
+    win = Affine(*transform) * Affine.translation(c0, r0)
+    xs, ys = zip(win * (0, 0), win * (shape[1], shape[0]))
+    out = np.zeros((1,) + shape, dtype="int32")
+    hits = np.flatnonzero(
+        (bounds[:, 0] <= max(xs))
+        & (bounds[:, 2] >= min(xs))
+        & (bounds[:, 1] <= max(ys))
+        & (bounds[:, 3] >= min(ys))
+    )
+    if len(hits):
+        out[0] = features.rasterize(
+            zip(geoms[hits], (hits + 1).tolist()),
+            out_shape=shape,
+            transform=win,
+            fill=0,
+            all_touched=all_touched,
+            dtype="int32",
+        )
+    return out
+
+
+class RasterizeCache:
+    """
+    Rasterizes vector layers onto a raster grid and caches the result.
+
+    Each layer is burned once as a raster of 1-based feature indices. Any number of
+    attribute rasters are then derived from that index with a lookup table, so several
+    attributes cost a single pass over the geometries. Index rasters are cached in memory
+    and on disk, keyed by the vector content, the grid and the burn options, so repeated
+    runs and multi-facility batches skip rasterizing the same layer again. Both caches
+    are bounded and drop their least recently used index rasters first.
+    """
+
+    def __init__(self, cache_dir: str, max_mb: float = 2048, max_open: int = 16):
+        """
+        Args:
+            cache_dir (str): Directory for the on-disk cache of index rasters.
+            max_mb (float): Size limit of the on-disk cache in MB.
+            max_open (int): Number of index rasters kept memory-mapped.
+        """
+        self.cache_dir = cache_dir
+        self.max_mb = max_mb
+        self.max_open = max_open
+        self._memory = OrderedDict()  # cache key -> memory-mapped index array
+        # facilities are burned from several threads at once, see delvCost._run
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def key(gdf, like, all_touched=True) -> str:
+        """
+        Builds the cache key of a layer burned onto a grid.
+
+        Args:
+            gdf (geopandas.GeoDataFrame): The vector layer.
+            like (raster_tools.Raster): Raster defining the grid.
+            all_touched (bool): Whether all touched cells are burned, the default of
+                raster_tools' Vector.to_raster.
+
+        Returns:
+            str: Hex digest identifying the vector content, grid and options.
+        """
+        h = hashlib.sha1()
+        h.update(b"".join(shapely.to_wkb(gdf.geometry.values)))
+        h.update(str(gdf.crs).encode())
+        h.update(str(like.crs).encode())
+        h.update(str(tuple(like.geobox.affine)).encode())
+        h.update(str(like.shape).encode())
+        h.update(str(all_touched).encode())
+        return h.hexdigest()
+
+    def index(self, gdf, like, all_touched=True, scheduler=None, callbacks=None):
+        """
+        Returns the feature index raster of a layer, rasterizing it only on a cache miss.
+
+        Args:
+            gdf (geopandas.GeoDataFrame): The vector layer, in the crs of `like`.
+            like (raster_tools.Raster): Raster defining the grid.
+            all_touched (bool): Whether all touched cells are burned, the default of
+                raster_tools' Vector.to_raster.
+            scheduler (optional): The dask scheduler rasterizing a cache miss, defaults
+                to the configured scheduler.
+            callbacks (list, optional): Dask callbacks of that compute.
+
+        Returns:
+            dask.array.Array: 1-based feature index per cell, 0 where no feature was burned.
+        """
+        key = self.key(gdf, like, all_touched)
+        path = os.path.join(self.cache_dir, f"{key}.npy")
+        with self._lock:
+            if key not in self._memory:
+                if not os.path.exists(path):
+                    self._write_index(
+                        gdf, like, all_touched, path, scheduler, callbacks
+                    )
+                    self._evict_files(keep=path)
+                self._memory[key] = np.load(path, mmap_mode="r")
+                while len(self._memory) > self.max_open:
+                    # arrays still used by a graph stay mapped until it is released
+                    self._memory.popitem(last=False)
+            self._memory.move_to_end(key)
+            index = self._memory[key]
+        try:
+            os.utime(path)  # the modification time orders the disk cache by last use
+        except OSError:
+            pass
+        return da.from_array(index, chunks=like.data.chunks)
+
+    def _evict_files(self, keep=None):
+        """
+        Removes the least recently used index files until the disk cache fits max_mb.
+        Files that are memory-mapped or cannot be removed, e.g. open on Windows, are kept.
+        """
+        mapped = {os.path.join(self.cache_dir, f"{key}.npy") for key in self._memory}
+        files = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.endswith(".npy"):
+                try:
+                    files.append((os.path.getmtime(path), os.path.getsize(path), path))
+                except OSError:
+                    pass
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_mb * 1024**2:
+                break
+            if path == keep or path in mapped:
+                continue
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    def _write_index(
+        self, gdf, like, all_touched, path, scheduler=None, callbacks=None
+    ):
+        """
+        Rasterizes a layer chunk by chunk and streams the index to a .npy file.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        geoms = gdf.geometry.values
+        idx = da.map_blocks(
+            _burn_block,
+            geoms=np.asarray(geoms),
+            bounds=shapely.bounds(geoms),
+            transform=list(like.geobox.affine)[:6],
+            all_touched=all_touched,
+            chunks=like.data.chunks,
+            dtype="int32",
+        )
+        # unique per writer, so concurrent runs never share or remove each other's parts
+        part = f"{path}.{uuid.uuid4().hex[:8]}.part"
+        try:
+            out = np.lib.format.open_memmap(
+                part, mode="w+", dtype="int32", shape=idx.shape
+            )
+            da.store(idx, out, scheduler=scheduler, callbacks=callbacks)
+            out.flush()
+            del out
+            os.replace(part, path)
+        except BaseException:
+            # failed or cancelled, e.g. by RunCancelledError from a dask callback
+            try:
+                os.remove(part)
+            except OSError:
+                pass
+            raise
+
+    def burn(
+        self, gdf, like, attrs=(), all_touched=True, scheduler=None, callbacks=None
+    ) -> dict:
+        """
+        Burns a layer and any number of its attributes onto the grid of `like`.
+
+        Args:
+            gdf (geopandas.GeoDataFrame): The vector layer, in the crs of `like`.
+            like (raster_tools.Raster): Raster defining the grid.
+            attrs (iterable[str]): Numeric attribute columns to burn.
+            all_touched (bool): Whether all touched cells are burned, the default of
+                raster_tools' Vector.to_raster.
+            scheduler (optional): The dask scheduler rasterizing a cache miss, see index.
+            callbacks (list, optional): Dask callbacks of that compute.
+
+        Returns:
+            dict: "index" maps to the 1-based feature index raster and each attribute name
+            to its value raster. All rasters use 0 as the null value.
+        """
+        idx = self.index(gdf, like, all_touched, scheduler, callbacks)
+        out = {"index": self._like(like, idx)}
+        for attr in attrs:
+            lut = np.concatenate([[0], gdf[attr].to_numpy(dtype=float)])
+            out[attr] = self._like(
+                like, idx.map_blocks(lambda b, lut=lut: lut[b], dtype=lut.dtype)
+            )
+        return out
+
+    @staticmethod
+    def _like(like, data):
+        """
+        Wraps a dask array as a Raster on the grid of `like` with 0 as the null value.
+        """
+        xr_da = xr.DataArray(data, coords=like.xdata.coords, dims=like.xdata.dims)
+        return Raster(xr_da).set_crs(like.crs).set_null_value(0)
+
+    def clear(self):
+        """
+        Clears the in-memory and on-disk cache.
+        """
+        with self._lock:
+            self._memory.clear()
+        if os.path.isdir(self.cache_dir):
+            for name in os.listdir(self.cache_dir):
+                if name.endswith(".npy"):
+                    os.remove(os.path.join(self.cache_dir, name))
+
+
+_rasterize_caches = {}
+
+
+def get_rasterize_cache(cache_dir: str) -> RasterizeCache:
+    """
+    Returns the shared RasterizeCache for a cache directory.
+
+    Args:
+        cache_dir (str): Directory for the on-disk cache.
+
+    Returns:
+        RasterizeCache: The cache instance for that directory.
+    """
+    if cache_dir not in _rasterize_caches:
+        _rasterize_caches[cache_dir] = RasterizeCache(cache_dir)
+    return _rasterize_caches[cache_dir]
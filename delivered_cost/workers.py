@@ -24,6 +24,8 @@
 from PyQt5.QtCore import QObject, pyqtSignal, QRunnable, pyqtSlot
 from PyQt5.QtWidgets import QMessageBox
 
+from .cancellation import CancellationToken, RunCancelledError
+
 
 class WorkerSignals(QObject):
     """Signals for the worker thread to communicate with the main thread."""
@@ -32,6 +34,8 @@ class WorkerSignals(QObject):
     error = pyqtSignal(str)
     progress = pyqtSignal(int)
     log = pyqtSignal(str)
+    cancelled = pyqtSignal()
+    output = pyqtSignal(str, str)  # name and path of a saved output raster
 
 
 class DeliveredCostWorker(QRunnable):
@@ -41,12 +45,18 @@ class DeliveredCostWorker(QRunnable):
         super().__init__()
         self.args = args
         self.signals = WorkerSignals()
+        self.cancel_token = CancellationToken()
+
+    def cancel(self):
+        """Ask the running calculations to stop at the next stage or dask task."""
+        self.cancel_token.cancel()
 
     @pyqtSlot()
     def run(self):
         """Run the delivered cost calculations."""
         try:
             from .delvCost import run
+            from ..compute_settings import get_compute_settings
         except ImportError as e:
             self.signals.error.emit(f"Import Error: {str(e)}")
             return
@@ -90,10 +100,81 @@ class DeliveredCostWorker(QRunnable):
                 self.signals.progress
             )  # Wrap the progress bar to emit signals
             self.args["log"] = log_fn  # Use the log function to emit log messages
+            self.args["cancel_token"] = self.cancel_token
+            # Stream each output raster to the main thread as soon as it is saved
+            self.args["on_output"] = self.signals.output.emit
 
-            result = run(**self.args)  # Run the delivered cost calculations
+            # Run the delivered cost calculations on the configured dask scheduler
+            self.args["scheduler"] = get_compute_settings().dask_scheduler()
+            result = run(**self.args)
             self.signals.finished.emit(result)  # Emit the result when finished
 
+        except RunCancelledError:
+            self.signals.cancelled.emit()
+
+        except Exception as e:
+            import traceback
+
+            tb = traceback.format_exc()
+            self.signals.error.emit(f"Error: {str(e)}\n{tb}")
+
+
+class DeliveredCostQueueWorker(QRunnable):
+    """Worker thread for running a queue of delivered cost jobs on a thread pool."""
+
+    def __init__(self, jobs, out_dir, max_workers=None):
+        super().__init__()
+        self.jobs = jobs
+        self.out_dir = out_dir
+        self.max_workers = max_workers
+        self.signals = WorkerSignals()
+        self.cancel_token = CancellationToken()
+
+    def cancel(self):
+        """Cancel queued jobs and ask running jobs to stop."""
+        self.cancel_token.cancel()
+
+    @pyqtSlot()
+    def run(self):
+        """Run the queued delivered cost jobs."""
+        try:
+            from .job_queue import DeliveredCostJobQueue
+            from ..compute_settings import get_compute_settings
+        except ImportError as e:
+            self.signals.error.emit(f"Import Error: {str(e)}")
+            return
+
+        try:
+            done = [0]
+
+            def status_fn(job):
+                """
+                Report a job's status to the main thread.
+                Args:
+                    job (DeliveredCostJob): The job whose status changed.
+                """
+                msg = f"Job {job.job_id} ({len(job.aois)} AOIs): {job.status}"
+                if job.error:
+                    msg += f" - {job.error}"
+                self.signals.log.emit(msg)
+                if job.status in ("finished", "failed", "cancelled"):
+                    done[0] += 1
+                    self.signals.progress.emit(done[0])
+
+            # every job computes on the configured dask scheduler
+            scheduler = get_compute_settings().dask_scheduler()
+            for job in self.jobs:
+                job.args["scheduler"] = scheduler
+            # threads, a process pool would relaunch QGIS and fail to import the plugin
+            queue = DeliveredCostJobQueue(
+                self.jobs, self.out_dir, self.max_workers, executor="threads"
+            )
+            result = queue.run(on_status=status_fn, cancel_token=self.cancel_token)
+            self.signals.finished.emit(result)
+
+        except RunCancelledError:
+            self.signals.cancelled.emit()
+
         except Exception as e:
             import traceback
 
@@ -0,0 +1,302 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ RasterTools
+                                 A QGIS plugin
+ This plugin provides a raster calculator and delivered cost calculator.
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2025-07-31
+        git sha              : $Format:%H$
+        copyright            : (C) 2025 by Tim Van Driel
+        email                : timothy.vandriel@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import math
+import os
+import shutil
+import uuid
+
+import dask
+import dask.array as da
+import numpy as np
+from raster_tools.masking import get_default_null_value
+
+try:
+    from .zarr_output import is_zarr_path
+except ImportError:  # headless, the plugin folder is on sys.path
+    from zarr_output import is_zarr_path
+
+OPTIMIZE_DTYPE = "<OPTIMIZE>"  # dtype choice that narrows a result to its value range
+
+# integer types tried narrowest first, int8 is left out as GDAL before 3.7 cannot write it
+INTEGER_DTYPES = ("uint8", "int16", "uint16", "int32", "uint32", "int64")
+
+
+def _fits_float32(block):
+    with np.errstate(over="ignore"):  # values beyond the float32 range become inf
+        return block.astype("float32") == block
+
+
+def _is_nan(value):
+    return value is not None and isinstance(value, float) and math.isnan(value)
+
+
+def stats_graph(data, null_value=None):
+    """
+    Builds the statistics that decide how far an array can be narrowed without
+    computing them, so they can be computed together with the write of the array and
+    its graph is only evaluated once.
+
+    Args:
+        data (dask.array.Array | numpy.ndarray): The values.
+        null_value (float, optional): The null value, its cells are left out.
+
+    Returns:
+        dict | None: Lazy 0-d arrays, see value_stats, or None if the dtype alone decides,
+            i.e. for booleans, 1-byte and non-numeric dtypes.
+    """
+    dtype = np.dtype(data.dtype)
+    if dtype == bool or dtype.kind not in "iuf" or dtype.itemsize == 1:
+        return None
+    data = da.asarray(data)
+    valid = None
+    if null_value is not None and not _is_nan(null_value):
+        valid = data != null_value
+    if dtype.kind in "iu":
+        if valid is None:
+            return {"min": data.min(), "max": data.max()}
+        info = np.iinfo(dtype)
+        return {
+            "min": da.where(valid, data, info.max).min(),
+            "max": da.where(valid, data, info.min).max(),
+        }
+    values = data if valid is None else da.where(valid, data, np.nan)
+    finite = da.isfinite(data) if valid is None else da.isfinite(data) | ~valid
+    values = da.where(finite, values, np.nan)
+    filled = da.where(finite, data, 0)
+    return {
+        "min": da.nanmin(values),
+        "max": da.nanmax(values),
+        "nonfinite": ~finite.all(),
+        "integral": (filled % 1 == 0).all(),
+        "float32": filled.map_blocks(_fits_float32, dtype=bool).all(),
+    }
+
+
+def value_stats(data, null_value=None) -> dict:
+    """
+    Computes the statistics that decide how far an array can be narrowed, all in one
+    dask compute so the array's graph is only evaluated once.
+
+    Args:
+        data (dask.array.Array | numpy.ndarray): The values.
+        null_value (float, optional): The null value, its cells are left out.
+
+    Returns:
+        dict: "min" and "max" of the values ignoring NaN and null cells, and for
+            floating point values whether there are non-finite values ("nonfinite"),
+            whether all finite values are whole numbers ("integral") and whether float32
+            holds them exactly ("float32"). Empty if the dtype alone decides, see
+            stats_graph.
+    """
+    stats = stats_graph(data, null_value)
+    if stats is None:
+        return {}
+    (stats,) = dask.compute(stats)
+    return {key: np.asarray(value).item() for key, value in stats.items()}
+
+
+def narrow_null(dtype, null_value):
+    """
+    Returns the null value a raster keeps when it is cast to `dtype`: its own null value
+    if the dtype holds it, else raster_tools' default null value of the dtype.
+
+    Args:
+        dtype: The dtype cast to.
+        null_value (float, optional): The current null value.
+
+    Returns:
+        float | int | None: The null value in `dtype`.
+    """
+    dtype = np.dtype(dtype)
+    if null_value is None or dtype.kind not in "iuf":
+        return null_value
+    if _is_nan(null_value):
+        return null_value if dtype.kind == "f" else get_default_null_value(dtype)
+    if dtype.kind == "f":
+        fits = abs(null_value) <= float(np.finfo(dtype).max)
+    else:
+        info = np.iinfo(dtype)
+        fits = null_value % 1 == 0 and info.min <= null_value <= info.max
+    return null_value if fits else get_default_null_value(dtype)
+
+
+def narrowest_dtype(dtype, stats: dict, null_value=None, exact=True) -> np.dtype:
+    """
+    Chooses the smallest dtype that holds every value without loss.
+
+    Integer values and whole floating point values without NaN or infinity get the
+    narrowest integer type covering their range, other floating point values float32
+    when it holds them exactly. A null value the narrow dtype cannot hold is replaced by
+    its default null value, see narrow_null, which must not collide with a value. The
+    dtype is never widened, booleans become uint8, whose null value is set apart from
+    0 and 1 by the writers, and other kinds, e.g. complex, are kept.
+
+    Args:
+        dtype: The current dtype.
+        stats (dict): The statistics from value_stats, without the null cells.
+        null_value (float, optional): The null value.
+        exact (bool): Only use float32 if it holds every value exactly. If False, float32
+            is used whenever the values are within its range, rounding them to 7
+            significant digits.
+
+    Returns:
+        numpy.dtype: The narrowest dtype.
+    """
+    dtype = np.dtype(dtype)
+    if dtype == bool:
+        return np.dtype("uint8")
+    if dtype.kind not in "iuf" or not stats:
+        return dtype
+    stats = {key: np.asarray(value).item() for key, value in stats.items()}
+    low, high = stats["min"], stats["max"]
+    if low > high:  # every cell is null
+        return dtype
+
+    def holds(candidate):
+        null = narrow_null(candidate, null_value)
+        return null == null_value or _is_nan(null) or not low <= null <= high
+
+    candidates = []
+    whole = dtype.kind in "iu" or (
+        stats["integral"] and not stats["nonfinite"] and not _is_nan(null_value)
+    )
+    if whole and not (math.isnan(low) or math.isnan(high)):
+        candidates += [
+            np.dtype(name)
+            for name in INTEGER_DTYPES
+            if np.iinfo(name).min <= low and high <= np.iinfo(name).max
+        ]
+    if dtype.kind == "f":
+        in_range = math.isnan(low) or max(-low, high) <= float(np.finfo("float32").max)
+        if stats["float32"] or (not exact and in_range):
+            candidates.append(np.dtype("float32"))
+    best = min(
+        filter(holds, candidates),
+        key=lambda candidate: candidate.itemsize,
+        default=dtype,
+    )
+    return best if best.itemsize < dtype.itemsize else dtype
+
+
+def _narrow_geotiff(path, dtype, null_value, new_null):
+    import rasterio
+
+    part = f"{path}.{uuid.uuid4().hex[:8]}.part"
+    try:
+        with rasterio.open(path) as src:
+            profile = dict(src.profile, dtype=dtype.name, driver="GTiff")
+            profile["nodata"] = new_null
+            with rasterio.open(part, "w", **profile) as dst:
+                for _, window in src.block_windows(1):
+                    block = src.read(window=window)
+                    if new_null != null_value:
+                        block[block == null_value] = new_null
+                    dst.write(block.astype(dtype), window=window)
+        os.replace(part, path)
+    except BaseException:
+        if os.path.exists(part):
+            os.remove(part)
+        raise
+
+
+def _narrow_zarr(path, dtype, null_value, new_null):
+    try:
+        from .zarr_output import open_zarr, to_zarr
+    except ImportError:  # headless, the plugin folder is on sys.path
+        from zarr_output import open_zarr, to_zarr
+
+    xrs, _ = open_zarr(path)
+    if new_null != null_value:
+        xrs = xrs.where(xrs != null_value, new_null)
+    xrs = xrs.astype(dtype)
+    if new_null is not None:
+        xrs = xrs.rio.write_nodata(new_null)
+    path = path.rstrip("/\\")
+    part = f"{path}.{uuid.uuid4().hex[:8]}.part"
+    try:
+        # called from a dask task, so the copy runs on this thread
+        to_zarr(xrs, part, compute=False).compute(scheduler="synchronous")
+        shutil.rmtree(path)
+        os.replace(part, path)
+    except BaseException:
+        shutil.rmtree(part, ignore_errors=True)
+        raise
+
+
+def narrow_written(path, dtype, stats, null_value=None, exact=True) -> np.dtype:
+    """
+    Rewrites a GeoTIFF or Zarr store that was just written with the narrowest dtype that
+    holds its values, see narrowest_dtype, and that dtype's null value, see narrow_null.
+    The copy reads the written values back, so the raster is not computed again.
+
+    Args:
+        path (str): The written GeoTIFF or .zarr store.
+        dtype: The dtype it was written with.
+        stats (dict): Its statistics, from value_stats or a computed stats_graph, both
+            given the null value.
+        null_value (float, optional): Its null value.
+        exact (bool): See narrowest_dtype.
+
+    Returns:
+        numpy.dtype: The dtype of the output.
+    """
+    narrow = narrowest_dtype(dtype, stats or {}, null_value, exact)
+    if narrow != np.dtype(dtype):
+        new_null = narrow_null(narrow, null_value)
+        if is_zarr_path(path):
+            _narrow_zarr(path, narrow, null_value, new_null)
+        else:
+            _narrow_geotiff(path, narrow, null_value, new_null)
+    return narrow
+
+
+def _narrow_after_write(write, path, dtype, stats, null_value, exact):
+    return narrow_written(path, dtype, stats, null_value, exact)
+
+
+def narrow_after(write, path, data, null_value=None, exact=True):
+    """
+    Chains narrowing onto a pending write: the returned Delayed computes the write and
+    the value statistics in the same graph, then rewrites the output with the narrowest
+    dtype, see narrow_written.
+
+    Args:
+        write (dask.delayed.Delayed): The pending write of `data` to `path`.
+        path (str): The output GeoTIFF or .zarr store.
+        data (dask.array.Array): The values being written.
+        null_value (float, optional): Their null value.
+        exact (bool): See narrowest_dtype.
+
+    Returns:
+        dask.delayed.Delayed: Computes to the dtype of the output.
+    """
+    return dask.delayed(_narrow_after_write, pure=False)(
+        write,
+        path,
+        np.dtype(data.dtype),
+        stats_graph(data, null_value),
+        null_value,
+        exact,
+    )
@@ -22,10 +22,11 @@
 """
 
 from .layer_manager import LayerManager
-from .raster_manager import RasterManager
+from .raster_manager import RasterManager, RESOLUTION_POLICIES, RESAMPLING_METHODS
 from .expression_evaluator import ExpressionEvaluator
 from .raster_saver import RasterSaver
 from .safe_evaluator import SafeEvaluator
+from .mosaic import TileCatalog, get_tile_catalog, is_tile_catalog
 from .lazy_manager import LazyLayerRegistry, get_lazy_layer_registry
 from .exceptions import (
     RasterCalcError,
@@ -40,9 +41,14 @@ from .exceptions import (
 __all__ = [
     "LayerManager",
     "RasterManager",
+    "RESOLUTION_POLICIES",
+    "RESAMPLING_METHODS",
     "ExpressionEvaluator",
     "RasterSaver",
     "SafeEvaluator",
+    "TileCatalog",
+    "get_tile_catalog",
+    "is_tile_catalog",
     "LazyLayerRegistry",
     "get_lazy_layer_registry",
     "RasterCalcError",
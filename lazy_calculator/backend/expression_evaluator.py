@@ -118,14 +118,18 @@ class ExpressionEvaluator:
         expression: str,
         target_crs_authid: str = None,
         d_type: str = "<AUTO>",
+        resolution: str = "auto",
+        reference: str = None,
+        cell_size: float = None,
+        resampling="nearest",
     ):
         """
         Evaluates a raster expression by:
         - Extracting layer names.
         - Validating their presence in the QGIS project.
         - Validating the rasters have the same number of bands.
-        - Reprojecting rasters to a target CRS if specified.
-        - Aligning rasters to the smallest extent.
+        - Clipping rasters to their overlap and reprojecting them to a target CRS if specified.
+        - Aligning rasters to their overlap on the grid chosen by the resolution policy.
         - Creating a safe evaluation context.
         - Validating the expression syntax.
         - Replacing names with safe variable names.
@@ -136,6 +140,14 @@ class ExpressionEvaluator:
             expression (str): The raster math expression, with layer names in quotes.
             target_crs_authid (str, optional): The target CRS authority ID for reprojection.
             d_type (str, optional): The data type to cast the resulting raster to. Defaults to "<AUTO>".
+                "<AUTO>" and "<OPTIMIZE>" keep the dtype of the expression, "<OPTIMIZE>" results
+                are narrowed when saved, see RasterSaver.write.
+            resolution (str, optional): Output resolution policy: "auto", "finest", "coarsest",
+                "reference" or "explicit". Defaults to "auto".
+            reference (str, optional): Layer whose grid is used with the "reference" policy.
+            cell_size (float, optional): Output cell size with the "explicit" policy.
+            resampling (str or dict, optional): Resampling method for all layers, or a dictionary
+                of layer names to methods. Defaults to "nearest".
 
         Returns:
             raster_tools.Raster: The resulting lazily-evaluated raster object.
@@ -158,8 +170,12 @@ class ExpressionEvaluator:
         raster_objects = self.raster_manager.get_rasters(layer_names)
         self.raster_manager.check_bands(raster_objects)  # check for consistent bands
 
-        # Step 4.5a: Reproject rasters if needed to target CRS
+        # Step 4.5a: Clip rasters to their overlap in their own CRS, then reproject
+        # if needed to target CRS, so both only touch the overlapping area
         if target_crs_authid:
+            raster_objects = self.raster_manager.clip_to_overlap(
+                raster_objects, target_crs_authid
+            )
             raster_objects = {
                 name: self.raster_manager.reproject_if_needed(raster, target_crs_authid)
                 for name, raster in raster_objects.items()
@@ -171,7 +187,16 @@ class ExpressionEvaluator:
         # ref_name, raster_objects = self.raster_manager._align_to_smallest_extent(
         #     raster_objects
         # )
-        ref_name, raster_objects = self.raster_manager.align_to_overlap(raster_objects)
+        ref_name, raster_objects = self.raster_manager.align_to_overlap(
+            raster_objects,
+            resolution=resolution,
+            reference=reference,
+            cell_size=cell_size,
+            resampling=resampling,
+            sources={
+                name: self.raster_manager.get_source(name) for name in raster_objects
+            },
+        )
 
         # Step 5: Create a safe evaluation context
         context = {}  # maps safe variable names to Raster objects
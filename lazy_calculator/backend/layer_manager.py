@@ -24,6 +24,8 @@
 from qgis.core import QgsProject, QgsRasterLayer
 from typing import Optional
 from .exceptions import LayerNotFoundError
+from .mosaic import is_tile_catalog
+from ...zarr_output import zarr_store_path
 import re
 
 
@@ -63,7 +65,8 @@ class LayerManager:
 
     def validate_layer_names(self, layer_names: list[str]) -> None:
         """
-        Validates a list of raster layer names, ensuring all are present in the project.
+        Validates a list of raster layer names, ensuring all are present in the project
+        or name a tile catalogue (a folder of tiles, a glob pattern or a VRT) or a Zarr store.
 
         Args:
             layer_names (list[str]): A list of raster layer names to validate.
@@ -74,7 +77,12 @@ class LayerManager:
         missing_layers = []
         for name in layer_names:
             layer = self.get_raster_layer(name)
-            if layer is None:
+            base_name = re.sub(r"@\d+$", "", name)
+            if (
+                layer is None
+                and not is_tile_catalog(base_name)
+                and not zarr_store_path(base_name)
+            ):
                 missing_layers.append(name)
 
         if missing_layers:
@@ -0,0 +1,445 @@
+"""
+/***************************************************************************
+ RasterTools
+                                 A QGIS plugin
+ This plugin provides a raster calculator and delivered cost calculator.
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2025-07-31
+        git sha              : $Format:%H$
+        copyright            : (C) 2025 by Tim Van Driel
+        email                : timothy.vandriel@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import glob
+import math
+import os
+import xml.etree.ElementTree as ET
+from functools import partial
+from typing import NamedTuple
+
+import dask.array as da
+from dask.base import tokenize
+import numpy as np
+import rasterio
+import raster_tools
+import shapely
+import xarray as xr
+from affine import Affine
+from rasterio.windows import Window
+from raster_tools.masking import get_default_null_value
+from shapely import STRtree
+
+from ...chunk_planner import native_block_shape, plan_chunks
+from ...zarr_output import is_zarr_path
+
+TILE_EXTENSIONS = (".tif", ".tiff", ".img", ".jp2")
+
+
+class Tile(NamedTuple):
+    """A source tile, its pixel position in the mosaic grid and its own nodata value."""
+
+    path: str
+    row_off: int
+    col_off: int
+    height: int
+    width: int
+    nodata: float | None = None
+
+
+def is_tile_catalog(source: str) -> bool:
+    """
+    Checks if a layer name or source is a tile catalogue: a folder of tiles, a glob
+    pattern or a GDAL VRT.
+
+    Args:
+        source (str): The layer name or source path.
+
+    Returns:
+        bool: True if the source is a tile catalogue.
+    """
+    if is_zarr_path(source):
+        return False  # a Zarr store is a directory but a single raster
+    if any(char in source for char in "*?["):
+        return bool(glob.glob(source, recursive=True))
+    if source.lower().endswith(".vrt"):
+        return os.path.isfile(source)
+    return os.path.isdir(source)
+
+
+def catalog_paths(source: str) -> list[str]:
+    """
+    Lists the tile files of a tile catalogue.
+
+    Args:
+        source (str): A folder, a glob pattern or a VRT path.
+
+    Returns:
+        list[str]: The tile paths, in the order they are painted.
+    """
+    if source.lower().endswith(".vrt"):
+        return vrt_source_paths(source)
+    if os.path.isdir(source):
+        return sorted(
+            os.path.join(source, name)
+            for name in os.listdir(source)
+            if name.lower().endswith(TILE_EXTENSIONS)
+        )
+    return sorted(glob.glob(source, recursive=True))
+
+
+def vrt_source_paths(vrt_path: str) -> list[str]:
+    """
+    Reads the source files of a GDAL VRT, in the order GDAL paints them.
+
+    Args:
+        vrt_path (str): Path to the VRT.
+
+    Returns:
+        list[str]: The unique source file paths.
+    """
+    base = os.path.dirname(os.path.abspath(vrt_path))
+    paths = []
+    for element in ET.parse(vrt_path).getroot().iter("SourceFilename"):
+        path = _source_path(element, base)
+        if path not in paths:
+            paths.append(path)
+    return paths
+
+
+def _source_path(element, base):
+    path = element.text.strip()
+    if element.get("relativeToVRT") == "1":
+        path = os.path.join(base, path)
+    return path
+
+
+# VRT source elements that copy tile cells unchanged, and children that change values
+VRT_COPY_SOURCES = ("SimpleSource", "ComplexSource")
+VRT_VALUE_CHANGES = ("ScaleOffset", "ScaleRatio", "LUT", "ColorTableComponent", "Exponent")
+
+
+def _rect(element):
+    return tuple(
+        round(float(element.get(key))) for key in ("xOff", "yOff", "xSize", "ySize")
+    )
+
+
+def vrt_matches_catalog(vrt_path: str, catalog) -> bool:
+    """
+    Checks that a VRT is exactly the mosaic of its tiles: the same grid and shape as the
+    catalogue, and every source copies a whole tile, unscaled and unresampled, band by
+    band to its place on that grid. Clipped, resampled or rescaled VRTs are not.
+
+    Args:
+        vrt_path (str): Path to the VRT.
+        catalog (TileCatalog): The catalogue of the VRT's source files.
+
+    Returns:
+        bool: True if reading the tiles gives the same raster as reading the VRT.
+    """
+    with rasterio.open(vrt_path) as src:
+        if (
+            src.crs != catalog.crs
+            or src.count != catalog.count
+            or (src.height, src.width) != (catalog.height, catalog.width)
+            or not src.transform.almost_equals(catalog.transform, precision=1e-6)
+        ):
+            return False
+
+    base = os.path.dirname(os.path.abspath(vrt_path))
+    tiles = {tile.path: tile for tile in catalog.tiles}
+    for band in ET.parse(vrt_path).getroot().iter("VRTRasterBand"):
+        for source in band:
+            if not source.tag.endswith("Source"):
+                continue
+            if source.tag not in VRT_COPY_SOURCES or any(
+                source.find(tag) is not None for tag in VRT_VALUE_CHANGES
+            ):
+                return False
+            name = source.find("SourceFilename")
+            tile = None if name is None else tiles.get(_source_path(name, base))
+            src_band, src_rect, dst_rect = (
+                source.find(tag) for tag in ("SourceBand", "SrcRect", "DstRect")
+            )
+            if tile is None or src_band is None or src_band.text.strip() != band.get("band"):
+                return False
+            whole = (0, 0, tile.width, tile.height)
+            placed = (tile.col_off, tile.row_off, tile.width, tile.height)
+            if (src_rect is not None and _rect(src_rect) != whole) or (
+                dst_rect is not None and _rect(dst_rect) != placed
+            ):
+                return False
+    return True
+
+
+def _valid_mask(data, nodata):
+    if nodata is None:
+        return np.ones(data.shape, dtype=bool)
+    if np.isnan(nodata):
+        return ~np.isnan(data)
+    return data != nodata
+
+
+def _same_nodata(a, b):
+    if a is None or b is None:
+        return a is b
+    return a == b or (math.isnan(a) and math.isnan(b))
+
+
+def _read_block(tiles, location, count, dtype, fill):
+    """
+    Reads one mosaic chunk from the tiles that intersect it, later tiles painting over
+    earlier ones where they hold data. Each tile is masked with its own nodata value,
+    and cells no tile covers get the catalogue's fill value.
+    """
+    r0, r1, c0, c1 = location
+    out = np.full((count, r1 - r0, c1 - c0), 0 if fill is None else fill, dtype)
+    for tile in tiles:
+        rr0, rr1 = max(r0, tile.row_off), min(r1, tile.row_off + tile.height)
+        cc0, cc1 = max(c0, tile.col_off), min(c1, tile.col_off + tile.width)
+        window = Window(cc0 - tile.col_off, rr0 - tile.row_off, cc1 - cc0, rr1 - rr0)
+        with rasterio.open(tile.path) as src:
+            data = src.read(window=window)
+        target = out[:, rr0 - r0 : rr1 - r0, cc0 - c0 : cc1 - c0]
+        valid = _valid_mask(data, tile.nodata)
+        target[valid] = data[valid]
+    return out
+
+
+class TileCatalog:
+    """
+    A set of raster tiles on a common grid, read as a single lazy mosaic.
+
+    Chunk boundaries follow the tile edges, so every chunk reads from the tiles it
+    intersects only, and a clipped mosaic only reads the tiles under the clip.
+
+    Tiles may use different nodata values. The mosaic's nodata value is the one the
+    tiles share. Otherwise, or when some tiles have none and the tiles leave gaps, it is
+    NaN for floating point mosaics and raster_tools' default null value for integer
+    mosaics.
+    """
+
+    def __init__(self, paths: list[str]):
+        """
+        Reads the tile metadata and places the tiles on the mosaic grid.
+
+        Args:
+            paths (list[str]): The tile paths, in the order they are painted.
+
+        Raises:
+            ValueError: If there are no tiles, or the tiles differ in CRS, cell size or
+                band count, or are not aligned to a common grid.
+        """
+        if not paths:
+            raise ValueError("The tile catalogue is empty.")
+        metas = []
+        for path in paths:
+            with rasterio.open(path) as src:
+                metas.append(
+                    (src.crs, src.transform, src.height, src.width, src.count)
+                    + (src.dtypes[0], src.nodata)
+                )
+
+        crs, first, _, _, count, _, _ = metas[0]
+        rx, ry = first.a, -first.e
+        for path, (tile_crs, transform, _, _, tile_count, _, _) in zip(paths, metas):
+            if tile_crs != crs:
+                raise ValueError(f"Tile '{path}' has CRS {tile_crs}, expected {crs}.")
+            if tile_count != count:
+                raise ValueError(f"Tile '{path}' has {tile_count} bands, expected {count}.")
+            if not (
+                math.isclose(transform.a, rx, rel_tol=1e-9)
+                and math.isclose(-transform.e, ry, rel_tol=1e-9)
+                and transform.b == transform.d == 0
+            ):
+                raise ValueError(f"Tile '{path}' has a different cell size or rotation.")
+
+        x0 = min(meta[1].c for meta in metas)
+        y0 = max(meta[1].f for meta in metas)
+        self.tiles = []
+        for path, (_, transform, height, width, _, _, nodata) in zip(paths, metas):
+            col = (transform.c - x0) / rx
+            row = (y0 - transform.f) / ry
+            if abs(col - round(col)) > 1e-6 or abs(row - round(row)) > 1e-6:
+                raise ValueError(f"Tile '{path}' is not aligned to the mosaic grid.")
+            self.tiles.append(Tile(path, round(row), round(col), height, width, nodata))
+
+        self.crs = crs
+        self.count = count
+        self.dtype = np.result_type(*(meta[5] for meta in metas))
+        self.transform = Affine(rx, 0.0, x0, 0.0, -ry, y0)
+        self.height = max(tile.row_off + tile.height for tile in self.tiles)
+        self.width = max(tile.col_off + tile.width for tile in self.tiles)
+        # tile footprints in mosaic pixel coordinates
+        footprints = [
+            shapely.box(t.col_off, t.row_off, t.col_off + t.width, t.row_off + t.height)
+            for t in self.tiles
+        ]
+        self.tree = STRtree(footprints)
+        gaps = shapely.union_all(footprints).area < self.height * self.width
+        self.nodata = self._null_value(gaps)
+
+    def _null_value(self, gaps):
+        """
+        Chooses the mosaic's nodata value, which also fills the gaps between tiles.
+        """
+        first = self.tiles[0].nodata
+        shared = all(_same_nodata(tile.nodata, first) for tile in self.tiles)
+        if shared and not (first is None and gaps):
+            return first
+        if self.dtype.kind == "f":
+            return math.nan
+        return get_default_null_value(self.dtype)
+
+    def tiles_in_window(self, row0, row1, col0, col1) -> list[Tile]:
+        """
+        Returns the tiles that overlap a pixel window of the mosaic, in paint order.
+
+        Args:
+            row0, row1 (int): First and past-the-end rows of the window.
+            col0, col1 (int): First and past-the-end columns of the window.
+
+        Returns:
+            list[Tile]: The overlapping tiles.
+        """
+        index = self.tree.query(shapely.box(col0, row0, col1, row1))
+        return [
+            self.tiles[i]
+            for i in sorted(index)
+            if self.tiles[i].row_off < row1
+            and self.tiles[i].row_off + self.tiles[i].height > row0
+            and self.tiles[i].col_off < col1
+            and self.tiles[i].col_off + self.tiles[i].width > col0
+        ]
+
+    def _chunk_sizes(self, edges, step, block):
+        sizes = []
+        for start, stop in zip(edges[:-1], edges[1:]):
+            length = stop - start
+            # split into about length / step pieces, block aligned from the tile edge
+            pieces = max(1, round(length / step))
+            piece = min(length, math.ceil(length / pieces / block) * block)
+            sizes += [piece] * (length // piece)
+            if length % piece:
+                sizes.append(length % piece)
+        return tuple(sizes)
+
+    def chunks(self) -> tuple:
+        """
+        Chunk sizes of the mosaic: the tile edges, with tiles larger than the planned
+        chunk size split into block-aligned pieces.
+
+        Returns:
+            tuple: Dask chunks as ((bands,), row sizes, column sizes).
+        """
+        first = self.tiles[0]
+        block = native_block_shape(first.path) or (1, 1)
+        _, step_y, step_x = plan_chunks((first.height, first.width), self.dtype, block)
+        row_edges = sorted(
+            {0, self.height}
+            | {t.row_off for t in self.tiles}
+            | {t.row_off + t.height for t in self.tiles}
+        )
+        col_edges = sorted(
+            {0, self.width}
+            | {t.col_off for t in self.tiles}
+            | {t.col_off + t.width for t in self.tiles}
+        )
+        return (
+            (self.count,),
+            self._chunk_sizes(row_edges, step_y, block[0]),
+            self._chunk_sizes(col_edges, step_x, block[1]),
+        )
+
+    def to_dask(self) -> da.Array:
+        """
+        Builds the lazy mosaic array, one task per chunk that only holds the tiles of
+        its chunk, so the graph grows with the number of chunks, not chunks times tiles.
+
+        Returns:
+            dask.array.Array: Array of shape (bands, rows, cols).
+        """
+        chunks = self.chunks()
+        row_starts = np.cumsum((0,) + chunks[1]).tolist()
+        col_starts = np.cumsum((0,) + chunks[2]).tolist()
+        name = f"mosaic-{tokenize(self.tiles, self.dtype, self.nodata)}"
+        dsk = {}
+        for i, (r0, r1) in enumerate(zip(row_starts[:-1], row_starts[1:])):
+            for j, (c0, c1) in enumerate(zip(col_starts[:-1], col_starts[1:])):
+                # the partial keeps the tiles out of dask's task argument parsing
+                dsk[(name, 0, i, j)] = (
+                    partial(
+                        _read_block,
+                        tuple(self.tiles_in_window(r0, r1, c0, c1)),
+                        (r0, r1, c0, c1),
+                        self.count,
+                        self.dtype,
+                        self.nodata,
+                    ),
+                )
+        return da.Array(dsk, name, chunks, meta=np.empty((0, 0, 0), self.dtype))
+
+    def to_raster(self) -> raster_tools.Raster:
+        """
+        Builds the lazy mosaic as a raster_tools Raster.
+
+        Returns:
+            raster_tools.Raster: The mosaic.
+        """
+        rx, ry = self.transform.a, -self.transform.e
+        x0, y0 = self.transform.c, self.transform.f
+        xr_da = xr.DataArray(
+            self.to_dask(),
+            coords={
+                "band": np.arange(1, self.count + 1),
+                "y": y0 - (np.arange(self.height) + 0.5) * ry,
+                "x": x0 + (np.arange(self.width) + 0.5) * rx,
+            },
+            dims=["band", "y", "x"],
+        )
+        raster = raster_tools.Raster(xr_da).set_crs(self.crs)
+        if self.nodata is not None:
+            raster = raster.set_null_value(self.nodata)
+        return raster
+
+
+_catalogs = {}
+
+
+def get_tile_catalog(source: str) -> TileCatalog:
+    """
+    Returns the TileCatalog of a folder, glob pattern or VRT, reusing the catalogue
+    while none of its tiles changed so the tile metadata is only read once.
+
+    Args:
+        source (str): A folder, a glob pattern or a VRT path.
+
+    Returns:
+        TileCatalog: The catalogue.
+
+    Raises:
+        ValueError: If the tiles do not form a mosaic on a common grid, or a VRT does
+            not mosaic whole tiles (e.g. one file per band, or a clipped, resampled or
+            rescaled VRT), see vrt_matches_catalog.
+    """
+    paths = catalog_paths(source)
+    key = (source, tuple((path, os.path.getmtime(path)) for path in paths))
+    if key not in _catalogs:
+        catalog = TileCatalog(paths)
+        if source.lower().endswith(".vrt") and not vrt_matches_catalog(source, catalog):
+            raise ValueError(f"VRT '{source}' does not mosaic whole tiles.")
+        for old in [old for old in _catalogs if old[0] == source]:
+            del _catalogs[old]  # keep only the latest version of each source
+        _catalogs[key] = catalog
+    return _catalogs[key]
@@ -26,9 +26,16 @@ try:
 except ImportError:
     raise RasterToolsUnavailableError("raster_tools module is not installed.")
 
+import itertools
+import os
 import xarray as xr
 import numpy as np
 import math
+import rasterio
+import rioxarray
+from affine import Affine
+from rasterio.warp import transform_bounds
+from raster_tools.clipping import clip_box
 from .layer_manager import LayerManager
 from .exceptions import (
     RasterToolsUnavailableError,
@@ -37,8 +44,32 @@ from .exceptions import (
     RasterExtentError,
 )
 from .lazy_manager import get_lazy_layer_registry
+from .mosaic import get_tile_catalog, is_tile_catalog
+from ...chunk_planner import chunk_raster, native_block_shape
+from ...zarr_output import open_zarr, zarr_store_path
 import re
-from shapely import intersects
+import shapely
+from shapely import STRtree
+from qgis.core import QgsMessageLog, Qgis
+
+
+# how align_to_overlap chooses the output resolution
+RESOLUTION_POLICIES = ["auto", "finest", "coarsest", "reference", "explicit"]
+RESAMPLING_METHODS = [
+    "nearest",
+    "bilinear",
+    "cubic",
+    "cubic_spline",
+    "lanczos",
+    "average",
+    "mode",
+    "min",
+    "max",
+    "med",
+]
+# methods that average cells, which overviews (usually built with AVERAGE) stand in for;
+# nearest, mode, min, max and med must see the original values, e.g. class codes
+OVERVIEW_RESAMPLING = {"bilinear", "cubic", "cubic_spline", "lanczos", "average"}
 
 
 class RasterManager:
@@ -73,16 +104,13 @@ class RasterManager:
             "Int8": "int8",
         }
 
-    def get_raster(self, name: str):
+    def _split_name(self, name: str):
         """
-        Retrieves a raster_tools.Raster object for the given name.
-        If a band is specified using '@n', returns a single-band Raster.
-
+        Splits a layer name into its base name and band.
         Args:
             name (str): Raster layer name, optionally with "@<band>" suffix.
-
         Returns:
-            raster_tools.Raster
+            tuple: The base name, without a " (Lazy)" suffix, and the band or None.
         """
         # Extract base name and band (if present)
         match = re.match(r"^(.+?)@(\d+)$", name)
@@ -96,17 +124,66 @@ class RasterManager:
         # Strip " (Lazy)" from name if present
         if base_name.endswith(" (Lazy)"):
             base_name = base_name[:-7]
+        return base_name, band_index
+
+    def get_source(self, name: str):
+        """
+        Returns the file a project layer is read from, for reads that bypass the cached
+        Raster such as overview reads.
+
+        Args:
+            name (str): Raster layer name, optionally with "@<band>" suffix.
+
+        Returns:
+            tuple | None: The file path and band, or None for lazy layers, tile catalogues
+                and sources that are not local files.
+        """
+        base_name, band_index = self._split_name(name)
+        if self.lazy_registry.has(base_name):
+            return None
+        qgis_layer = self.layer_manager.get_raster_layer(base_name)
+        if not qgis_layer:
+            return None
+        source = qgis_layer.source()
+        if is_tile_catalog(source) or not os.path.isfile(source):
+            return None
+        return source, band_index
+
+    def get_raster(self, name: str):
+        """
+        Retrieves a raster_tools.Raster object for the given name.
+        If a band is specified using '@n', returns a single-band Raster.
+
+        Args:
+            name (str): Raster layer name, optionally with "@<band>" suffix.
+
+        Returns:
+            raster_tools.Raster
+        """
+        base_name, band_index = self._split_name(name)
 
         # Lazy lookup first
         if self.lazy_registry.has(base_name):
             raster = self.lazy_registry.get(base_name)
         else:
-            # Load from QGIS project
+            # Load from QGIS project, or a tile folder, glob or VRT named in the expression
             qgis_layer = self.layer_manager.get_raster_layer(base_name)
-            if not qgis_layer:
+            if qgis_layer:
+                source = qgis_layer.source()
+            elif is_tile_catalog(base_name) or zarr_store_path(base_name):
+                source = base_name
+            else:
                 raise LayerNotFoundError(f"Layer '{base_name}' not found in project.")
             try:
-                raster = raster_tools.Raster(qgis_layer.source())
+                if zarr_store_path(source):
+                    raster = self.get_zarr(zarr_store_path(source))
+                elif is_tile_catalog(source):
+                    raster = self.get_mosaic(source)
+                else:
+                    # chunk by size, dtype and block layout so computes parallelize predictably
+                    raster = chunk_raster(
+                        raster_tools.Raster(source), block=native_block_shape(source)
+                    )
             except Exception as e:
                 raise RasterToolsUnavailableError(
                     f"Could not load Raster from layer '{base_name}': {str(e)}"
@@ -122,6 +199,44 @@ class RasterManager:
                 )
         return raster
 
+    def get_zarr(self, path: str):
+        """
+        Opens a Zarr store written by the calculator or the delivered cost tool as a lazy
+        Raster that keeps the store's chunks, so it is read without copies or rechunking.
+
+        Args:
+            path (str): Path of the .zarr store.
+
+        Returns:
+            raster_tools.Raster: The stored raster.
+        """
+        xr_da, nodata = open_zarr(path)
+        raster = raster_tools.Raster(xr_da)
+        if nodata is not None:
+            raster = raster.set_null_value(nodata)
+        return raster
+
+    def get_mosaic(self, source: str):
+        """
+        Builds a lazy mosaic Raster from a tile catalogue, with one chunk per tile (or
+        per block-aligned piece of a large tile). VRTs whose sources are not a mosaic of
+        whole tiles on one grid are opened as a single raster instead.
+
+        Args:
+            source (str): A folder of tiles, a glob pattern or a VRT path.
+
+        Returns:
+            raster_tools.Raster: The mosaic.
+        """
+        try:
+            return get_tile_catalog(source).to_raster()
+        except ValueError:
+            if not source.lower().endswith(".vrt"):
+                raise
+            return chunk_raster(
+                raster_tools.Raster(source), block=native_block_shape(source)
+            )
+
     def get_rasters(self, names: list[str]) -> dict[str, raster_tools.Raster]:
         """
         Retrieves a dictionary of `raster_tools.Raster` objects for a list of layer names.
@@ -172,6 +287,141 @@ class RasterManager:
             return raster
         return raster.reproject(crs_or_geobox=target_crs)
 
+    def clip_to_overlap(self, rasters: dict, target_crs: str, margin_cells: int = 4):
+        """
+        Clips each raster, in its own CRS, to the area all rasters share in the target CRS
+        so reprojection and alignment only build tasks for the overlap.
+
+        Args:
+            rasters (dict): A dictionary of raster names and their corresponding raster objects.
+            target_crs (str): The target CRS in AUTHID format (e.g., "EPSG:4326").
+            margin_cells (int): Margin kept around the overlap, in source cells, so the
+                resampling kernels at the edges have their neighbours.
+
+        Returns:
+            dict: The clipped rasters. Rasters that are inside the overlap, or whose
+                footprint cannot be transformed, are returned unchanged.
+        """
+        if len(rasters) <= 1:
+            return rasters
+        try:
+            footprints = np.array(
+                [
+                    transform_bounds(
+                        raster.crs.to_wkt(), target_crs, *raster.bounds, densify_pts=21
+                    )
+                    for raster in rasters.values()
+                ]
+            )
+        except Exception:
+            return rasters
+        minx, miny = footprints[:, :2].max(axis=0)
+        maxx, maxy = footprints[:, 2:].min(axis=0)
+        if minx >= maxx or miny >= maxy:
+            return rasters  # raster_overlap reports the missing overlap
+
+        clipped = {}
+        for name, raster in rasters.items():
+            try:
+                left, bottom, right, top = transform_bounds(
+                    target_crs, raster.crs.to_wkt(), minx, miny, maxx, maxy, densify_pts=21
+                )
+            except Exception:
+                clipped[name] = raster
+                continue
+            clipped[name] = self._clip_to_bounds(
+                raster, (left, bottom, right, top), margin_cells
+            )
+        return clipped
+
+    def _clip_to_bounds(self, raster, bounds, margin_cells):
+        """
+        Clips a raster to bounds in its own CRS grown by a margin of cells.
+        Args:
+            raster (raster_tools.Raster): The raster to clip.
+            bounds (tuple): (minx, miny, maxx, maxy) in the raster's CRS.
+            margin_cells (int): Margin in cells of the raster.
+        Returns:
+            raster_tools.Raster: The clipped raster, or the raster itself if it lies inside the bounds.
+        """
+        left, bottom, right, top = bounds
+        transform = raster.geobox.transform
+        margin = margin_cells * max(abs(transform.a), abs(transform.e))
+        r_left, r_bottom, r_right, r_top = raster.bounds
+        box = (
+            max(left - margin, r_left),
+            max(bottom - margin, r_bottom),
+            min(right + margin, r_right),
+            min(top + margin, r_top),
+        )
+        if box == (r_left, r_bottom, r_right, r_top):
+            return raster
+        return clip_box(raster, box)
+
+    def overview_raster(
+        self, source, template, resampling="nearest", margin_cells: int = 4
+    ):
+        """
+        Reads a file from its coarsest overview (internal or external .ovr) that is still
+        at least as fine as a target grid, clipped to the grid's extent.
+
+        Overview cells are usually averages, so they are only used when the raster is
+        resampled with a continuous method (see OVERVIEW_RESAMPLING). Categorical methods
+        such as nearest or mode read the full resolution file.
+
+        Args:
+            source (tuple): File path and band, as returned by get_source.
+            template (raster_tools.Raster): A raster on the target grid.
+            resampling (str): Resampling method the raster is aligned with.
+            margin_cells (int): Margin kept around the grid's extent, in overview cells.
+
+        Returns:
+            raster_tools.Raster | None: The overview raster in the file's CRS, or None if the
+                file has no overview coarse enough to save reads, the resampling method
+                needs the original values or the overview could not be read.
+        """
+        if resampling not in OVERVIEW_RESAMPLING:
+            return None
+        path, band_index = source
+        try:
+            with rasterio.open(path) as src:
+                factors = src.overviews(1)
+                native_res = max(abs(src.transform.a), abs(src.transform.e))
+                src_crs = src.crs
+            if not factors:
+                return None
+
+            # target cell size in the file's CRS
+            rows, cols = template.shape[-2:]
+            bounds = transform_bounds(
+                template.crs.to_wkt(), src_crs, *template.bounds, densify_pts=21
+            )
+            target_res = min(
+                (bounds[2] - bounds[0]) / cols, (bounds[3] - bounds[1]) / rows
+            )
+            levels = [
+                level
+                for level, factor in enumerate(factors)
+                if native_res * factor <= target_res * (1 + 1e-6)
+            ]
+            if not levels:
+                return None
+
+            xr_da = rioxarray.open_rasterio(path, overview_level=levels[-1], chunks=True)
+            raster = raster_tools.Raster(xr_da)
+            if band_index is not None:
+                raster = raster.get_bands([band_index])
+            raster = self._clip_to_bounds(raster, bounds, margin_cells)
+            return chunk_raster(raster, block=native_block_shape(path))
+        except Exception as e:
+            QgsMessageLog.logMessage(
+                f"Could not read the overviews of {path}, reading it at full "
+                f"resolution: {e}",
+                "Lazy Raster Calculator",
+                Qgis.Warning,
+            )
+            return None
+
     def _approx_geobox_area(self, geobox):
         """
         Estimates the area of a geobox by mulitplying its rows, columns, and pixel size.
@@ -184,42 +434,110 @@ class RasterManager:
         px_w, px_h = geobox.affine.a, abs(geobox.affine.e)  # Get pixel width and height
         return rows * cols * px_w * px_h
 
-    def align_to_overlap(self, rasters: dict):
+    def _pixel_area(self, geobox):
+        """
+        Returns the area of a single pixel of a geobox.
+        Args:
+            geobox (raster_tools.Geobox): The geobox.
+        Returns:
+            float: The pixel area.
+        """
+        return abs(geobox.transform.a * geobox.transform.e)
+
+    def resolution_reference(self, rasters: dict, resolution="auto", reference=None):
+        """
+        Picks the raster whose grid the aligned rasters follow.
+
+        Args:
+            rasters (dict): A dictionary of raster names and their corresponding raster objects.
+            resolution (str): One of RESOLUTION_POLICIES. "auto" and "explicit" use the raster
+                with the smallest extent, "finest" and "coarsest" the raster with the smallest
+                or largest pixels, and "reference" the raster named by `reference`.
+            reference (str, optional): Name of the reference raster for the "reference" policy.
+
+        Returns:
+            tuple: The reference raster name and raster.
+
+        Raises:
+            LayerNotFoundError: If the reference raster is not one of the rasters.
+            ValueError: If the resolution policy is unknown.
+        """
+        if resolution in ("auto", "explicit"):
+            return min(
+                rasters.items(),
+                key=lambda item: self._approx_geobox_area(item[1].geobox),
+            )
+        if resolution == "finest":
+            return min(rasters.items(), key=lambda item: self._pixel_area(item[1].geobox))
+        if resolution == "coarsest":
+            return max(rasters.items(), key=lambda item: self._pixel_area(item[1].geobox))
+        if resolution == "reference":
+            if reference not in rasters:
+                raise LayerNotFoundError(
+                    f"Reference layer '{reference}' is not used in the expression."
+                )
+            return reference, rasters[reference]
+        raise ValueError(f"Unknown resolution policy '{resolution}'.")
+
+    def align_to_overlap(
+        self,
+        rasters: dict,
+        resolution: str = "auto",
+        reference: str = None,
+        cell_size: float = None,
+        resampling="nearest",
+        sources: dict = None,
+    ):
         """Aligns multiple rasters to their common overlap area by creating a proper intersection grid.
 
         Args:
             rasters (dict): A dictionary of raster names and their corresponding raster objects.
                         All rasters should already be in the same CRS and have confirmed overlap.
+            resolution (str): Resolution policy, one of RESOLUTION_POLICIES (see resolution_reference).
+            reference (str, optional): Name of the reference raster for the "reference" policy.
+            cell_size (float, optional): Cell size in CRS units for the "explicit" policy.
+            resampling (str or dict): Resampling method for all rasters, or a dictionary of
+                raster names to methods, rasters missing from it use "nearest".
+            sources (dict, optional): File sources of the rasters, as returned by get_source.
+                Rasters with a source are read from their coarsest overview that still
+                resolves the output grid (see overview_raster).
 
         Returns:
             tuple: A tuple containing the reference raster name and a dictionary of aligned rasters.
         """
-        # If only one raster, return it as the reference
-        if len(rasters) <= 1:
+        if resolution == "explicit" and not (cell_size and cell_size > 0):
+            raise ValueError("A positive cell size is required for the explicit policy.")
+
+        # If only one raster on its own grid, return it as the reference
+        if len(rasters) <= 1 and resolution != "explicit":
             return next(iter(rasters)), rasters
 
-        # Find the raster with the smallest area to use as reference for resolution
-        ref_name, ref_raster = min(
-            rasters.items(),
-            key=lambda item: self._approx_geobox_area(item[1].geobox),
-        )
+        # Find the raster whose grid and resolution the others are aligned to
+        ref_name, ref_raster = self.resolution_reference(rasters, resolution, reference)
 
         # Calculate intersection bounds (all rasters are already in same CRS)
-        bounds_list = [raster.bounds for raster in rasters.values()]
+        bounds = np.array([raster.bounds for raster in rasters.values()])
 
-        intersection_left = max(bounds[0] for bounds in bounds_list)  # minx
-        intersection_bottom = max(bounds[1] for bounds in bounds_list)  # miny
-        intersection_right = min(bounds[2] for bounds in bounds_list)  # maxx
-        intersection_top = min(bounds[3] for bounds in bounds_list)  # maxy
+        intersection_left, intersection_bottom = bounds[:, :2].max(axis=0)  # minx, miny
+        intersection_right, intersection_top = bounds[:, 2:].min(axis=0)  # maxx, maxy
 
-        # Get reference raster's resolution
+        # Get reference raster's resolution, or the explicit cell size on its grid origin
         ref_geobox = ref_raster.geobox
-        pixel_size_x = abs(ref_geobox.transform.a)  # x pixel size
-        pixel_size_y = abs(ref_geobox.transform.e)  # y pixel size
+        ref_transform = ref_geobox.transform
+        if resolution == "explicit":
+            ref_transform = Affine(
+                math.copysign(cell_size, ref_transform.a),
+                0.0,
+                ref_transform.c,
+                0.0,
+                math.copysign(cell_size, ref_transform.e),
+                ref_transform.f,
+            )
+        pixel_size_x = abs(ref_transform.a)  # x pixel size
+        pixel_size_y = abs(ref_transform.e)  # y pixel size
 
         # Create a proper grid-aligned intersection area
         # Align the intersection bounds to the reference raster's pixel grid
-        ref_transform = ref_geobox.transform
 
         # Find the pixel coordinates in the reference raster's grid that contain the intersection bounds
         # Convert geographic coordinates to pixel coordinates
@@ -272,7 +590,21 @@ class RasterManager:
         # Reproject all rasters to the intersection geobox
         for name, raster in rasters.items():
             # Reproject to the intersection grid
-            reprojected = raster.reproject(crs_or_geobox=target_geobox)
+            method = (
+                resampling.get(name, "nearest")
+                if isinstance(resampling, dict)
+                else resampling
+            )
+            # Coarse output grids read from an overview instead of full resolution
+            if sources and sources.get(name):
+                overview = self.overview_raster(
+                    sources[name], template_raster, resampling=method
+                )
+                if overview is not None:
+                    raster = overview
+            reprojected = raster.reproject(
+                crs_or_geobox=target_geobox, resample_method=method
+            )
 
             new_coords_x = reprojected.xdata.coords["x"].values
             new_coords_y = reprojected.xdata.coords["y"].values
@@ -374,25 +706,49 @@ class RasterManager:
 
     def raster_overlap(self, raster_dict):
         """Checks if all rasters in the dictionary overlap in extent.
+
+        Pairwise overlapping rectangles always share a common area, so axis-aligned extents
+        are checked at once with min/max reductions over their bounds. Only when that fails,
+        or for rotated extents, an STRtree finds the overlapping pairs.
+
         Args:
             raster_dict (dict): Dictionary of raster names and their corresponding raster objects.
         Returns:
             bool: True if all rasters overlap
         Raises:
-            RasterExtentError: If any pair of rasters do not overlap in extent.
+            RasterExtentError: If any pair of rasters do not overlap in extent, listing every such pair.
         """
         if len(raster_dict) <= 1:
             return True
+        names = list(raster_dict.keys())
         # Get the polygons representing the extents of all rasters
-        raster_polygons = [raster.geobox.extent.geom for raster in raster_dict.values()]
-        # Check if all polygons overlap
-        for i in range(len(raster_polygons)):
-            for j in range(i + 1, len(raster_polygons)):
-                if not intersects(raster_polygons[i], raster_polygons[j]):
-                    raise RasterExtentError(
-                        f"Rasters '{list(raster_dict.keys())[i]}' and '{list(raster_dict.keys())[j]}' are not in the same extent."
-                    )
-        return True
+        polygons = np.array([raster.geobox.extent.geom for raster in raster_dict.values()])
+        bounds = shapely.bounds(polygons)
+        rectangular = np.allclose(
+            shapely.area(polygons), shapely.area(shapely.envelope(polygons))
+        )
+        if rectangular and np.all(bounds[:, :2].max(axis=0) <= bounds[:, 2:].min(axis=0)):
+            return True
+
+        # The tree returns the overlapping pairs, every other pair does not overlap
+        left, right = STRtree(polygons).query(polygons, predicate="intersects")
+        upper = left < right
+        n = len(names)
+        missing = n * (n - 1) // 2 - int(upper.sum())
+        if missing == 0:
+            return True
+        partners = {}
+        for i, j in zip(left[upper].tolist(), right[upper].tolist()):
+            partners.setdefault(i, set()).add(j)
+        disjoint = (
+            (i, j) for i in range(n) for j in range(i + 1, n) if j not in partners.get(i, ())
+        )
+        pairs = [f"'{names[i]}' and '{names[j]}'" for i, j in itertools.islice(disjoint, 10)]
+        if missing > 10:
+            pairs.append(f"{missing - 10} more pairs")
+        raise RasterExtentError(
+            "Rasters are not in the same extent: " + ", ".join(pairs) + "."
+        )
 
     def get_overlap_bounds(self, rasters: dict):
         """
@@ -407,23 +763,18 @@ class RasterManager:
         Raises:
             RasterExtentError: If there is no overlap.
         """
+        bounds = np.array(
+            [tuple(raster.geobox.extent.boundingbox) for raster in rasters.values()]
+        )
         if len(rasters) <= 1:
-            return tuple(rasters[next(iter(rasters))].geobox.extent.boundingbox)
-
-        # Start with the first raster's bbox
-        first_extent = next(iter(rasters.values())).geobox.extent.boundingbox
-        minx, miny, maxx, maxy = first_extent
+            return tuple(bounds[0].tolist())
 
-        # Intersect with each other raster's bbox
-        for raster in list(rasters.values())[1:]:
-            r_minx, r_miny, r_maxx, r_maxy = raster.geobox.extent.boundingbox
-            minx = max(minx, r_minx)
-            miny = max(miny, r_miny)
-            maxx = min(maxx, r_maxx)
-            maxy = min(maxy, r_maxy)
+        # Intersect all bboxes at once
+        minx, miny = bounds[:, :2].max(axis=0)
+        maxx, maxy = bounds[:, 2:].min(axis=0)
 
-            # If there's no overlap
-            if minx >= maxx or miny >= maxy:
-                raise RasterExtentError("No overlapping area between rasters.")
+        # If there's no overlap
+        if minx >= maxx or miny >= maxy:
+            raise RasterExtentError("No overlapping area between rasters.")
 
-        return (minx, miny, maxx, maxy)
+        return (float(minx), float(miny), float(maxx), float(maxy))
@@ -21,86 +21,313 @@
  ***************************************************************************/
 """
 
+import contextlib
 import os
+import queue
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor
 from qgis.core import QgsProject, QgsRasterLayer, QgsMessageLog, Qgis
+from qgis.PyQt.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal, pyqtSlot
 import traceback
-import gc
-from qgis.core import QgsProcessingUtils
+import dask
+import dask.local
+import dask.threaded
+import dask.array as da
+import numpy as np
+import rasterio
+from rasterio.windows import Window
+from raster_tools.masking import get_default_null_value
+from ...compute_settings import get_compute_settings
+from ...dtype_optimizer import narrow_written, stats_graph, value_stats
+from ...temp_store import get_temp_store
+from ...zarr_output import is_zarr_path, layer_uri, write_raster_zarr
 
-temp_dir = QgsProcessingUtils.tempFolder()
+PIPELINE_DEPTH = 4  # computed blocks waiting to be written, bounds the pipeline's memory
 
-# from osgeo import gdal
+
+class PipelinedWriter:
+    """
+    `dask.array.store` target that hands each computed block to a writer thread through
+    a bounded queue, so dask computes the next blocks while the previous ones are
+    compressed and written. A full queue blocks the computing tasks until the writer
+    catches up.
+    """
+
+    def __init__(self, path: str, profile: dict, depth: int = PIPELINE_DEPTH):
+        """
+        Args:
+            path (str): Output file path.
+            profile (dict): rasterio creation profile of the output.
+            depth (int): Number of computed blocks that may wait for the writer.
+        """
+        self.dst = rasterio.open(path, "w", **profile)
+        self.queue = queue.Queue(maxsize=depth)
+        self.error = None
+        self.thread = threading.Thread(target=self._write_loop, daemon=True)
+        self.thread.start()
+
+    def __setitem__(self, key, block):
+        if self.error is not None:
+            raise self.error
+        self.queue.put((key, np.asarray(block)))
+
+    def _write_loop(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            if self.error is not None:
+                continue  # keep draining so no computing task blocks forever
+            (bands, rows, cols), block = item
+            try:
+                self.dst.write(
+                    block,
+                    indexes=list(range(bands.start + 1, bands.stop + 1)),
+                    window=Window.from_slices(rows, cols),
+                )
+            except Exception as e:
+                self.error = e
+
+    def close(self):
+        """
+        Waits for the queued blocks to be written and closes the file.
+
+        Raises:
+            Exception: The first error raised while writing.
+        """
+        self.queue.put(None)
+        self.thread.join()
+        self.dst.close()
+        if self.error is not None:
+            raise self.error
 
 
-class RasterSaver:
+def _narrow_saved(output_path: str):
+    """
+    Narrows a GeoTIFF written by Raster.save, reading its value statistics back from
+    the file instead of computing the raster again.
+    """
+    import rioxarray
+
+    xrs = rioxarray.open_rasterio(output_path, chunks=True, cache=False, lock=False)
+    try:
+        dtype, nodata = xrs.dtype, xrs.rio.nodata
+        stats = value_stats(xrs.data, nodata)
+    finally:
+        xrs.close()
+    narrow_written(output_path, dtype, stats, nodata)
+
+
+def runs_in_process(scheduler=None) -> bool:
+    """
+    Whether a dask scheduler runs its tasks on threads of this process.
+
+    Args:
+        scheduler (optional): A scheduler passed to dask computes, the configured
+            scheduler if None.
+
+    Returns:
+        bool: True for thread pools and the threaded and synchronous schedulers, False
+            for processes and dask.distributed clients.
+    """
+    if isinstance(scheduler, Executor):
+        return isinstance(scheduler, ThreadPoolExecutor)
+    return dask.base.get_scheduler(scheduler=scheduler) in (
+        None,
+        dask.threaded.get,
+        dask.local.get_sync,
+    )
+
+
+def write_geotiff(
+    raster,
+    output_path: str,
+    depth: int = PIPELINE_DEPTH,
+    optimize_dtype=False,
+    scheduler=None,
+):
+    """
+    Writes a raster to a tiled GeoTIFF, overlapping the compute of each block with the
+    write of the previous ones. Schedulers that do not run tasks in this process, see
+    runs_in_process, cannot hand blocks to the writer thread and use the raster_tools
+    writer instead.
+
+    Args:
+        raster: The raster object to be saved (from raster-tools).
+        output_path (str): The file path where the raster should be saved.
+        depth (int): Number of computed blocks that may wait for the writer.
+        optimize_dtype (bool): Rewrite the file with the narrowest lossless dtype. Its
+            value statistics are computed in the same pass as the write, see
+            dtype_optimizer.narrow_written.
+        scheduler (optional): The dask scheduler, defaults to the configured scheduler.
+    """
+    if not runs_in_process(scheduler):
+        with contextlib.ExitStack() as stack:
+            if hasattr(scheduler, "as_current"):
+                # a dask.distributed client, current for this thread's computes only
+                stack.enter_context(scheduler.as_current())
+            raster.save(output_path, driver="GTiff", tiled=True)
+            if optimize_dtype:
+                _narrow_saved(output_path)
+        return
+
+    if raster.dtype == bool:
+        # as Raster.save does, a bool null value would mark every True cell as nodata
+        raster = raster.astype("uint8").set_null_value(get_default_null_value("uint8"))
+    data = raster.data
+    bands, rows, cols = data.shape
+    profile = {
+        "driver": "GTiff",
+        "count": bands,
+        "height": rows,
+        "width": cols,
+        "dtype": data.dtype.name,
+        "crs": raster.crs.to_wkt() if raster.crs is not None else None,
+        "transform": raster.geobox.transform,
+        "nodata": raster.null_value,
+        "tiled": True,
+        "blockxsize": 256,
+        "blockysize": 256,
+        "BIGTIFF": "IF_SAFER",
+    }
+    writer = PipelinedWriter(output_path, profile, depth)
+    try:
+        store = da.store(data, writer, lock=False, compute=False)
+        stats = stats_graph(data, raster.null_value) if optimize_dtype else None
+        _, stats = dask.compute(store, stats, scheduler=scheduler)
+    finally:
+        writer.close()
+    if optimize_dtype:
+        narrow_written(output_path, data.dtype, stats, raster.null_value)
+
+
+class SaveSignals(QObject):
+    """Signals for the save worker to report back to the main thread."""
+
+    saved = pyqtSignal(str)  # output path
+    error = pyqtSignal(str, str)  # output path and error message
+
+
+class SaveWorker(QRunnable):
+    """Worker thread computing and writing a raster off the main thread."""
+
+    def __init__(self, saver, raster, output_path: str, driver="GTiff", optimize_dtype=False):
+        super().__init__()
+        self.saver = saver
+        self.raster = raster
+        self.output_path = output_path
+        self.driver = driver
+        self.optimize_dtype = optimize_dtype
+        self.signals = SaveSignals()
+
+    @pyqtSlot()
+    def run(self):
+        """Write the raster and report the result."""
+        try:
+            self.saver.write(
+                self.raster, self.output_path, self.driver, self.optimize_dtype
+            )
+            self.signals.saved.emit(self.output_path)
+        except Exception as e:
+            tb = traceback.format_exc()
+            QgsMessageLog.logMessage(
+                f"Error saving raster: {str(e)}\nTraceback:\n{tb}",
+                "Lazy Raster Calculator",
+                Qgis.Critical,
+            )
+            self.signals.error.emit(self.output_path, str(e))
+        finally:
+            self.raster = None  # release the graph and its buffers
+
+
+class RasterSaver(QObject):
     """
     Handles saving and post-processing of raster results.
     Responsible for saving the raster output to disk,
     adding it to the QGIS project.
+
+    save_async writes on a worker thread and adds the layer to the project from the
+    main thread once the file is complete, then emits layerAdded or saveFailed.
     """
 
-    def save(self, raster, output_path: str, driver="GTiff"):
+    layerAdded = pyqtSignal(str, object)  # output path and the added QgsRasterLayer
+    saveFailed = pyqtSignal(str, str)  # output path and error message
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.threadpool = QThreadPool.globalInstance()
+        self.workers = set()  # keeps running workers and their signals alive
+
+    def write(self, raster, output_path: str, driver="GTiff", optimize_dtype=False):
         """
-        Save the raster to the specified output path using the given driver
-        and automatically add it to the current QGIS project.
+        Compute the raster and write it to disk on the configured dask scheduler.
         Parameters:
             raster: The raster object to be saved (from raster-tools).
             output_path (str): The file path where the raster should be saved.
-            driver (str): The raster file format driver (default is "GTiff").
+            driver (str): The raster file format driver (default is "GTiff"). "Zarr", or an
+                output path ending in .zarr, writes a Zarr store chunk by chunk in parallel.
+            optimize_dtype (bool): Write GeoTIFF and Zarr outputs with the narrowest
+                dtype that holds their values without loss. The value range is computed
+                while the raster is written, and the output is then copied to the narrow
+                dtype, so the raster is only computed once.
+        """
+        # passed to this save's computes only, saves run on several threads at once
+        scheduler = get_compute_settings().dask_scheduler()
+        if driver == "Zarr" or is_zarr_path(output_path):
+            write_raster_zarr(
+                raster, output_path, optimize_dtype=optimize_dtype, scheduler=scheduler
+            )
+        elif driver == "GTiff":
+            write_geotiff(
+                raster, output_path, optimize_dtype=optimize_dtype, scheduler=scheduler
+            )
+        else:
+            # computed by raster_tools on dask's default threaded scheduler
+            raster.save(output_path, driver=driver, tiled=True)
+
+    def add_layer(self, output_path: str):
+        """
+        Add a written raster to the current QGIS project.
+        Parameters:
+            output_path (str): The file path of the raster.
         Returns:
-            QgsRasterLayer: The added raster layer in the QGIS project, or None if save failed.
+            QgsRasterLayer: The added raster layer, or None if the file was not created.
         """
-        try:
-            # DEBUG: Check file before save
+        if not os.path.exists(output_path):
             QgsMessageLog.logMessage(
-                f"🔍 DEBUG: File exists before save: {os.path.exists(output_path)}",
+                f"Warning: Save operation completed but file was not created: {output_path}",
                 "Lazy Raster Calculator",
-                Qgis.Info,
+                Qgis.Warning,
             )
-            # The actual save call
-            raster.save(output_path, driver=driver, tiled=True)
-
-            # DEBUG: Check file after save
-            file_exists_after = os.path.exists(output_path)
-            file_size = os.path.getsize(output_path) if file_exists_after else 0
-
-            # Force file to be completely written and closed
-            gc.collect()  # Force garbage collection to free up memory
-            # try:
-            #     ds = gdal.Open(output_path)
-            #     if ds:
-            #         band = ds.GetRasterBand(1)
-            #         # Force GDAL to read and calculate stats
-            #         stats = band.ComputeStatistics(False)
-            #         ds = None  # Close the dataset
-            # except Exception as e:
-            #     QgsMessageLog.logMessage(
-            #         f"GDAL error while reading saved raster: {str(e)}",
-            #         "Lazy Raster Calculator",
-            #         Qgis.Critical,
-            #     )
-            #     return None
-            # Only proceed with QGIS layer addition if file actually exists
-            if file_exists_after and file_size > 0:
-                layer = QgsRasterLayer(
-                    output_path, os.path.basename(output_path).split(".")[0]
-                )
-                QgsProject.instance().addMapLayer(layer)
-                QgsMessageLog.logMessage(
-                    f"Raster saved to {output_path}",
-                    "Lazy Raster Calculator",
-                    Qgis.Info,
-                )
-                return layer  # Return the layer
-                # Log a success message in the QGIS message log
-            else:
-                QgsMessageLog.logMessage(
-                    f"Warning: Save operation completed but file was not created: {output_path}",
-                    "Lazy Raster Calculator",
-                    Qgis.Warning,
-                )
-                return None  # Return None if file was not created
+            return None
+        layer = QgsRasterLayer(
+            layer_uri(output_path), os.path.basename(output_path).split(".")[0]
+        )
+        QgsProject.instance().addMapLayer(layer)
+        QgsMessageLog.logMessage(
+            f"Raster saved to {output_path}",
+            "Lazy Raster Calculator",
+            Qgis.Info,
+        )
+        return layer
 
+    def save(self, raster, output_path: str, driver="GTiff", optimize_dtype=False):
+        """
+        Save the raster to the specified output path using the given driver
+        and automatically add it to the current QGIS project. Blocks until the
+        raster is written, see save_async to save in the background.
+        Parameters:
+            raster: The raster object to be saved (from raster-tools).
+            output_path (str): The file path where the raster should be saved.
+            driver (str): The raster file format driver (default is "GTiff"). "Zarr", or an
+                output path ending in .zarr, writes a Zarr store chunk by chunk in parallel.
+            optimize_dtype (bool): Write the narrowest lossless dtype, see write.
+        Returns:
+            QgsRasterLayer: The added raster layer in the QGIS project, or None if save failed.
+        """
+        try:
+            self.write(raster, output_path, driver, optimize_dtype)
+            return self.add_layer(output_path)
         except Exception as e:
             tb = traceback.format_exc()
             QgsMessageLog.logMessage(
@@ -108,16 +335,79 @@ class RasterSaver:
                 "Lazy Raster Calculator",
                 Qgis.Critical,
             )
+        finally:
+            get_temp_store().release(output_path)
+
+    def save_async(self, raster, output_path: str, driver="GTiff", optimize_dtype=False):
+        """
+        Save the raster on a worker thread. The layer is added to the project when the
+        file is complete, followed by layerAdded, or saveFailed is emitted.
+        Parameters:
+            raster: The raster object to be saved (from raster-tools).
+            output_path (str): The file path where the raster should be saved.
+            driver (str): The raster file format driver (default is "GTiff").
+            optimize_dtype (bool): Write the narrowest lossless dtype, see write.
+        Returns:
+            SaveWorker: The started worker.
+        """
+        worker = SaveWorker(self, raster, output_path, driver, optimize_dtype)
+        worker.signals.saved.connect(self._on_saved)
+        worker.signals.error.connect(self._on_failed)
+        worker.signals.saved.connect(lambda _: self.workers.discard(worker))
+        worker.signals.error.connect(lambda *_: self.workers.discard(worker))
+        self.workers.add(worker)
+        self.threadpool.start(worker)
+        return worker
+
+    @pyqtSlot(str)
+    def _on_saved(self, output_path):
+        layer = self.add_layer(output_path)
+        if layer is None:
+            self.saveFailed.emit(output_path, "The output file was not created.")
+        else:
+            self.layerAdded.emit(output_path, layer)
+        get_temp_store().release(output_path)
+
+    @pyqtSlot(str, str)
+    def _on_failed(self, output_path, message):
+        get_temp_store().release(output_path)
+        self.saveFailed.emit(output_path, message)
+
+    def temp_path(self, name):
+        """
+        Generates a unique temporary output path for a raster from the temp store. The
+        path counts against the temporary outputs quota once the raster is saved.
+        Parameters:
+            name (str): The name to use for the temporary file.
+        Returns:
+            str: The output path.
+        """
+        return get_temp_store().new_path(name)
 
-    def temp_output(self, raster, name):
+    def temp_output(self, raster, name, optimize_dtype=False):
         """
         Generates a temporary output path for the raster and saves it.
         Parameters:
             raster: The raster object to be saved (from raster-tools).
             name (str): The name to use for the temporary file.
+            optimize_dtype (bool): Write the narrowest lossless dtype, see write.
         Returns:
             tuple: A tuple containing the QgsRasterLayer and the output path.
         """
-        output_path = os.path.join(temp_dir, f"{name}.tif")
-        layer = self.save(raster, output_path)
+        output_path = self.temp_path(name)
+        layer = self.save(raster, output_path, optimize_dtype=optimize_dtype)
         return layer, output_path
+
+    def temp_output_async(self, raster, name, optimize_dtype=False):
+        """
+        Saves the raster to a temporary output path in the background, see save_async.
+        Parameters:
+            raster: The raster object to be saved (from raster-tools).
+            name (str): The name to use for the temporary file.
+            optimize_dtype (bool): Write the narrowest lossless dtype, see write.
+        Returns:
+            str: The output path.
+        """
+        output_path = self.temp_path(name)
+        self.save_async(raster, output_path, optimize_dtype=optimize_dtype)
+        return output_path
@@ -25,7 +25,7 @@
 import os
 
 from qgis.PyQt import QtWidgets, uic
-from qgis.PyQt.QtCore import pyqtSignal
+from qgis.PyQt.QtCore import Qt, pyqtSignal
 from qgis.PyQt.QtWidgets import QAction
 from qgis.core import (
     QgsProject,
@@ -47,9 +47,9 @@ except ImportError:
         "Failed to import backend modules. Please ensure all dependencies are installed.",
     )
     raise ImportError("Backend modules could not be imported.")
+from ..dtype_optimizer import OPTIMIZE_DTYPE
 import traceback
 
-
 FORM_CLASS, _ = uic.loadUiType(
     os.path.join(os.path.dirname(__file__), "lazy_raster_calculator_dockwidget_base.ui")
 )
@@ -110,6 +110,10 @@ class LazyRasterCalculatorDockWidget(QtWidgets.QDockWidget, FORM_CLASS):
         # dtypes combobox
         self.populate_dtypes_combobox()
 
+        # resolution policy and resampling comboboxes
+        self.populate_resolution_comboboxes()
+        self.resolutionComboBox.currentIndexChanged.connect(self.on_resolution_changed)
+
         # okay and cancel buttons
         self.okButton.clicked.connect(self.on_ok_clicked)
         self.cancelButton.clicked.connect(self.on_cancel_clicked)
@@ -122,7 +126,12 @@ class LazyRasterCalculatorDockWidget(QtWidgets.QDockWidget, FORM_CLASS):
         self.raster_manager = RasterManager(self.layer_manager)
         self.expression_evaluator = ExpressionEvaluator(self.raster_manager)
         self.lazy_registry = get_lazy_layer_registry()
-        self.raster_saver = RasterSaver()
+        self.raster_saver = RasterSaver(self)
+
+        # results are saved in the background and added to the project when written
+        self.pending_saves = {}  # output path -> id of the placeholder it replaces, or None
+        self.raster_saver.layerAdded.connect(self.on_raster_saved)
+        self.raster_saver.saveFailed.connect(self.on_raster_save_failed)
 
     def closeEvent(self, event):
         self.clear_expression()
@@ -189,11 +198,14 @@ class LazyRasterCalculatorDockWidget(QtWidgets.QDockWidget, FORM_CLASS):
             lazy_layer = self.lazy_registry.get(layer_name)
             raster = lazy_layer.copy()
 
-            # Save computed result to temporary location and get new layer
-            _, _ = self.raster_saver.temp_output(raster, layer_name)
-
-            # Remove the old placeholder (not the new one)
-            QgsProject.instance().removeMapLayer(layer.id())
+            # Save computed result to temporary location in the background, the
+            # placeholder is replaced once the new layer is added
+            output_path = self.raster_saver.temp_output_async(
+                raster,
+                layer_name,
+                optimize_dtype=bool(layer.customProperty("lazy_optimize_dtype", False)),
+            )
+            self.pending_saves[output_path] = layer.id()
 
             del raster  # Free memory
             del lazy_layer
@@ -207,7 +219,7 @@ class LazyRasterCalculatorDockWidget(QtWidgets.QDockWidget, FORM_CLASS):
             )
 
     def export_lazy_layer(self, layer):
-        """Exports the lazy layer to a GeoTIFF file and path specified by the user.
+        """Exports the lazy layer to a GeoTIFF file or Zarr store at a path specified by the user.
         Args:
             layer (QgsRasterLayer): The lazy raster layer to export."""
         layer_name = layer.customProperty("lazy_name", None)
@@ -237,15 +249,15 @@ class LazyRasterCalculatorDockWidget(QtWidgets.QDockWidget, FORM_CLASS):
             self,
             "Export Lazy Layer",
             suggested_filename,
-            "GeoTIFF (*.tif *.tiff)",
+            "GeoTIFF (*.tif *.tiff);;Zarr (*.zarr)",
         )
         if not file_path:  # User cancelled the dialog
             return
-        if not os.path.isfile(file_path):  # Check if the file path is valid
+        if not os.path.isdir(os.path.dirname(file_path)):  # Check if the file path is valid
             QMessageBox.warning(
                 self,
                 "Invalid File Path",
-                "The specified file path does not exist or is not a valid file.",
+                "The folder of the specified file path does not exist.",
             )
             return
 
@@ -253,6 +265,8 @@ class LazyRasterCalculatorDockWidget(QtWidgets.QDockWidget, FORM_CLASS):
         ext = os.path.splitext(file_path)[-1].lower()
         if ext in [".tif", ".tiff"]:
             driver = "GTiff"
+        elif ext == ".zarr":
+            driver = "Zarr"
         else:
             QMessageBox.warning(
                 self,
@@ -262,7 +276,12 @@ class LazyRasterCalculatorDockWidget(QtWidgets.QDockWidget, FORM_CLASS):
             return
 
         try:
-            raster.save(file_path, driver=driver, tiled=True)
+            self.raster_saver.write(
+                raster,
+                file_path,
+                driver,
+                optimize_dtype=bool(layer.customProperty("lazy_optimize_dtype", False)),
+            )
 
             QMessageBox.information(
                 self,
@@ -285,6 +304,38 @@ class LazyRasterCalculatorDockWidget(QtWidgets.QDockWidget, FORM_CLASS):
                 f"An error occurred while exporting the lazy layer:\n{str(e)}\n\nTraceback:\n{tb}",
             )
 
+    def on_raster_saved(self, output_path, layer):
+        """Handle a background save that finished and added its layer to the project.
+        Args:
+            output_path (str): The file path of the saved raster.
+            layer (QgsRasterLayer): The added layer.
+        """
+        if output_path not in self.pending_saves:
+            return
+        placeholder_id = self.pending_saves.pop(output_path)
+        if placeholder_id is not None:
+            # Remove the old placeholder (not the new one)
+            QgsProject.instance().removeMapLayer(placeholder_id)
+        QMessageBox.information(
+            self,
+            "Success",
+            f"Raster '{layer.name()}' added to project",
+        )
+
+    def on_raster_save_failed(self, output_path, message):
+        """Handle a background save that failed.
+        Args:
+            output_path (str): The file path of the raster.
+            message (str): The error message.
+        """
+        if self.pending_saves.pop(output_path, False) is False:
+            return
+        QMessageBox.critical(
+            self,
+            "Save Error",
+            f"An error occurred while saving {output_path}:\n{message}",
+        )
+
     def on_layer_removed(self, layer_id):
         """
         Handle the removal of a layer from the project.
@@ -383,6 +434,7 @@ class LazyRasterCalculatorDockWidget(QtWidgets.QDockWidget, FORM_CLASS):
             text = self.expressionBox.toPlainText().strip()
             valid = ExpressionEvaluator.is_valid_expression(text)
             self.update_expression_status(valid)
+        self.populate_reference_combobox()
 
     def open_crs_dialog(self):
         """Open the CRS selection dialog and set the selected CRS."""
@@ -430,6 +482,7 @@ class LazyRasterCalculatorDockWidget(QtWidgets.QDockWidget, FORM_CLASS):
     def populate_dtypes_combobox(self):
         dtypes = [
             "<AUTO>",
+            OPTIMIZE_DTYPE,  # narrowest lossless dtype, found when the result is saved
             "Byte",
             "Int8",
             "UInt16",
@@ -447,8 +500,51 @@ class LazyRasterCalculatorDockWidget(QtWidgets.QDockWidget, FORM_CLASS):
         ]
         for dtype in dtypes:
             self.dtypeComboBox.addItem(dtype)
+        self.dtypeComboBox.setItemData(
+            dtypes.index(OPTIMIZE_DTYPE),
+            "Writes the narrowest data type that holds the result without loss. "
+            "Its value range is found while it is written, then the file is copied to "
+            "the narrow type.",
+            Qt.ToolTipRole,
+        )
         self.dtypeComboBox.setCurrentIndex(0)  # Set default to <AUTO>
 
+    def populate_resolution_comboboxes(self):
+        """Populate the resolution policy and resampling method combo boxes."""
+        labels = {
+            "auto": "Auto (smallest extent)",
+            "finest": "Finest",
+            "coarsest": "Coarsest",
+            "reference": "Reference Layer",
+            "explicit": "Cell Size",
+        }
+        self.resolutionComboBox.clear()
+        for policy in RESOLUTION_POLICIES:
+            self.resolutionComboBox.addItem(labels[policy], policy)
+        self.resolutionComboBox.setCurrentIndex(0)
+
+        self.resamplingComboBox.clear()
+        for method in RESAMPLING_METHODS:
+            self.resamplingComboBox.addItem(method)
+        self.resamplingComboBox.setCurrentIndex(0)  # nearest
+
+    def populate_reference_combobox(self):
+        """Fill the reference layer combo box with the layers used in the expression."""
+        current = self.referenceComboBox.currentText()
+        names = ExpressionEvaluator.extract_layer_names(
+            self.expressionBox.toPlainText()
+        )
+        self.referenceComboBox.clear()
+        self.referenceComboBox.addItems(list(dict.fromkeys(names)))
+        index = self.referenceComboBox.findText(current)
+        self.referenceComboBox.setCurrentIndex(max(index, 0))
+
+    def on_resolution_changed(self):
+        """Enable the inputs used by the selected resolution policy."""
+        policy = self.resolutionComboBox.currentData()
+        self.referenceComboBox.setEnabled(policy == "reference")
+        self.cellSizeSpinBox.setEnabled(policy == "explicit")
+
     def on_ok_clicked(self):
         """Handle the OK button click event.
         This method evaluates the expression entered by the user, checks if it is valid,
@@ -461,6 +557,10 @@ class LazyRasterCalculatorDockWidget(QtWidgets.QDockWidget, FORM_CLASS):
         crs_index = self.crsComboBox.currentIndex()
         target_crs_authid = self.crsComboBox.itemData(crs_index)
         d_type = self.dtypeComboBox.currentText()
+        resolution = self.resolutionComboBox.currentData()
+        reference = self.referenceComboBox.currentText() or None
+        cell_size = self.cellSizeSpinBox.value()
+        resampling = self.resamplingComboBox.currentText()
 
         # Validate inputs
         if not expression:
@@ -500,6 +600,10 @@ class LazyRasterCalculatorDockWidget(QtWidgets.QDockWidget, FORM_CLASS):
                 expression,
                 target_crs_authid,
                 d_type=d_type,
+                resolution=resolution,
+                reference=reference,
+                cell_size=cell_size,
+                resampling=resampling,
             )
 
             if is_lazy:
@@ -512,6 +616,9 @@ class LazyRasterCalculatorDockWidget(QtWidgets.QDockWidget, FORM_CLASS):
                 fake_layer.setCustomProperty("lazy_expression", expression)
                 fake_layer.setCustomProperty("lazy_crs", target_crs_authid)
                 fake_layer.setCustomProperty("lazy_dtype", str(result.dtype))
+                fake_layer.setCustomProperty(
+                    "lazy_optimize_dtype", d_type == OPTIMIZE_DTYPE
+                )
                 fake_layer.setCustomProperty("band_count", str(result.nbands))
                 QgsProject.instance().addMapLayer(fake_layer)
 
@@ -522,18 +629,13 @@ class LazyRasterCalculatorDockWidget(QtWidgets.QDockWidget, FORM_CLASS):
                 )
                 self.clear_expression()
                 return
-            try:
-                # Save the raster to a temporary file and add it to the project
-                _, _ = self.raster_saver.temp_output(result, result_name)
-                QMessageBox.information(
-                    self,
-                    "Success",
-                    f"Raster added to project",
-                )
-                self.clear_expression()
-            except RasterSaveError as e:
-                print(f"Error saving file: {str(e)}")
-                return
+            # Save the raster to a temporary file in the background, it is added to
+            # the project by on_raster_saved
+            output_path = self.raster_saver.temp_output_async(
+                result, result_name, optimize_dtype=d_type == OPTIMIZE_DTYPE
+            )
+            self.pending_saves[output_path] = None
+            self.clear_expression()
 
         except BandMismatchError as e:
             QMessageBox.critical(self, "Band Mismatch", str(e))
@@ -559,6 +661,8 @@ class LazyRasterCalculatorDockWidget(QtWidgets.QDockWidget, FORM_CLASS):
         self.crsComboBox.setCurrentIndex(0)
         self.lazyCheckBox.setChecked(True)
         self.dtypeComboBox.setCurrentIndex(0)
+        self.resolutionComboBox.setCurrentIndex(0)
+        self.resamplingComboBox.setCurrentIndex(0)
         self.populate_raster_layer_list()
         self.populate_crs_combobox()
         self.update_expression_status(False)
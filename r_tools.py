@@ -29,11 +29,10 @@ from qgis.PyQt.QtWidgets import QAction, QMenu, QToolButton
 # Initialize Qt resources from file resources.py
 from .resources import *
 
-# Import the code for the DockWidgets
-from .delivered_cost.delivered_cost_dockwidget import DeliveredCostDockWidget
-from .lazy_calculator.lazy_raster_calculator_dockwidget import (
-    LazyRasterCalculatorDockWidget,
-)
+# The DockWidgets are imported when first opened, so QGIS startup does not pay
+# for raster_tools, dask, xarray and the other heavy dependencies they pull in.
+from .compute_settings import get_compute_settings
+from .temp_store import get_temp_store
 import os.path
 
 
@@ -123,8 +122,15 @@ class r_tools:
         )
         self.raster_tools_menu.addAction(self.lazy_raster_action)
 
+        self.compute_settings_action = QAction(
+            self.tr("Compute Settings..."), self.iface.mainWindow()
+        )
+        self.compute_settings_action.triggered.connect(self.open_compute_settings)
+        self.raster_tools_menu.addAction(self.compute_settings_action)
+
         self.actions.append(self.delivered_cost_action)
         self.actions.append(self.lazy_raster_action)
+        self.actions.append(self.compute_settings_action)
 
         # ----- Create a single toolbar button with a dropdown menu -----
         self.toolbar = self.iface.addToolBar("Raster Tools Suite")
@@ -138,6 +144,8 @@ class r_tools:
         menu = QMenu()
         menu.addAction(self.delivered_cost_action)
         menu.addAction(self.lazy_raster_action)
+        menu.addSeparator()
+        menu.addAction(self.compute_settings_action)
         self.tool_button.setMenu(menu)
 
         # Add button to toolbar
@@ -145,6 +153,10 @@ class r_tools:
 
     def open_delivered_cost_dockwidget(self):
         if self.delivered_cost_dockwidget is None:
+            from .delivered_cost.delivered_cost_dockwidget import (
+                DeliveredCostDockWidget,
+            )
+
             self.delivered_cost_dockwidget = DeliveredCostDockWidget()
             # Optional: connect a closing signal here if needed
 
@@ -154,6 +166,10 @@ class r_tools:
 
     def open_raster_calculator_dockwidget(self):
         if self.raster_calculator_dockwidget is None:
+            from .lazy_calculator.lazy_raster_calculator_dockwidget import (
+                LazyRasterCalculatorDockWidget,
+            )
+
             self.raster_calculator_dockwidget = LazyRasterCalculatorDockWidget()
 
         self.iface.addDockWidget(
@@ -162,6 +178,11 @@ class r_tools:
         self.raster_calculator_dockwidget.show()
         self.raster_calculator_dockwidget.raise_()
 
+    def open_compute_settings(self):
+        from .compute_settings_dialog import ComputeSettingsDialog
+
+        ComputeSettingsDialog(self.iface.mainWindow()).exec_()
+
     def unload(self):
         for action in self.actions:
             self.raster_tools_menu.removeAction(action)
@@ -183,3 +204,8 @@ class r_tools:
         if self.raster_calculator_dockwidget:
             self.raster_calculator_dockwidget.close()
             self.raster_calculator_dockwidget = None
+
+        # stop the dask.distributed cluster, if one was started
+        get_compute_settings().shutdown()
+        # delete the temporary outputs of the session
+        get_temp_store().purge()
@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ RasterTools
+                                 A QGIS plugin
+ This plugin provides a raster calculator and delivered cost calculator.
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2025-07-31
+        git sha              : $Format:%H$
+        copyright            : (C) 2025 by Tim Van Driel
+        email                : timothy.vandriel@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+
+SETTINGS_PREFIX = "rasterTools/tempStore"
+
+
+def project_sources() -> list:
+    """
+    Returns the sources of the layers in the current QGIS project, or an empty list
+    outside QGIS.
+    """
+    try:
+        from qgis.core import QgsProject
+    except ImportError:
+        return []
+    return [layer.source() for layer in QgsProject.instance().mapLayers().values()]
+
+
+def default_root() -> str:
+    """
+    Returns the folder for this session's temporary outputs, inside the QGIS processing
+    temp folder, or the system temp folder outside QGIS.
+    """
+    try:
+        from qgis.core import QgsProcessingUtils
+
+        base = QgsProcessingUtils.tempFolder()
+    except ImportError:
+        base = tempfile.gettempdir()
+    return os.path.join(base, f"raster_tools_{os.getpid()}")
+
+
+def _norm(path: str) -> str:
+    return os.path.normcase(os.path.abspath(path)).replace("\\", "/")
+
+
+def _size(path: str) -> int:
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    for folder, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(folder, name))
+            except OSError:
+                pass
+    return total
+
+
+class TempStore:
+    """
+    Hands out unique paths for temporary outputs and keeps them under a disk quota.
+
+    Every output file or run folder is an entry. Entries are busy while they are being
+    written, referenced while a project layer reads from them, and otherwise evicted
+    least recently used first once the entries exceed the quota.
+    """
+
+    def __init__(self, root: str = None, quota_mb: int = 20480, sources=project_sources):
+        """
+        Args:
+            root (str, optional): Folder for the entries, defaults to default_root().
+            quota_mb (int): Disk quota in MB, 0 for no quota.
+            sources: callable returning the sources of the live layers.
+        """
+        self.root = root or default_root()
+        self.quota_mb = quota_mb
+        self.sources = sources
+        self._entries = {}  # path -> last used timestamp
+        self._busy = set()
+        self._lock = threading.Lock()
+
+    def load(self):
+        """
+        Loads the quota from the QGIS user settings.
+        """
+        from qgis.PyQt.QtCore import QSettings
+
+        self.quota_mb = int(QSettings().value(f"{SETTINGS_PREFIX}/quota_mb", self.quota_mb))
+        return self
+
+    def save(self):
+        """
+        Saves the quota to the QGIS user settings and applies it.
+        """
+        from qgis.PyQt.QtCore import QSettings
+
+        QSettings().setValue(f"{SETTINGS_PREFIX}/quota_mb", self.quota_mb)
+        self.enforce_quota()
+
+    def _add(self, path: str) -> str:
+        self.enforce_quota()
+        with self._lock:
+            self._entries[path] = time.time()
+            self._busy.add(path)
+        return path
+
+    def new_path(self, name: str, ext: str = ".tif") -> str:
+        """
+        Returns a unique path for a temporary output file, marked busy until release.
+        The file goes in its own folder so it keeps its readable name, which QGIS uses
+        as the layer name.
+
+        Args:
+            name (str): Readable part of the file name, e.g. the layer name.
+            ext (str): File extension.
+
+        Returns:
+            str: The output path.
+        """
+        safe = re.sub(r"[^\w.-]+", "_", name).strip("_") or "output"
+        folder = os.path.join(self.root, uuid.uuid4().hex[:12])
+        os.makedirs(folder)
+        return self._add(os.path.join(folder, f"{safe}{ext}"))
+
+    def run_dir(self, prefix: str = "run") -> str:
+        """
+        Creates a unique folder for the outputs of one run, marked busy until release.
+
+        Args:
+            prefix (str): Readable part of the folder name.
+
+        Returns:
+            str: The created folder.
+        """
+        path = os.path.join(
+            self.root, f"{prefix}_{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+        )
+        os.makedirs(path)
+        return self._add(path)
+
+    def release(self, path: str):
+        """
+        Marks an entry as written, so it can be evicted once no layer references it,
+        and applies the quota.
+        """
+        with self._lock:
+            self._busy.discard(path)
+            if path in self._entries:
+                self._entries[path] = time.time()
+        self.enforce_quota()
+
+    def referenced(self) -> set:
+        """
+        Returns the entries that back a layer in the project.
+        """
+        sources = [_norm(source) for source in self.sources()]
+        with self._lock:
+            entries = list(self._entries)
+        return {
+            path for path in entries if any(_norm(path) in source for source in sources)
+        }
+
+    def enforce_quota(self) -> list:
+        """
+        Deletes unreferenced, finished entries, least recently used first, until the
+        entries fit in the quota.
+
+        Returns:
+            list[str]: The evicted entries.
+        """
+        referenced = self.referenced()
+        now = time.time()
+        with self._lock:
+            for path in referenced:
+                self._entries[path] = now  # in use by a layer right now
+            entries = dict(self._entries)
+            busy = set(self._busy)
+        if not self.quota_mb:
+            return []
+
+        sizes = {path: _size(path) for path in entries if os.path.exists(path)}
+        total = sum(sizes.values())
+        evicted = []
+        candidates = sorted(
+            (path for path in sizes if path not in referenced and path not in busy),
+            key=entries.get,
+        )
+        for path in candidates:
+            if total <= self.quota_mb * 1024**2:
+                break
+            if self._delete(path):
+                total -= sizes[path]
+                evicted.append(path)
+        return evicted
+
+    def _delete(self, path: str) -> bool:
+        try:
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            elif os.path.exists(path):
+                os.remove(path)
+            for sidecar in (f"{path}.aux.xml", f"{path}.ovr"):
+                if os.path.exists(sidecar):
+                    os.remove(sidecar)
+            parent = os.path.dirname(path)
+            if _norm(parent) != _norm(self.root) and not os.listdir(parent):
+                os.rmdir(parent)  # the folder new_path made for the file
+        except OSError:
+            return False  # still open elsewhere, e.g. on Windows
+        with self._lock:
+            self._entries.pop(path, None)
+        return True
+
+    def purge(self):
+        """
+        Deletes every temporary output of the session, e.g. when the plugin is unloaded.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._busy.clear()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+# singleton instance for the temporary outputs
+temp_store = None
+
+
+def get_temp_store() -> TempStore:
+    """
+    Returns the singleton TempStore, with the quota from the QGIS user settings when
+    running inside QGIS.
+
+    Returns:
+        TempStore: The shared temp store.
+    """
+    global temp_store
+    if temp_store is None:
+        temp_store = TempStore()
+        try:
+            temp_store.load()
+        except ImportError:
+            pass  # headless, keep the default quota
+    return temp_store
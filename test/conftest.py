@@ -0,0 +1,137 @@
+"""
+Fixtures for the unit tests, run from the plugin folder with
+    python -m pytest test
+
+The modules are imported headless like delivered_cost/cli.py does, with the plugin
+folder on sys.path. The OSM and 3DEP downloads are never reached: the tests pass local
+roads, barriers and a DEM, and osmnx and py3dep are replaced by modules that refuse
+network access when they are not installed. The lazy calculator backend imports QGIS,
+its tests get it through the backend fixture, which installs benchmarks/qgis_stub.py.
+"""
+
+import importlib
+import os
+import sys
+import types
+
+import geopandas as gpd
+import numpy as np
+import pytest
+import rasterio
+from rasterio.transform import from_origin
+from shapely.geometry import LineString, box
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PLUGIN_DIR)
+# the QGIS stub and the benchmark input generators
+sys.path.append(os.path.join(PLUGIN_DIR, "benchmarks"))
+
+# a 2.4 km square EPSG:5070 grid with 30 m cells
+ORIGIN = (-1_200_000.0, 2_500_000.0)
+CELL = 30.0
+SIZE = 80
+
+
+def _offline(name, *functions):
+    def refuse(*args, **kwargs):
+        raise RuntimeError(f"{name} would access the network in a unit test.")
+
+    module = types.ModuleType(name)
+    for function in functions:
+        setattr(module, function, refuse)
+    return module
+
+
+for _name, _functions in {
+    "osmnx": ("features_from_polygon",),
+    "py3dep": ("get_dem",),
+}.items():
+    try:
+        __import__(_name)
+    except ImportError:
+        sys.modules[_name] = _offline(_name, *_functions)
+
+
+def grid_xy(col, row):
+    """
+    Returns the EPSG:5070 coordinates of a cell centre of the synthetic grid.
+    """
+    return ORIGIN[0] + (col + 0.5) * CELL, ORIGIN[1] - (row + 0.5) * CELL
+
+
+def to_lonlat(points):
+    """
+    Projects EPSG:5070 coordinates to (lon, lat) tuples.
+    """
+    xs, ys = zip(*points)
+    lonlat = gpd.points_from_xy(xs, ys, crs=5070).to_crs(4326)
+    return [(p.x, p.y) for p in lonlat]
+
+
+@pytest.fixture
+def synthetic_inputs(tmp_path):
+    """
+    Writes a synthetic DEM, road network and barrier layer and returns the run()
+    arguments of a small study area with two facilities on the roads.
+    """
+    dem_path = str(tmp_path / "dem.tif")
+    rows, cols = np.mgrid[0:SIZE, 0:SIZE]
+    dem = (1000 + 2.0 * rows + 4.0 * np.sin(cols / 5)).astype("float32")
+    with rasterio.open(
+        dem_path,
+        "w",
+        driver="GTiff",
+        width=SIZE,
+        height=SIZE,
+        count=1,
+        dtype="float32",
+        crs="EPSG:5070",
+        transform=from_origin(*ORIGIN, CELL, CELL),
+        nodata=-9999,
+    ) as dst:
+        dst.write(dem, 1)
+
+    roads = gpd.GeoDataFrame(
+        {
+            "highway": ["primary", "residential"],
+            "maxspeed": ["80 km/h", None],
+        },
+        geometry=[
+            LineString([grid_xy(0, 20), grid_xy(SIZE - 1, 20)]),
+            LineString([grid_xy(40, 20), grid_xy(40, SIZE - 1)]),
+        ],
+        crs=5070,
+    )
+    roads_path = str(tmp_path / "roads.gpkg")
+    roads.to_file(roads_path)
+
+    x0, y1 = grid_xy(55, 45)
+    x1, y0 = grid_xy(60, 50)
+    barriers = gpd.GeoDataFrame(geometry=[box(x0, y0, x1, y1)], crs=5070)
+    barriers_path = str(tmp_path / "barriers.gpkg")
+    barriers.to_file(barriers_path)
+
+    # the study area and facilities are given in EPSG:4326 like the dock collects them
+    aoi = to_lonlat([grid_xy(10, 10), grid_xy(70, 10), grid_xy(70, 70), grid_xy(10, 70)])
+    facilities = to_lonlat([grid_xy(5, 21), grid_xy(41, 75)])
+    return {
+        "study_area_coords": aoi,
+        "saw_coords": facilities,
+        "lyr_roads_path": roads_path,
+        "lyr_barriers_path": barriers_path,
+        "dem_path": dem_path,
+    }
+
+
+@pytest.fixture(scope="session")
+def backend():
+    """
+    The lazy_calculator.backend package, imported as part of the plugin package so its
+    relative imports resolve, with QGIS stubbed like the benchmarks do.
+    """
+    import qgis_stub
+
+    qgis_stub.install()
+    sys.path.insert(0, os.path.dirname(PLUGIN_DIR))
+    package = os.path.basename(PLUGIN_DIR)
+    return importlib.import_module(f"{package}.lazy_calculator.backend")
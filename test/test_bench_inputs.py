@@ -0,0 +1,40 @@
+"""
+Tests of the synthetic inputs of benchmarks/bench_delivered_cost.py.
+"""
+
+import os
+
+import geopandas as gpd
+import numpy as np
+import rasterio
+
+from bench_delivered_cost import RES, make_case
+
+
+def test_make_case_writes_run_inputs(tmp_path):
+    case_dir = str(tmp_path / "case")
+    inputs = make_case("tiny", 1, 2, case_dir, seed=3)
+
+    assert len(inputs["saw_coords"]) == 2
+    assert len(inputs["study_area_coords"]) == 5  # closed ring
+    with rasterio.open(inputs["dem_path"]) as src:
+        assert [src.height, src.width] == inputs["grid"]
+        assert src.res == (RES, RES)
+        assert np.isfinite(src.read(1)).all()
+    roads = gpd.read_file(inputs["lyr_roads_path"])
+    assert {"highway", "maxspeed"} <= set(roads.columns) and len(roads)
+    assert len(gpd.read_file(inputs["lyr_barriers_path"]))
+
+    # a case is generated once and read back afterwards
+    mtime = os.path.getmtime(inputs["dem_path"])
+    again = make_case("tiny", 1, 2, case_dir, seed=3)
+    assert again["dem_path"] == inputs["dem_path"] and again["grid"] == inputs["grid"]
+    assert os.path.getmtime(inputs["dem_path"]) == mtime
+
+
+def test_make_case_is_deterministic(tmp_path):
+    a = make_case("tiny", 1, 2, str(tmp_path / "a"), seed=3)
+    b = make_case("tiny", 1, 2, str(tmp_path / "b"), seed=3)
+    assert a["saw_coords"] == b["saw_coords"]
+    with rasterio.open(a["dem_path"]) as dem_a, rasterio.open(b["dem_path"]) as dem_b:
+        np.testing.assert_array_equal(dem_a.read(1), dem_b.read(1))
@@ -0,0 +1,69 @@
+"""
+Tests of the chunk shapes chosen in chunk_planner.py.
+"""
+
+import numpy as np
+import pytest
+import rasterio
+from raster_tools import Raster
+from rasterio.transform import from_origin
+
+from chunk_planner import MIN_CELLS, chunk_raster, native_block_shape, plan_chunks
+
+
+def test_chunks_fit_the_memory_target():
+    _, cy, cx = plan_chunks((1, 20_000, 20_000), "float64", (256, 256), 1, target_mb=32)
+    assert cy * cx * 8 <= 32 * 1024**2
+    assert cy % 256 == 0 and cx % 256 == 0
+
+
+def test_every_worker_gets_two_chunks():
+    shape = (1, 8192, 8192)
+    _, cy, cx = plan_chunks(shape, "float32", (256, 256), workers=8, target_mb=1024)
+    chunks = -(-shape[1] // cy) * -(-shape[2] // cx)
+    assert chunks >= 16
+
+
+def test_chunks_follow_strips():
+    _, cy, cx = plan_chunks((1, 10_000, 4000), "uint8", (1, 4000), 1, target_mb=1)
+    assert cx == 4000
+    assert cy * cx <= 1024**2
+
+
+@pytest.mark.parametrize(
+    "block, expected", [((512, 512), (1, 512, 512)), (None, (1, 256, 256))]
+)
+def test_chunks_are_never_smaller_than_a_block(block, expected):
+    assert (
+        plan_chunks((1, 4096, 4096), "float64", block, 64, target_mb=0.01) == expected
+    )
+    assert expected[1] * expected[2] >= MIN_CELLS
+
+
+def test_small_rasters_are_one_chunk():
+    assert plan_chunks((100, 50), "float32", workers=4) == (1, 100, 50)
+
+
+def test_chunk_raster_uses_the_native_blocks(tmp_path):
+    path = str(tmp_path / "tiled.tif")
+    with rasterio.open(
+        path,
+        "w",
+        driver="GTiff",
+        width=2048,
+        height=2048,
+        count=1,
+        dtype="uint8",
+        crs="EPSG:5070",
+        transform=from_origin(0, 0, 30, 30),
+        tiled=True,
+        blockxsize=512,
+        blockysize=512,
+    ) as dst:
+        dst.write(np.zeros((2048, 2048), dtype="uint8"), 1)
+
+    block = native_block_shape(path)
+    assert block == (512, 512)
+    raster = chunk_raster(Raster(path), block, workers=4, target_mb=64)
+    assert raster.data.chunksize == (1, 512, 512)
+    assert native_block_shape(str(tmp_path / "missing.tif")) is None
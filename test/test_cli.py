@@ -0,0 +1,26 @@
+"""
+Tests of the parameter file checks of the headless runner in delivered_cost/cli.py.
+"""
+
+import pytest
+
+from delivered_cost.cli import read_params
+
+
+def write_params(tmp_path, text):
+    path = tmp_path / "params.yaml"
+    path.write_text(text)
+    return str(path)
+
+
+def test_read_params(tmp_path):
+    path = write_params(tmp_path, "cb_o: true\ntile_mb: 256\n")
+    assert read_params(path) == {"cb_o": True, "tile_mb": 256}
+
+
+@pytest.mark.parametrize(
+    "text", ["out_dir: ./other\n", "profile_name: report\n", "scheduler: threads\n"]
+)
+def test_read_params_rejects_arguments_set_by_the_cli(tmp_path, text):
+    with pytest.raises(ValueError, match="Unknown parameters"):
+        read_params(write_params(tmp_path, text))
@@ -0,0 +1,25 @@
+"""
+Tests of the dask scheduler choice in compute_settings.py.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import dask
+
+from compute_settings import ComputeSettings
+
+
+def test_threads_scheduler_is_a_shared_pool():
+    settings = ComputeSettings()
+    settings.workers = 3
+    pool = settings.dask_scheduler()
+    try:
+        assert isinstance(pool, ThreadPoolExecutor)
+        assert pool._max_workers == 3
+        assert settings.dask_scheduler() is pool
+        assert dask.compute(dask.delayed(sum)([1, 2]), scheduler=pool) == (3,)
+    finally:
+        settings.shutdown()
+    assert settings.dask_scheduler() is not pool
+    settings.shutdown()
+
@@ -0,0 +1,265 @@
+"""
+Tests of the delivered cost pipeline in delivered_cost/delvCost.py.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import dask
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+import rasterio
+
+from dask.callbacks import Callback, normalize_callback
+from dask.diagnostics import ProgressBar
+from raster_tools import Raster
+from shapely.geometry import LineString, Point
+
+from delivered_cost import delvCost
+from delivered_cost.cancellation import (
+    CancelCallback,
+    CancellationToken,
+    RunCancelledError,
+)
+
+DEFAULT_OUTPUTS = {"Delivered Cost", "Additional Treatment Cost"}
+OPTIONAL_OUTPUTS = {
+    "Skidder Cost",
+    "Cable Cost",
+    "Hand Treatment Cost",
+    "Prescribed Fire Cost",
+    "Potential Harvesting System",
+}
+
+
+KMH = 0.621371
+
+
+@pytest.mark.parametrize(
+    "value, mph",
+    [
+        ("50", 50 * KMH),
+        ("30 mph", 30),
+        ("100 km/h", 100 * KMH),
+        ("80kmh", 80 * KMH),
+        ("10 knots", 11.50779),
+        ("none", np.nan),
+        ("signals", np.nan),
+        ("RU:urban", np.nan),
+        (None, np.nan),
+        ("50;30", 50 * KMH),
+        (["30 mph", "50"], 30),
+        (["50", "30 mph"], 50 * KMH),
+    ],
+)
+def test_parse_maxspeed(value, mph):
+    parsed = delvCost.parse_maxspeed(pd.Series([value], dtype=object))
+    np.testing.assert_allclose(parsed, [mph])
+
+
+def test_parse_maxspeed_mph_opt_in():
+    parsed = delvCost.parse_maxspeed(pd.Series(["45", "80 km/h"]), default_unit="mph")
+    np.testing.assert_allclose(parsed, [45, 80 * KMH])
+
+
+def test_road_speeds_fall_back_to_highway_class():
+    rds = pd.DataFrame(
+        {
+            "highway": ["primary", "residential", "track", "primary"],
+            "maxspeed": ["80", "none", None, "0"],
+        }
+    )
+    speeds = delvCost.road_speeds(rds, speed_table={"residential": 20})
+    np.testing.assert_allclose(speeds, [80 * KMH, 20, 25, 55])
+
+
+@pytest.fixture
+def roads():
+    # a road along y = 0 and one along y = 10
+    return gpd.GeoDataFrame(
+        geometry=[LineString([(0, 0), (100, 0)]), LineString([(0, 10), (100, 10)])],
+        crs=5070,
+    )
+
+
+def test_snap_to_nearest_road(roads):
+    points = gpd.GeoDataFrame(geometry=[Point(20, 2), Point(50, 9)], crs=5070)
+    snapped = delvCost.snap_to_roads(points, roads)
+
+    assert snapped.crs == points.crs
+    assert snapped["facility"].tolist() == [0, 1]
+    np.testing.assert_allclose(snapped["snap_dist"], [2, 1])
+    assert [(p.x, p.y) for p in snapped.geometry] == [(20, 0), (50, 10)]
+
+
+def test_snap_to_roads_drops_points_beyond_max_distance(roads):
+    points = gpd.GeoDataFrame(geometry=[Point(20, 2), Point(50, 40)], crs=5070)
+    snapped = delvCost.snap_to_roads(points, roads, max_distance=5)
+    assert snapped["facility"].tolist() == [0]
+
+
+def test_snap_to_k_roads(roads):
+    points = gpd.GeoDataFrame(geometry=[Point(20, 2), Point(50, 30)], crs=5070)
+    snapped = delvCost.snap_to_roads(points, roads, k=2, max_distance=25)
+
+    # the first point reaches both roads, closest first, the second only y = 10
+    assert snapped["facility"].tolist() == [0, 0, 1]
+    np.testing.assert_allclose(snapped["snap_dist"], [2, 8, 20])
+    assert [p.y for p in snapped.geometry] == [0, 10, 10]
+    assert len(delvCost.snap_to_roads(points, roads, k=1, max_distance=25)) == 2
+
+
+def test_snap_to_k_roads_needs_max_distance(roads):
+    points = gpd.GeoDataFrame(geometry=[Point(20, 2)], crs=5070)
+    with pytest.raises(ValueError, match="max_distance"):
+        delvCost.snap_to_roads(points, roads, k=2)
+
+
+def read(path):
+    with rasterio.open(path) as src:
+        return src.read(1, masked=True)
+
+
+def run(inputs, out_dir, **kwargs):
+    return delvCost.run(out_dir=str(out_dir), log=lambda msg: None, **inputs, **kwargs)
+
+
+def test_concurrent_callbacks_drop_progress_bar():
+    token = CancellationToken()
+    callbacks = [
+        normalize_callback(cb) for cb in (ProgressBar(), CancelCallback(token))
+    ]
+    kept = delvCost.concurrent_callbacks(callbacks)
+    assert kept == callbacks[1:]
+    assert delvCost.concurrent_callbacks(None) == []
+
+
+@pytest.mark.parametrize("optimize_dtype", [False, True])
+def test_save_rasters_burns_bool_mask(tmp_path, optimize_dtype):
+    values = np.array([[1, 0], [9, 1]], dtype="int16")
+    raster = Raster(values).set_null_value(9).set_crs("EPSG:5070") > 0
+    path = str(tmp_path / "mask.tif")
+    delvCost.save_rasters({"mask": (raster, path)}, optimize_dtype=optimize_dtype)
+
+    with rasterio.open(path) as src:
+        assert src.dtypes[0] == "uint8"
+        assert src.nodata == 255
+        np.testing.assert_array_equal(src.read(1), [[1, 0], [255, 1]])
+
+
+def test_run_writes_rasters(synthetic_inputs, tmp_path):
+    out_dir = tmp_path / "out"
+    outputs = run(synthetic_inputs, out_dir, cb_o=True)
+
+    assert set(outputs) == DEFAULT_OUTPUTS | OPTIONAL_OUTPUTS
+    for path in outputs.values():
+        assert os.path.dirname(path) == str(out_dir)
+        assert path.endswith(".tif")
+        assert os.path.isfile(path)
+    cost = read(outputs["Delivered Cost"])
+    assert cost.shape == (80, 80)
+    assert cost.count() > 0
+    assert (cost.compressed() >= 0).all()
+    # outputs are narrowed in the pass that writes them
+    with rasterio.open(outputs["Delivered Cost"]) as src:
+        assert src.dtypes[0] == "float32"
+    with rasterio.open(outputs["Potential Harvesting System"]) as src:
+        assert src.dtypes[0] == "uint8"
+        assert src.nodata == 255
+    system = read(outputs["Potential Harvesting System"])
+    assert set(np.unique(system.compressed())) <= {0, 1, 2}
+    assert (system == 1).any()
+
+
+def test_run_writes_zarr(synthetic_inputs, tmp_path):
+    pytest.importorskip("zarr")
+    outputs = run(synthetic_inputs, tmp_path / "out", out_format="zarr")
+
+    assert set(outputs) == DEFAULT_OUTPUTS
+    for path in outputs.values():
+        assert path.endswith(".zarr")
+        assert os.path.isdir(path)
+
+
+def test_run_per_facility(synthetic_inputs, tmp_path):
+    outputs = run(synthetic_inputs, tmp_path / "out", per_facility=True, workers=2)
+
+    assert set(outputs) == DEFAULT_OUTPUTS | {
+        "Delivered Cost (Facility 1)",
+        "Delivered Cost (Facility 2)",
+        "Cheapest Facility",
+    }
+    costs = [read(outputs[f"Delivered Cost (Facility {i})"]) for i in (1, 2)]
+    cheapest = read(outputs["Cheapest Facility"])
+    lowest = read(outputs["Delivered Cost"])
+    assert set(np.unique(cheapest.compressed())) == {1, 2}
+    # the delivered cost is the cost of the cheapest facility of every cell
+    picked = np.where(cheapest == 1, costs[0], costs[1])
+    valid = ~np.ma.getmaskarray(cheapest)
+    np.testing.assert_allclose(lowest[valid], picked[valid])
+
+
+def test_run_disk_backed_matches_in_memory(synthetic_inputs, tmp_path):
+    in_memory = run(synthetic_inputs, tmp_path / "memory")
+    disk = run(synthetic_inputs, tmp_path / "disk", tile_mb=1)
+
+    np.testing.assert_allclose(
+        read(disk["Delivered Cost"]), read(in_memory["Delivered Cost"])
+    )
+    # the intermediates of the windowed stages are removed with the run's scratch folder
+    assert not [
+        name
+        for name in os.listdir(tmp_path / "disk")
+        if name.startswith(("scratch_", "tile_"))
+    ]
+
+
+class CountingPool(ThreadPoolExecutor):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.submitted = 0
+
+    def submit(self, *args, **kwargs):
+        self.submitted += 1
+        return super().submit(*args, **kwargs)
+
+
+def test_run_on_explicit_scheduler(synthetic_inputs, tmp_path):
+    with CountingPool(max_workers=2) as pool:
+        outputs = run(synthetic_inputs, tmp_path / "out", tile_mb=1, scheduler=pool)
+
+    assert set(outputs) == DEFAULT_OUTPUTS
+    assert pool.submitted > 0
+    # the scheduler is passed to the run's computes, not set for every thread
+    assert dask.config.get("scheduler", None) is None
+
+
+def test_cancel_keeps_reported_outputs(synthetic_inputs, tmp_path):
+    token = CancellationToken()
+    reported = {}
+    active = []
+
+    def on_output(name, path):
+        # the run's callbacks are passed to its own computes, never registered globally
+        active.append(set(Callback.active))
+        reported[name] = path
+        token.cancel()
+
+    with pytest.raises(RunCancelledError):
+        run(
+            synthetic_inputs,
+            tmp_path / "out",
+            cb_o=True,
+            scheduler="synchronous",
+            cancel_token=token,
+            on_output=on_output,
+        )
+
+    assert len(reported) == 1
+    assert active == [set()]
+    (path,) = reported.values()
+    assert os.path.isfile(path)
+    outputs = [name for name in os.listdir(tmp_path / "out") if name.endswith(".tif")]
+    assert outputs == [os.path.basename(path)]
@@ -0,0 +1,117 @@
+"""
+Tests of the narrowing of outputs in dtype_optimizer.py.
+"""
+
+import dask
+import dask.array as da
+import numpy as np
+import pytest
+import rasterio
+from rasterio.transform import from_origin
+
+from dtype_optimizer import (
+    narrow_after,
+    narrow_null,
+    narrowest_dtype,
+    narrow_written,
+    value_stats,
+)
+
+INT64_MIN = np.iinfo("int64").min
+
+
+def narrowest(values, null_value=None, exact=True):
+    values = np.asarray(values)
+    return narrowest_dtype(
+        values.dtype, value_stats(values, null_value), null_value, exact
+    )
+
+
+@pytest.mark.parametrize(
+    "values, expected",
+    [
+        (np.array([0, 1, 2], dtype="int64"), "uint8"),
+        (np.array([-5, 300], dtype="int64"), "int16"),
+        (np.array([0, 60_000], dtype="int32"), "uint16"),
+        (np.array([0, 2**40], dtype="int64"), "int64"),
+        (np.array([0.0, 3.0, 250.0]), "uint8"),
+        (np.array([0.5, 1.25]), "float32"),
+        (np.array([0.1, 1.0]), "float64"),
+        (np.array([1.0, np.nan]), "float32"),
+        (np.array([1.5, np.inf]), "float32"),
+        (np.array([True, False]), "uint8"),
+        (np.array([1, 2], dtype="uint8"), "uint8"),
+    ],
+)
+def test_narrowest_dtype(values, expected):
+    assert narrowest(values) == np.dtype(expected)
+
+
+def test_narrowest_dtype_rounds_to_float32_when_not_exact():
+    assert narrowest([0.1, 1.0], exact=False) == np.dtype("float32")
+    assert narrowest([0.1, 1e300], exact=False) == np.dtype("float64")
+
+
+def test_narrowest_dtype_ignores_null_cells():
+    values = np.array([0, 1, 2, INT64_MIN], dtype="int64")
+    # the int64 null is replaced by 255, which no value uses
+    assert narrowest(values, INT64_MIN) == np.dtype("uint8")
+    assert narrow_null("uint8", INT64_MIN) == 255
+    # 255 is a value, so uint8 has no room for the null value
+    values = np.array([0, 255, INT64_MIN], dtype="int64")
+    assert narrowest(values, INT64_MIN) == np.dtype("int16")
+    # a null value the narrow dtype holds is kept
+    values = np.array([-1, 0, 7], dtype="int64")
+    assert narrowest(values, -1) == np.dtype("uint8")
+    assert narrow_null("uint8", -1) == 255
+    assert narrowest(np.array([0, 7, 9], dtype="int64"), 9) == np.dtype("uint8")
+    assert narrow_null("uint8", 9) == 9
+
+
+def test_narrowest_dtype_all_null():
+    values = np.full(4, INT64_MIN, dtype="int64")
+    assert narrowest(values, INT64_MIN) == np.dtype("int64")
+
+
+def write_tif(path, values, nodata):
+    profile = {
+        "driver": "GTiff",
+        "count": 1,
+        "height": values.shape[0],
+        "width": values.shape[1],
+        "dtype": values.dtype.name,
+        "nodata": nodata,
+        "crs": "EPSG:5070",
+        "transform": from_origin(0, 0, 30, 30),
+    }
+    with rasterio.open(path, "w", **profile) as dst:
+        dst.write(values, 1)
+
+
+def test_narrow_written_geotiff(tmp_path):
+    path = str(tmp_path / "system.tif")
+    values = np.array([[0, 1], [2, INT64_MIN]], dtype="int64")
+    write_tif(path, values, INT64_MIN)
+
+    dtype = narrow_written(
+        path, values.dtype, value_stats(values, INT64_MIN), INT64_MIN
+    )
+
+    assert dtype == np.dtype("uint8")
+    with rasterio.open(path) as src:
+        assert src.dtypes[0] == "uint8"
+        assert src.nodata == 255
+        np.testing.assert_array_equal(src.read(1), [[0, 1], [2, 255]])
+    assert [p.name for p in tmp_path.iterdir()] == ["system.tif"]
+
+
+def test_narrow_after(tmp_path):
+    path = str(tmp_path / "cost.tif")
+    data = da.from_array(np.array([[0.5, 1.25], [2.0, -1.0]]), chunks=1)
+    write = dask.delayed(write_tif)(path, data, -1.0)
+
+    assert narrow_after(write, path, data, -1.0).compute() == np.dtype("float32")
+    with rasterio.open(path) as src:
+        assert src.dtypes[0] == "float32"
+        assert src.nodata == -1.0
+        np.testing.assert_array_equal(src.read(1), [[0.5, 1.25], [2.0, -1.0]])
@@ -0,0 +1,72 @@
+"""
+Tests of the AOI grouping and job queue in delivered_cost/job_queue.py.
+"""
+
+import pytest
+
+from delivered_cost import job_queue
+from delivered_cost.job_queue import DeliveredCostJobQueue, build_jobs, group_aois
+
+
+def square(x, y, size=0.01):
+    return [(x, y), (x + size, y), (x + size, y + size), (x, y + size)]
+
+
+def test_group_aois_groups_nearby_aois():
+    aois = [square(0, 0), square(0.05, 0), square(3, 3), square(3.05, 3.02)]
+    assert sorted(group_aois(aois)) == [[0, 1], [2, 3]]
+
+
+def test_group_aois_caps_group_size():
+    # a 10 x 10 grid of adjacent 0.01 degree stands
+    aois = [square(0.01 * i, 0.01 * j) for i in range(10) for j in range(10)]
+    groups = group_aois(aois, max_aois=25)
+    assert sorted(i for group in groups for i in group) == list(range(100))
+    assert max(len(group) for group in groups) <= 25
+    assert len(groups) >= 4
+
+
+def test_group_aois_caps_group_area():
+    aois = [square(0.3 * i, 0) for i in range(6)]
+    for group in group_aois(aois, max_gap=0.5, max_area=0.05):
+        xs = [x for i in group for x, _ in aois[i]]
+        ys = [y for i in group for _, y in aois[i]]
+        assert (max(xs) - min(xs)) * (max(ys) - min(ys)) <= 0.05
+
+
+def test_build_jobs_covers_each_group():
+    aois = [square(0, 0), square(0.05, 0), square(3, 3)]
+    jobs = build_jobs(aois, {"cb_o": True})
+    assert [len(job.aois) for job in jobs] == [2, 1]
+    assert [job.job_id for job in jobs] == [1, 2]
+    assert all(job.args == {"cb_o": True} for job in jobs)
+    jobs[0].args["cb_o"] = False  # every job gets its own copy
+    assert jobs[1].args["cb_o"] is True
+    xs, ys = zip(*jobs[0].study_area_coords)
+    assert (min(xs), min(ys), max(xs), max(ys)) == pytest.approx((0, 0, 0.06, 0.01))
+
+
+def fake_run_job(study_area_coords, args, out_dir, cancel_event=None):
+    if args.get("fail"):
+        raise ValueError("no roads")
+    return {"Delivered Cost": f"{out_dir}/d_cost.tif"}
+
+
+def test_queue_runs_jobs_on_threads(monkeypatch, tmp_path):
+    monkeypatch.setattr(job_queue, "run_job", fake_run_job)
+    jobs = build_jobs([square(0, 0), square(5, 5)], {})
+    jobs[1].args["fail"] = True
+    statuses = []
+    queue = DeliveredCostJobQueue(jobs, str(tmp_path), 2, executor="threads")
+
+    outputs = queue.run(on_status=lambda job: statuses.append((job.job_id, job.status)))
+
+    assert outputs == {"Job 1: Delivered Cost": f"{tmp_path}/job_1/d_cost.tif"}
+    assert (jobs[0].status, jobs[1].status) == ("finished", "failed")
+    assert jobs[1].error == "no roads"
+    assert {(1, "submitted"), (2, "submitted"), (1, "finished")} <= set(statuses)
+
+
+def test_queue_rejects_unknown_executor(tmp_path):
+    with pytest.raises(ValueError):
+        DeliveredCostJobQueue([], str(tmp_path), executor="cluster")
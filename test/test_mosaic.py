@@ -0,0 +1,99 @@
+"""
+Tests of the lazy tile mosaic in lazy_calculator/backend/mosaic.py.
+"""
+
+import math
+
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+
+from conftest import CELL, ORIGIN
+
+TILE = 16
+
+
+def write_tile(path, row, col, data, nodata):
+    """
+    Writes a TILE x TILE tile at tile position (row, col) of the synthetic grid.
+    """
+    x0 = ORIGIN[0] + col * TILE * CELL
+    y0 = ORIGIN[1] - row * TILE * CELL
+    with rasterio.open(
+        path,
+        "w",
+        driver="GTiff",
+        width=TILE,
+        height=TILE,
+        count=1,
+        dtype=data.dtype,
+        crs="EPSG:5070",
+        transform=from_origin(x0, y0, CELL, CELL),
+        nodata=nodata,
+    ) as dst:
+        dst.write(data, 1)
+    return str(path)
+
+
+def mosaic(backend, tmp_path, tiles):
+    """
+    Writes tiles given as {(row, col): (data, nodata)} and returns their catalogue.
+    """
+    paths = [
+        write_tile(tmp_path / f"tile_{row}_{col}.tif", row, col, data, nodata)
+        for (row, col), (data, nodata) in tiles.items()
+    ]
+    return backend.TileCatalog(paths)
+
+
+def test_tiles_keep_their_own_nodata(backend, tmp_path):
+    a = np.full((TILE, TILE), 1.0, dtype="float32")
+    a[0, 0] = -9999
+    b = np.full((TILE, TILE), 2.0, dtype="float32")
+    b[0, 0] = -1
+    catalog = mosaic(backend, tmp_path, {(0, 0): (a, -9999), (0, 1): (b, -1)})
+
+    assert math.isnan(catalog.nodata)
+    data = catalog.to_dask().compute()[0]
+    assert np.isnan(data[0, 0]) and np.isnan(data[0, TILE])
+    assert (data[1:, :TILE] == 1).all() and (data[1:, TILE:] == 2).all()
+    assert catalog.to_raster().null_value is not None
+
+
+def test_shared_nodata_is_kept(backend, tmp_path):
+    data = np.arange(TILE * TILE, dtype="int16").reshape(TILE, TILE)
+    catalog = mosaic(backend, tmp_path, {(0, 0): (data, -1), (1, 1): (data, -1)})
+
+    assert catalog.nodata == -1
+    out = catalog.to_dask().compute()[0]
+    assert (out[:TILE, TILE:] == -1).all()  # the gap
+    assert (out[TILE:, TILE:] == data).all()
+
+
+def test_gaps_without_nodata_get_a_null_value(backend, tmp_path):
+    zeros = np.zeros((TILE, TILE), dtype="uint8")
+    catalog = mosaic(
+        backend,
+        tmp_path,
+        {(0, 0): (zeros, None), (0, 1): (zeros, None), (1, 0): (zeros, None)},
+    )
+
+    # 0 is data in these tiles, so the gap must not be filled with it
+    assert catalog.nodata == 255
+    out = catalog.to_dask().compute()[0]
+    assert (out[TILE:, TILE:] == 255).all()
+    assert (out[:TILE] == 0).all() and (out[TILE:, :TILE] == 0).all()
+
+
+def test_tasks_only_hold_their_own_tiles(backend, tmp_path):
+    data = np.ones((TILE, TILE), dtype="float32")
+    tiles = {(row, col): (data, None) for row in range(4) for col in range(4)}
+    catalog = mosaic(backend, tmp_path, tiles)
+    array = catalog.to_dask()
+
+    assert array.numblocks == (1, 4, 4)
+    graph = dict(array.__dask_graph__())
+    assert len(graph) == 16
+    for (task,) in graph.values():
+        assert len(task.args[0]) == 1
+    np.testing.assert_array_equal(array.compute(), 1)
@@ -0,0 +1,48 @@
+"""
+Tests of the extent checks in lazy_calculator/backend/raster_manager.py.
+"""
+
+from types import SimpleNamespace
+
+import pytest
+import shapely
+
+
+def extent(x0, y0, x1, y1, rotated=False):
+    geom = shapely.box(x0, y0, x1, y1)
+    if rotated:
+        geom = shapely.affinity.rotate(geom, 30)
+    return SimpleNamespace(geobox=SimpleNamespace(extent=SimpleNamespace(geom=geom)))
+
+
+@pytest.fixture
+def manager(backend):
+    return backend.RasterManager(backend.LayerManager())
+
+
+@pytest.mark.parametrize("rotated", [False, True])
+def test_raster_overlap_accepts_overlapping_extents(manager, rotated):
+    rasters = {f"r{i}": extent(i, i, i + 10, i + 10, rotated) for i in range(5)}
+    assert manager.raster_overlap(rasters)
+
+
+def test_raster_overlap_lists_disjoint_pairs(manager, backend):
+    # a and b overlap, c overlaps b only, d overlaps nothing
+    rasters = {
+        "a": extent(0, 0, 10, 10),
+        "b": extent(5, 0, 15, 10),
+        "c": extent(12, 0, 20, 10),
+        "d": extent(100, 100, 110, 110),
+    }
+    with pytest.raises(backend.RasterExtentError) as error:
+        manager.raster_overlap(rasters)
+    message = str(error.value)
+    for pair in ["'a' and 'c'", "'a' and 'd'", "'b' and 'd'", "'c' and 'd'"]:
+        assert pair in message
+    assert "'a' and 'b'" not in message and "'b' and 'c'" not in message
+
+
+def test_raster_overlap_counts_pairs_beyond_ten(manager, backend):
+    rasters = {f"r{i}": extent(20 * i, 0, 20 * i + 10, 10) for i in range(6)}
+    with pytest.raises(backend.RasterExtentError, match="5 more pairs"):
+        manager.raster_overlap(rasters)
@@ -0,0 +1,114 @@
+"""
+Tests of the cached vector burns in delivered_cost/rasterize.py.
+"""
+
+import os
+
+import geopandas as gpd
+import numpy as np
+import pytest
+import rasterio
+from rasterio.transform import from_origin
+from raster_tools import Raster
+from shapely.geometry import box
+
+from conftest import CELL, ORIGIN, grid_xy
+from delivered_cost.rasterize import RasterizeCache
+
+SIZE = 20
+
+
+@pytest.fixture
+def like(tmp_path):
+    """
+    A SIZE x SIZE raster on the synthetic grid, in 10 x 10 chunks.
+    """
+    path = str(tmp_path / "like.tif")
+    with rasterio.open(
+        path,
+        "w",
+        driver="GTiff",
+        width=SIZE,
+        height=SIZE,
+        count=1,
+        dtype="float32",
+        crs="EPSG:5070",
+        transform=from_origin(*ORIGIN, CELL, CELL),
+    ) as dst:
+        dst.write(np.zeros((SIZE, SIZE), dtype="float32"), 1)
+    return Raster(path).chunk((1, 10, 10))
+
+
+def cells(col0, row0, col1, row1):
+    """
+    Returns a box covering the cell centres of columns col0..col1 and rows row0..row1.
+    """
+    (x0, y1), (x1, y0) = grid_xy(col0, row0), grid_xy(col1, row1)
+    return box(x0, y0, x1, y1)
+
+
+@pytest.fixture
+def layer():
+    return gpd.GeoDataFrame(
+        {"speed": [30.0, 50.0]},
+        geometry=[cells(1, 1, 3, 3), cells(12, 12, 14, 14)],
+        crs=5070,
+    )
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return RasterizeCache(str(tmp_path / "cache"))
+
+
+def test_key_is_stable(layer, like):
+    key = RasterizeCache.key(layer, like)
+    assert key == RasterizeCache.key(layer.copy(), like)
+    assert key != RasterizeCache.key(layer, like, all_touched=False)
+    assert key != RasterizeCache.key(layer.iloc[::-1], like)
+    moved = layer.set_geometry(layer.geometry.translate(CELL, 0))
+    assert key != RasterizeCache.key(moved, like)
+
+
+def test_burn_maps_attributes_through_the_index(cache, layer, like):
+    burned = cache.burn(layer, like, attrs=["speed"], all_touched=False)
+    index = burned["index"].to_numpy()[0]
+    speed = burned["speed"].to_numpy()[0]
+
+    assert index[2, 2] == 1 and index[13, 13] == 2 and index[7, 7] == 0
+    assert speed[2, 2] == 30 and speed[13, 13] == 50 and speed[7, 7] == 0
+    assert burned["speed"].null_value == 0
+    np.testing.assert_array_equal(speed, np.array([0, 30, 50])[index])
+
+
+def test_burn_reuses_the_disk_cache(cache, layer, like):
+    cache.burn(layer, like)
+    files = os.listdir(cache.cache_dir)
+    assert files == [f"{RasterizeCache.key(layer, like)}.npy"]
+
+    # a new cache on the same folder reads the index instead of burning it again
+    again = RasterizeCache(cache.cache_dir)
+    again._write_index = None
+    np.testing.assert_array_equal(
+        again.burn(layer, like)["index"].to_numpy(),
+        cache.burn(layer, like)["index"].to_numpy(),
+    )
+
+
+def test_least_recently_used_indexes_are_evicted(tmp_path, layer, like):
+    # one index file is SIZE * SIZE int32 cells, the limit holds two of them
+    index_mb = (SIZE * SIZE * 4 + 128) / 1024**2
+    cache = RasterizeCache(str(tmp_path / "cache"), max_mb=2.5 * index_mb, max_open=1)
+    layers = [
+        layer.set_geometry(layer.geometry.translate(i * CELL, 0)) for i in range(3)
+    ]
+    keys = [RasterizeCache.key(gdf, like) for gdf in layers]
+
+    cache.index(layers[0], like)
+    cache.index(layers[1], like)
+    assert list(cache._memory) == [keys[1]]
+    os.utime(os.path.join(cache.cache_dir, f"{keys[0]}.npy"), (0, 0))
+    cache.index(layers[2], like)
+
+    files = sorted(os.listdir(cache.cache_dir))
+    assert files == sorted(f"{key}.npy" for key in keys[1:])
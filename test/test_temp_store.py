@@ -0,0 +1,93 @@
+"""
+Tests of the quota and cleanup of temporary outputs in temp_store.py.
+"""
+
+import os
+
+import pytest
+
+from temp_store import TempStore
+
+MB = 1024**2
+
+
+def write(path, mb=1):
+    with open(path, "wb") as f:
+        f.write(b"\0" * int(mb * MB))
+
+
+@pytest.fixture
+def layers():
+    return []  # the sources of the live layers
+
+
+@pytest.fixture
+def store(tmp_path, layers):
+    return TempStore(str(tmp_path / "store"), quota_mb=2, sources=lambda: layers)
+
+
+def written(store, names):
+    """
+    Writes a 1 MB output per name and releases it, the first name least recently used.
+    The quota is applied afterwards, by the caller.
+    """
+    quota_mb, store.quota_mb = store.quota_mb, 0
+    paths = []
+    for used, name in enumerate(names):
+        path = store.new_path(name)
+        write(path)
+        store.release(path)
+        store._entries[path] = used
+        paths.append(path)
+    store.quota_mb = quota_mb
+    return paths
+
+
+def test_new_path_keeps_the_readable_name(store):
+    path = store.new_path("slope / aspect")
+    assert os.path.basename(path) == "slope_aspect.tif"
+    assert os.path.isdir(os.path.dirname(path))
+    assert path != store.new_path("slope / aspect")
+
+
+def test_quota_evicts_least_recently_used(store):
+    a, b, c = written(store, ["a", "b", "c"])
+    assert store.enforce_quota() == [a]
+    assert not os.path.exists(os.path.dirname(a))  # the folder new_path made
+    assert os.path.exists(b) and os.path.exists(c)
+
+
+def test_quota_keeps_busy_and_referenced_entries(store, layers):
+    a, b = written(store, ["a", "b"])
+    busy = store.new_path("busy")
+    write(busy)
+    store._entries[busy] = -1
+    layers.append(f"{a}|layername=a")
+
+    assert store.enforce_quota() == [b]
+    assert os.path.exists(a) and os.path.exists(busy)
+
+
+def test_run_dirs_are_evicted_whole(store):
+    run = store.run_dir("delivered_cost")
+    write(os.path.join(run, "cost.tif"), 1.5)
+    write(os.path.join(run, "opr.tif"), 1)
+    store.release(run)
+    assert not os.path.exists(run)
+
+
+def test_no_quota_keeps_everything(store):
+    paths = written(store, ["a", "b", "c"])
+    store.quota_mb = 0
+    assert store.enforce_quota() == []
+    assert all(os.path.exists(path) for path in paths)
+
+
+def test_purge_removes_every_output(store):
+    run = store.run_dir()
+    path = store.new_path("a")
+    write(path)
+    store.purge()
+    assert not os.path.exists(store.root)
+    assert not os.path.exists(run)
+    assert store.enforce_quota() == []
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ RasterTools
+                                 A QGIS plugin
+ This plugin provides a raster calculator and delivered cost calculator.
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2025-07-31
+        git sha              : $Format:%H$
+        copyright            : (C) 2025 by Tim Van Driel
+        email                : timothy.vandriel@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import importlib.util
+import os
+import re
+
+ZARR_VARIABLE = "band_data"  # array holding the raster in every store we write
+
+
+def zarr_available() -> bool:
+    """
+    Checks if the optional zarr package is installed.
+    """
+    return importlib.util.find_spec("zarr") is not None
+
+
+def is_zarr_path(path: str) -> bool:
+    """
+    Checks if an output path names a Zarr store.
+    """
+    return path.rstrip("/\\").lower().endswith(".zarr")
+
+
+def zarr_store_path(source: str):
+    """
+    Returns the store directory of a Zarr source, given as a path or as the GDAL
+    'ZARR:"path":/array' layer URI, if the store exists.
+
+    Args:
+        source (str): Layer name, source or path.
+
+    Returns:
+        str | None: The store directory, or None if the source is not a Zarr store.
+    """
+    match = re.match(r'^ZARR:"(.+)":', source)
+    path = match.group(1) if match else source
+    if is_zarr_path(path) and os.path.isdir(path):
+        return path
+    return None
+
+
+def layer_uri(path: str) -> str:
+    """
+    Returns the URI QGIS opens an output with, the GDAL subdataset URI of the raster
+    array for Zarr stores and the path itself otherwise.
+    """
+    if is_zarr_path(path):
+        return f'ZARR:"{path}":/{ZARR_VARIABLE}'
+    return path
+
+
+def _uniform_chunks(xrs):
+    """
+    Rechunks a DataArray so each dimension has equal chunks except the last one, which
+    Zarr needs to map every dask chunk onto exactly one store chunk.
+    """
+    chunks = xrs.chunks
+    if chunks is None or all(len(set(dim[:-1])) <= 1 and dim[-1] <= dim[0] for dim in chunks):
+        return xrs
+    return xrs.chunk({dim: max(sizes) for dim, sizes in zip(xrs.dims, chunks)})
+
+
+def to_zarr(xrs, path: str, compute=True):
+    """
+    Writes a (band, y, x) DataArray to a Zarr store with one store chunk per dask chunk,
+    so every task writes its own chunk file without a lock.
+
+    The store uses Zarr format 2, which GDAL reads since 3.4. The CRS is written both as
+    the CF grid mapping xarray reads and as the _CRS attribute GDAL reads, and the
+    rioxarray nodata value as the array fill value.
+
+    Args:
+        xrs (xarray.DataArray): The raster data, with a CRS and optionally nodata set
+            through rioxarray.
+        path (str): Path of the .zarr store, replaced if it exists.
+        compute (bool): Write now, or return a dask Delayed that writes when computed.
+
+    Returns:
+        dask.delayed.Delayed | None: The pending write when compute is False.
+
+    Raises:
+        ImportError: If the zarr package is not installed.
+    """
+    if not zarr_available():
+        raise ImportError(
+            "Writing Zarr outputs needs the zarr package, install it with 'pip install zarr'."
+        )
+    xrs = _uniform_chunks(xrs)
+    nodata = xrs.rio.nodata
+    crs = xrs.rio.crs
+    xrs = xrs.copy()
+    xrs.attrs.pop("_FillValue", None)
+    xrs.encoding = {}
+    if crs is not None:
+        xrs.attrs["_CRS"] = {"wkt": crs.to_wkt()}
+    encoding = {}
+    if xrs.chunks is not None:
+        encoding["chunks"] = tuple(sizes[0] for sizes in xrs.chunks)
+    if nodata is not None:
+        encoding["_FillValue"] = nodata
+    return xrs.to_dataset(name=ZARR_VARIABLE).to_zarr(
+        path,
+        mode="w",
+        compute=compute,
+        encoding={ZARR_VARIABLE: encoding},
+        zarr_format=2,  # the format GDAL, and so QGIS, reads
+    )
+
+
+def write_raster_zarr(
+    raster, path: str, compute=True, optimize_dtype=False, scheduler=None
+):
+    """
+    Writes a raster_tools Raster to a Zarr store, see to_zarr.
+
+    Args:
+        raster (raster_tools.Raster): The raster to write.
+        path (str): Path of the .zarr store.
+        compute (bool): Write now, or return the pending write.
+        optimize_dtype (bool): Rewrite the store with the narrowest lossless dtype, from
+            value statistics computed with the write, see dtype_optimizer.narrow_after.
+        scheduler (optional): The dask scheduler writing now, defaults to the configured
+            scheduler.
+
+    Returns:
+        dask.delayed.Delayed | None: The pending write when compute is False.
+    """
+    if raster.dtype == bool:
+        from raster_tools.masking import get_default_null_value
+
+        # a bool null value would mark every True cell as nodata, see Raster.save
+        raster = raster.astype("uint8").set_null_value(get_default_null_value("uint8"))
+    xrs = raster.xdata
+    if raster.crs is not None:
+        xrs = xrs.rio.write_crs(raster.crs)
+    if raster.null_value is not None:
+        xrs = xrs.rio.write_nodata(raster.null_value)
+    write = to_zarr(xrs, path, compute=False)
+    if optimize_dtype:
+        try:
+            from .dtype_optimizer import narrow_after
+        except ImportError:  # headless, the plugin folder is on sys.path
+            from dtype_optimizer import narrow_after
+
+        write = narrow_after(write, path, xrs.data, raster.null_value)
+    if not compute:
+        return write
+    write.compute(scheduler=scheduler)
+    return None
+
+
+def open_zarr(path: str):
+    """
+    Opens a Zarr store written by to_zarr as a lazy DataArray chunked like the store, so
+    reading it back costs no copy or rechunk.
+
+    Args:
+        path (str): Path of the .zarr store.
+
+    Returns:
+        tuple: The (band, y, x) DataArray with its CRS set, and its nodata value or None.
+    """
+    import rioxarray  # noqa: F401, registers the .rio accessor
+    import xarray as xr
+
+    xrs = xr.open_zarr(path, mask_and_scale=False)[ZARR_VARIABLE]
+    nodata = xrs.attrs.pop("_FillValue", xrs.encoding.get("_FillValue"))
+    wkt = xrs.attrs.get("_CRS", {}).get("wkt")
+    if xrs.rio.crs is None and wkt:
+        xrs = xrs.rio.write_crs(wkt)
+    return xrs, nodata